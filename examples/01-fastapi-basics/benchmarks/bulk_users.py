@@ -0,0 +1,94 @@
+"""
+Records/s of the NDJSON bulk route vs one /create_user request per user.
+
+Both routes are called in process through httpx.ASGITransport, so the
+numbers measure the app (routing, validation, serialization) and not a
+network. --invalid-fraction of the records have a bad email, to exercise
+the error path too.
+
+Usage (from examples/01-fastapi-basics):
+    python -m benchmarks.bulk_users --records 20000 --concurrency 32
+"""
+import argparse
+import asyncio
+import importlib
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+# routers.py uses relative imports: load the example as a package, as uvicorn does
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+app = importlib.import_module("01-fastapi-basics.main").app
+
+
+def make_users(count: int, invalid_fraction: float, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    users = []
+    for i in range(count):
+        email = f"user{i}@example.com" if rng.random() >= invalid_fraction else f"user{i}-at-example.com"
+        users.append({"username": f"user{i:07d}", "email": email, "first_name": "Ada", "last_name": "Lovelace"})
+    return users
+
+
+async def run_single(client: httpx.AsyncClient, users: list, concurrency: int) -> dict:
+    queue = iter(users)
+    failed = 0
+
+    async def worker() -> None:
+        nonlocal failed
+        for user in queue:
+            response = await client.post("/fastapi-basics/create_user", json=user)
+            failed += response.status_code != 200
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return {"route": f"create_user x{len(users)}, concurrency {concurrency}", "seconds": time.perf_counter() - started,
+            "records": len(users), "failed": failed}
+
+
+async def run_bulk(client: httpx.AsyncClient, users: list, lines_per_write: int) -> dict:
+    async def body():
+        # Sent as it is produced, as a client streaming a large file would
+        for i in range(0, len(users), lines_per_write):
+            yield "".join(json.dumps(user) + "\n" for user in users[i:i + lines_per_write]).encode()
+
+    started = time.perf_counter()
+    response = await client.post(
+        "/fastapi-basics/create_users", content=body(), headers={"Content-Type": "application/x-ndjson"}
+    )
+    response.raise_for_status()
+    summary = json.loads(response.text.rstrip("\n").rsplit("\n", 1)[-1])
+    return {"route": "create_users (NDJSON)", "seconds": time.perf_counter() - started,
+            "records": summary["created"] + summary["failed"], "failed": summary["failed"]}
+
+
+async def main(args) -> None:
+    users = make_users(args.records, args.invalid_fraction)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        # Warm up both routes: first calls build validators and routing caches
+        await run_single(client, users[:100], 1)
+        await run_bulk(client, users[:100], 100)
+        rows = [
+            await run_single(client, users, args.concurrency),
+            await run_bulk(client, users, args.lines_per_write),
+        ]
+
+    print(f"{args.records} users, {args.invalid_fraction:.0%} invalid\n")
+    print("| route | seconds | records/s | failed |")
+    print("|---|---|---|---|")
+    for row in rows:
+        print(f"| {row['route']} | {row['seconds']:.2f} | {row['records'] / row['seconds']:.0f} | {row['failed']} |")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=32, help="parallel /create_user requests")
+    parser.add_argument("--lines-per-write", type=int, default=500, help="NDJSON lines per request body piece")
+    parser.add_argument("--invalid-fraction", type=float, default=0.01)
+    asyncio.run(main(parser.parse_args()))
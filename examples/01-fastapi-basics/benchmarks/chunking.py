@@ -0,0 +1,82 @@
+"""
+Chunker throughput: retrieval.chunking.TokenChunker vs the original split_text.
+
+The corpus is data/test.txt repeated, so the cold-cache run tokenizes each
+of its ~125 distinct words once and is warm for the rest of the text. With --tokenizer words, counting costs nothing and both rows match.
+
+Usage (from examples/01-fastapi-basics):
+    python -m benchmarks.chunking --size-mb 5
+    python -m benchmarks.chunking --tokenizer words   # no model download
+"""
+import argparse
+import time
+from pathlib import Path
+from typing import Callable, List
+
+from retrieval.chunking import TokenChunker
+
+DATA_PATH = Path(__file__).parent.parent / "data" / "test.txt"
+
+
+def legacy_split_text(text: str, max_words: int = 100) -> List[str]:
+    """The split_text rag.py used before TokenChunker, kept as the baseline."""
+    sentences = text.split(". ")
+    chunks = []
+    chunk = ""
+    for sentence in sentences:
+        if len((chunk + sentence).split()) < max_words:
+            chunk += sentence + ". "
+        else:
+            chunks.append(chunk.strip())
+            chunk = sentence + ". "
+    if chunk:
+        chunks.append(chunk.strip())
+    return chunks
+
+
+def load_counter(name: str) -> Callable[[str], int]:
+    if name == "words":
+        return lambda word: 1
+    from transformers import AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(name)
+    return lambda word: len(tokenizer.encode(word, add_special_tokens=False))
+
+
+def measure(label: str, split: Callable[[str], list], text: str) -> None:
+    started = time.perf_counter()
+    chunks = split(text)
+    elapsed = time.perf_counter() - started
+    size_mb = len(text.encode("utf-8")) / 1e6
+    print(f"{label:<28} {len(chunks):>8} chunks {elapsed:>8.2f}s {size_mb / elapsed:>8.2f} MB/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=float, default=2.0)
+    parser.add_argument("--tokenizer", default="sentence-transformers/all-MiniLM-L6-v2",
+                        help='HuggingFace tokenizer name, or "words" to count words')
+    parser.add_argument("--max-words", type=int, default=100)
+    parser.add_argument("--max-tokens", type=int, default=254)
+    args = parser.parse_args()
+
+    sample = DATA_PATH.read_text(encoding="utf-8")
+    text = sample * max(1, int(args.size_mb * 1e6 / len(sample.encode("utf-8"))))
+    print(f"Corpus: {len(text.encode('utf-8')) / 1e6:.1f} MB\n")
+
+    measure(f"split_text(max_words={args.max_words})", lambda t: legacy_split_text(t, args.max_words), text)
+    for max_words in (200, 400):
+        # The legacy chunker re-splits the growing chunk per sentence: cost grows with chunk size
+        measure(f"split_text(max_words={max_words})", lambda t: legacy_split_text(t, max_words), text)
+
+    count_tokens = load_counter(args.tokenizer)
+    tokenized = []
+
+    def counting(word: str) -> int:
+        tokenized.append(word)
+        return count_tokens(word)
+
+    chunker = TokenChunker(counting, max_tokens=args.max_tokens)
+    measure("TokenChunker (cold cache)", chunker.split, text)
+    print(f"{'':<28} {len(tokenized):>8} words tokenized")
+    measure("TokenChunker (warm cache)", chunker.split, text)
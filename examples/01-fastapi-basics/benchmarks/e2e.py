@@ -0,0 +1,288 @@
+"""
+End-to-end RAG benchmark: ingestion, retrieval and answering without any network.
+
+Runs the same pipeline as rag.py (TokenChunker -> streaming ingestion into a
+FAISS index from retrieval.index_factory -> BM25 -> search -> context
+packing -> chat completion) over a synthetic corpus, with two stand-ins:
+
+- a hashing bag-of-words encoder instead of SentenceTransformer
+  (--encoder minilm uses the real model if it is installed)
+- a deterministic fake chat client with the OpenAI client interface instead
+  of OpenRouter, with an optional simulated latency
+
+Context tokens are counted as words unless --tiktoken is given (the
+tiktoken encoding has to be downloaded once).
+
+Reported as JSON (stdout, or --output): ingestion chunks/s, per-query
+latency p50/p95/p99 for retrieval and for the whole answer, recall@k of the
+configured index against exact search over the same embeddings, and peak
+RSS. Keep the JSON files of two versions to compare them.
+
+Usage (from examples/01-fastapi-basics):
+    python -m benchmarks.e2e --corpus-mb 20 --index-mode hnsw
+    python -m benchmarks.e2e --search-mode hybrid --llm-latency-ms 300 --output e2e.json
+"""
+import argparse
+import json
+import platform
+import sys
+import tempfile
+import time
+import zlib
+from pathlib import Path
+from types import SimpleNamespace
+from typing import List, Optional
+
+import faiss
+import numpy as np
+
+from retrieval import index_factory, search
+from retrieval.bm25 import BM25Index, tokenize
+from retrieval.chunking import TokenChunker
+from retrieval.context import ContextPacker
+from retrieval.ingest import IngestStats, ingest_stream, iter_text_blocks
+
+SYLLABLES = ["ka", "lo", "mi", "ne", "ru", "sa", "ti", "vo", "ze", "pa", "qu", "dor", "len", "mar", "tis"]
+
+
+def synthetic_corpus(path: Path, megabytes: float, vocabulary: int = 20_000, seed: int = 0) -> None:
+    """
+    Write roughly `megabytes` of text: paragraphs of sentences whose words
+    follow a Zipf distribution over made-up words, plus the odd identifier
+    ("E1234") like the exact-term queries hybrid search is for.
+    """
+    rng = np.random.default_rng(seed)
+    words = np.array([
+        "".join(rng.choice(SYLLABLES, rng.integers(2, 5))) + str(i % 7 or "") for i in range(vocabulary)
+    ])
+    ranks = np.arange(1, vocabulary + 1)
+    probabilities = (1 / ranks) / (1 / ranks).sum()
+
+    target = int(megabytes * 1e6)
+    written = 0
+    with open(path, "w", encoding="utf-8") as f:
+        while written < target:
+            sentences = []
+            for _ in range(rng.integers(3, 9)):
+                sentence = list(rng.choice(words, rng.integers(6, 25), p=probabilities))
+                if rng.random() < 0.1:
+                    sentence.insert(rng.integers(len(sentence)), f"E{rng.integers(10_000)}")
+                sentences.append(" ".join(sentence).capitalize() + ".")
+            paragraph = " ".join(sentences) + "\n\n"
+            f.write(paragraph)
+            written += len(paragraph)
+
+
+class HashingEncoder:
+    """Deterministic bag-of-words embeddings: signed feature hashing, L2-normalized."""
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+        self._buckets = {}
+
+    def _bucket(self, token: str) -> tuple:
+        bucket = self._buckets.get(token)
+        if bucket is None:
+            digest = zlib.crc32(token.encode("utf-8"))
+            # Bit 31 picks the sign so collisions cancel out instead of piling up
+            bucket = self._buckets[token] = (digest % self.dim, 1.0 if digest & (1 << 31) else -1.0)
+        return bucket
+
+    def __call__(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype="float32")
+        for row, text in enumerate(texts):
+            buckets = [self._bucket(token) for token in tokenize(text)]
+            if buckets:
+                columns, signs = zip(*buckets)
+                np.add.at(vectors[row], list(columns), signs)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+
+class FakeChatClient:
+    """
+    Stand-in for openai.OpenAI: client.chat.completions.create(**request)
+    returns the first sentence of the context after latency_ms milliseconds.
+    """
+
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency = latency_ms / 1000
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, model: str, messages: List[dict], **kwargs) -> SimpleNamespace:
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        prompt = messages[-1]["content"]
+        context = prompt.split("Context:", 1)[-1].split("Question:", 1)[0]
+        content = context.strip().split(". ", 1)[0]
+        message = SimpleNamespace(role="assistant", content=content)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason="stop")])
+
+
+def load_encoder(name: str, dim: int):
+    """(encode, chunker) pair: the encoder and a chunker sized for its input window."""
+    if name == "hashing":
+        # One token per word; 254 keeps chunks the size MiniLM would get
+        return HashingEncoder(dim), TokenChunker(lambda word: 1)
+    if name == "minilm":
+        from sentence_transformers import SentenceTransformer
+
+        model = SentenceTransformer("all-MiniLM-L6-v2")
+        return (lambda texts: model.encode(texts)), TokenChunker.from_sentence_transformer(model)
+    raise ValueError(f"Unknown encoder {name!r}, expected 'hashing' or 'minilm'")
+
+
+def peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def percentiles_ms(samples: List[float]) -> dict:
+    p50, p95, p99 = np.percentile(np.asarray(samples) * 1000, [50, 95, 99])
+    return {"p50": p50, "p95": p95, "p99": p99, "mean": float(np.mean(samples)) * 1000}
+
+
+def recall_at_k(found: List[List[int]], exact: np.ndarray) -> float:
+    k = exact.shape[1]
+    return sum(len(set(f) & set(e[e != -1])) for f, e in zip(found, exact)) / (k * len(exact))
+
+
+def sample_queries(chunks, count: int, words: int = 8, seed: int = 1) -> List[tuple]:
+    """(question, source chunk id) pairs: a run of words taken from a random chunk."""
+    rng = np.random.default_rng(seed)
+    queries = []
+    for chunk_id in rng.choice(len(chunks), min(count, len(chunks)), replace=False):
+        tokens = chunks[chunk_id].text.split()
+        start = rng.integers(max(1, len(tokens) - words))
+        queries.append((" ".join(tokens[start:start + words]), int(chunk_id)))
+    return queries
+
+
+def run(args) -> dict:
+    encode, chunker = load_encoder(args.encoder, args.dim)
+    llm = FakeChatClient(args.llm_latency_ms)
+    if args.tiktoken:
+        packer = ContextPacker.for_model("gpt-4o-mini", max_tokens=args.context_tokens)
+    else:
+        packer = ContextPacker(lambda text: len(text.split()), max_tokens=args.context_tokens)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = Path(tmp) / "corpus.txt"
+        synthetic_corpus(source, args.corpus_mb, seed=args.seed)
+        size = source.stat().st_size
+
+        # Keep the embeddings for the exact-search baseline
+        embedded: List[np.ndarray] = []
+
+        def recording_encode(texts: List[str]) -> np.ndarray:
+            vectors = np.asarray(encode(texts), dtype="float32")
+            embedded.append(vectors)
+            return vectors
+
+        dim = np.asarray(encode(["probe"])).shape[1]
+
+        expected_chunks = max(1, size // (4 * chunker.max_tokens))
+        index = index_factory.create_index(dim, expected_chunks, mode=args.index_mode)
+        stats = IngestStats()
+        chunks = ingest_stream(
+            chunker.split_stream(iter_text_blocks(source, stats=stats)),
+            recording_encode,
+            index,
+            batch_size=args.batch_size,
+            train_size=index_factory.default_train_size(index),
+            stats=stats,
+        )
+        ingest_s = stats.elapsed
+        started = time.perf_counter()
+        lexical = BM25Index.build(chunk.text for chunk in chunks)
+        bm25_s = time.perf_counter() - started
+        index_factory.tune_search(index, nprobe=args.nprobe, ef_search=args.ef_search)
+        rss_after_ingest = peak_rss_mb()
+
+    queries = sample_queries(chunks, args.queries, seed=args.seed + 1)
+    retrieval_latencies, answer_latencies, found, hits = [], [], [], 0
+    for question, source_id in queries:
+        started = time.perf_counter()
+        query_embeddings = np.asarray(encode([question]), dtype="float32")
+        chunk_ids = search.search_chunk_ids(
+            index, lexical, [question], query_embeddings, args.k, args.search_mode
+        )[0]
+        retrieved = time.perf_counter()
+        context = packer.pack(chunk_ids, chunks).text
+        prompt = f"Answer the question based on the following context. Context: {context} Question: {question} Answer:"
+        llm.chat.completions.create(model="fake", messages=[{"role": "user", "content": prompt}], temperature=0.2)
+        finished = time.perf_counter()
+
+        retrieval_latencies.append(retrieved - started)
+        answer_latencies.append(finished - started)
+        found.append(chunk_ids)
+        hits += source_id in chunk_ids
+
+    # Exact baseline over exactly the vectors that were indexed
+    exact = faiss.IndexFlatL2(dim)
+    exact.add(np.concatenate(embedded))
+    query_embeddings = np.asarray(encode([question for question, _ in queries]), dtype="float32")
+    _, truth = exact.search(query_embeddings, args.k)
+
+    return {
+        "benchmark": "01-fastapi-basics/e2e",
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "numpy": np.__version__,
+            "faiss": faiss.__version__,
+        },
+        "config": vars(args),
+        "corpus": {"bytes": size, "chunks": len(chunks)},
+        "ingestion": {
+            "seconds": ingest_s,
+            "chunks_per_second": len(chunks) / ingest_s if ingest_s else 0.0,
+            "mb_per_second": size / 1e6 / ingest_s if ingest_s else 0.0,
+            "bm25_build_seconds": bm25_s,
+            "index_mode": index_factory.index_mode(index),
+        },
+        "query": {
+            "count": len(queries),
+            "retrieval_ms": percentiles_ms(retrieval_latencies),
+            "answer_ms": percentiles_ms(answer_latencies),
+            f"recall@{args.k}": recall_at_k(found, truth),
+            "source_hit_rate": hits / len(queries) if queries else 0.0,
+            "llm_calls": llm.calls,
+        },
+        "context": packer.stats(),
+        "memory": {"peak_rss_mb_after_ingest": rss_after_ingest, "peak_rss_mb": peak_rss_mb()},
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus-mb", type=float, default=5.0, help="size of the synthetic corpus")
+    parser.add_argument("--encoder", choices=("hashing", "minilm"), default="hashing")
+    parser.add_argument("--dim", type=int, default=384, help="hashing encoder dimension")
+    parser.add_argument("--index-mode", default="auto", choices=("auto",) + index_factory.INDEX_MODES)
+    parser.add_argument("--nprobe", type=int, default=index_factory.DEFAULT_NPROBE)
+    parser.add_argument("--ef-search", type=int, default=index_factory.DEFAULT_EF_SEARCH)
+    parser.add_argument("--search-mode", default="vector", choices=search.SEARCH_MODES)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--context-tokens", type=int, default=1500, help="prompt context budget")
+    parser.add_argument("--tiktoken", action="store_true", help="count context tokens with tiktoken")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    report = json.dumps(run(args), indent=2, default=str)
+    if args.output:
+        args.output.write_text(report + "\n", encoding="utf-8")
+    else:
+        print(report)
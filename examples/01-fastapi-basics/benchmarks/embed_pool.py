@@ -0,0 +1,106 @@
+"""
+Ingestion embedding throughput of retrieval.embed_pool.EmbeddingPool, 1 to N workers.
+
+Encodes the same synthetic chunks in this process (the default ingestion
+path) and then with pools of increasing size, and prints a table plus a
+bar chart of chunks/s and speedup over one worker. Every pool is warmed up
+first, so model loading is not counted.
+
+Usage (from examples/01-fastapi-basics):
+    python -m benchmarks.embed_pool --chunks 20000 --workers 1,2,4,8,16,32
+    python -m benchmarks.embed_pool --plot scaling.png   # needs matplotlib
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+from retrieval.embed_pool import EmbeddingPool
+
+MODEL_NAME = "all-MiniLM-L6-v2"
+
+
+def synthetic_chunks(count: int, words: int = 180, seed: int = 0) -> list:
+    """Chunks of about the size TokenChunker produces for MiniLM (~254 tokens)."""
+    rng = np.random.default_rng(seed)
+    vocabulary = np.array([f"word{i}" for i in range(5000)] + ["the", "of", "and", "a", "to"] * 200)
+    return [" ".join(rng.choice(vocabulary, words)) for _ in range(count)]
+
+
+def default_worker_counts() -> list:
+    cpus = os.cpu_count() or 1
+    counts = [1]
+    while counts[-1] * 2 <= cpus:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != cpus:
+        counts.append(cpus)
+    return counts
+
+
+def bar_chart(rows: list, width: int = 50) -> str:
+    best = max(row["chunks_per_s"] for row in rows)
+    lines = []
+    for row in rows:
+        bar = "#" * max(1, round(width * row["chunks_per_s"] / best))
+        lines.append(f"{row['label']:>12} | {bar} {row['chunks_per_s']:.0f}/s")
+    return "\n".join(lines)
+
+
+def plot(rows: list, path: str) -> None:
+    import matplotlib.pyplot as plt
+
+    pooled = [row for row in rows if row["workers"]]
+    fig, ax = plt.subplots(figsize=(6, 4))
+    ax.plot([row["workers"] for row in pooled], [row["chunks_per_s"] for row in pooled], marker="o", label="pool")
+    ax.axhline(rows[0]["chunks_per_s"], linestyle="--", color="grey", label="in-process")
+    ax.set_xscale("log", base=2)
+    ax.set_xlabel("workers")
+    ax.set_ylabel("chunks/s")
+    ax.set_title(f"{MODEL_NAME} ingestion embedding throughput")
+    ax.legend()
+    fig.tight_layout()
+    fig.savefig(path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=10_000)
+    parser.add_argument("--workers", default=None, help="comma-separated worker counts (default: 1, 2, 4, ... cores)")
+    parser.add_argument("--batch-size", type=int, default=32, help="model.encode batch size per worker")
+    parser.add_argument("--chunk-size", type=int, default=None, help="texts per task (default 4 x batch size)")
+    parser.add_argument("--plot", help="also save the chart as an image")
+    args = parser.parse_args()
+
+    texts = synthetic_chunks(args.chunks)
+    worker_counts = [int(n) for n in args.workers.split(",")] if args.workers else default_worker_counts()
+
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(MODEL_NAME)
+    model.encode(texts[:args.batch_size], batch_size=args.batch_size)
+    started = time.perf_counter()
+    model.encode(texts, batch_size=args.batch_size)
+    rows = [{"label": "in-process", "workers": 0, "seconds": time.perf_counter() - started}]
+    del model
+
+    for workers in worker_counts:
+        with EmbeddingPool(MODEL_NAME, workers, batch_size=args.batch_size, chunk_size=args.chunk_size) as pool:
+            pool.encode(texts[:workers * pool.chunk_size])  # start every worker and load its model
+            started = time.perf_counter()
+            embeddings = pool.encode(texts)
+            rows.append({"label": f"{workers} workers", "workers": workers, "seconds": time.perf_counter() - started})
+            assert embeddings.shape == (len(texts), pool.dim)
+
+    one_worker = next((row["seconds"] for row in rows if row["workers"] == 1), rows[0]["seconds"])
+    print(f"{args.chunks} chunks, {os.cpu_count()} CPUs, batch size {args.batch_size}\n")
+    print("| encoder | seconds | chunks/s | speedup vs 1 worker |")
+    print("|---|---|---|---|")
+    for row in rows:
+        row["chunks_per_s"] = args.chunks / row["seconds"]
+        print(f"| {row['label']} | {row['seconds']:.2f} | {row['chunks_per_s']:.0f} | {one_worker / row['seconds']:.2f}x |")
+    print()
+    print(bar_chart(rows))
+    if args.plot:
+        plot(rows, args.plot)
+        print(f"\nSaved {args.plot}")
@@ -0,0 +1,156 @@
+"""
+Offline stand-ins for the backends rag.py talks to, with tunable latency.
+
+rag.py builds its SentenceTransformer, OpenAI clients and tiktoken encoder
+when it is imported, and each of them downloads something or calls an API.
+install() puts fake `sentence_transformers`, `openai`, `tiktoken` and
+`dotenv` modules into sys.modules, so importing rag.py afterwards (e.g. on
+the first /rag request) needs no network, no API key and no model files.
+Call it before anything imports rag.py, and only in a benchmark process.
+"""
+import asyncio
+import hashlib
+import sys
+import threading
+import time
+import types
+from dataclasses import dataclass
+from types import SimpleNamespace
+from typing import List
+
+import numpy as np
+
+
+@dataclass
+class FakeLatency:
+    embed_call_ms: float = 5.0  # per encode() call: tokenization, kernel launches
+    embed_item_ms: float = 0.5  # per text in the batch
+    llm_first_token_ms: float = 300.0
+    llm_token_ms: float = 10.0
+    llm_tokens: int = 50  # tokens per answer
+
+
+def _words(text: str) -> List[str]:
+    return text.split()
+
+
+class FakeTokenizer:
+    """The part of a Hugging Face tokenizer TokenChunker uses: ~4 tokens per 3 words."""
+
+    def encode(self, text: str, add_special_tokens: bool = True) -> List[int]:
+        count = max(1, len(_words(text)) * 4 // 3) if text.strip() else 0
+        return list(range(count + (2 if add_special_tokens else 0)))
+
+    def num_special_tokens_to_add(self) -> int:
+        return 2
+
+
+class FakeSentenceTransformer:
+    """
+    Deterministic hashed embeddings at the cost of a real encoder.
+
+    Calls are serialized, as a CPU-bound encoder using every core is, and
+    take embed_call_ms plus embed_item_ms per text.
+    """
+
+    latency = FakeLatency()
+    _lock = threading.Lock()
+
+    def __init__(self, model_name: str = "", dim: int = 384, **kwargs):
+        self.model_name = model_name
+        self.dim = dim
+        self.max_seq_length = 256
+        self.tokenizer = FakeTokenizer()
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+    def encode(self, sentences, **kwargs) -> np.ndarray:
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        with self._lock:
+            time.sleep((self.latency.embed_call_ms + self.latency.embed_item_ms * len(texts)) / 1000)
+        vectors = np.empty((len(texts), self.dim), dtype="float32")
+        for row, text in enumerate(texts):
+            seed = int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+            vectors[row] = np.random.default_rng(seed).standard_normal(self.dim, dtype="float32")
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors[0] if single else vectors
+
+
+def _answer_tokens(latency: FakeLatency) -> List[str]:
+    return [f"token{i} " for i in range(latency.llm_tokens)]
+
+
+class _Completions:
+    def __init__(self, latency: FakeLatency):
+        self.latency = latency
+
+    def create(self, model: str = "", messages=None, stream: bool = False, **kwargs):
+        tokens = _answer_tokens(self.latency)
+        time.sleep((self.latency.llm_first_token_ms + self.latency.llm_token_ms * len(tokens)) / 1000)
+        message = SimpleNamespace(role="assistant", content="".join(tokens))
+        return SimpleNamespace(choices=[SimpleNamespace(index=0, message=message, finish_reason="stop")])
+
+
+class _AsyncCompletions(_Completions):
+    async def create(self, model: str = "", messages=None, stream: bool = False, **kwargs):
+        if not stream:
+            tokens = _answer_tokens(self.latency)
+            await asyncio.sleep((self.latency.llm_first_token_ms + self.latency.llm_token_ms * len(tokens)) / 1000)
+            message = SimpleNamespace(role="assistant", content="".join(tokens))
+            return SimpleNamespace(choices=[SimpleNamespace(index=0, message=message, finish_reason="stop")])
+        return self._stream()
+
+    async def _stream(self):
+        await asyncio.sleep(self.latency.llm_first_token_ms / 1000)
+        for i, token in enumerate(_answer_tokens(self.latency)):
+            if i:
+                await asyncio.sleep(self.latency.llm_token_ms / 1000)
+            yield SimpleNamespace(choices=[SimpleNamespace(index=0, delta=SimpleNamespace(content=token))])
+
+
+class FakeOpenAI:
+    """openai.OpenAI answering chat.completions.create after FakeLatency, without a network."""
+
+    latency = FakeLatency()
+    completions_class = _Completions
+
+    def __init__(self, **kwargs):
+        self.chat = SimpleNamespace(completions=self.completions_class(self.latency))
+
+
+class FakeAsyncOpenAI(FakeOpenAI):
+    completions_class = _AsyncCompletions
+
+
+class FakeEncoding:
+    """tiktoken.Encoding counting ~4 tokens per 3 words, so no encoding file is downloaded."""
+
+    name = "fake"
+
+    def encode_ordinary(self, text: str) -> List[int]:
+        return list(range(len(_words(text)) * 4 // 3))
+
+    encode = encode_ordinary
+
+
+def install(latency: FakeLatency = FakeLatency()) -> None:
+    """Register the fake modules; rag.py imported after this uses them."""
+    FakeSentenceTransformer.latency = latency
+    FakeOpenAI.latency = latency
+
+    modules = {
+        "sentence_transformers": {"SentenceTransformer": FakeSentenceTransformer},
+        "openai": {"OpenAI": FakeOpenAI, "AsyncOpenAI": FakeAsyncOpenAI},
+        "tiktoken": {
+            "encoding_for_model": lambda model_name: FakeEncoding(),
+            "get_encoding": lambda encoding_name: FakeEncoding(),
+        },
+        # Never pick up real API keys from a .env
+        "dotenv": {"load_dotenv": lambda *args, **kwargs: False},
+    }
+    for name, attributes in modules.items():
+        module = types.ModuleType(name, f"Fake {name} installed by benchmarks.fakes")
+        module.__dict__.update(attributes)
+        sys.modules[name] = module
@@ -0,0 +1,228 @@
+"""
+Shared connection pool vs per-request and per-model HTTP clients.
+
+Starts a local mock of the OpenAI-compatible /chat/completions endpoint (a
+small asyncio HTTP/1.1 server in a background thread, optionally over TLS
+with a throwaway self-signed certificate) and sends the same chat requests
+through clients built three ways:
+
+- per-request: a new client for every call, as code building a model per
+  request does
+- per-model: --models clients used round-robin, as separate ChatOpenAI
+  instances each with their own pool do
+- shared: one client of http_pool (sharded pool, shared limits)
+
+and reports throughput, latency and how many connections (and TLS
+handshakes) each needed. The first two are plain httpx clients with the
+OpenAI SDK's default limits. No network access or API key is used.
+
+Usage (from examples/01-fastapi-basics):
+    python -m benchmarks.http_pool --requests 2000 --concurrency 32
+    python -m benchmarks.http_pool --tls --latency-ms 20   # needs the openssl CLI
+"""
+import argparse
+import asyncio
+import json
+import shutil
+import ssl
+import subprocess
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import httpx
+import numpy as np
+
+import http_pool
+
+# What the OpenAI SDK gives each client it builds itself
+SDK_LIMITS = httpx.Limits(max_connections=1000, max_keepalive_connections=100)
+
+COMPLETION = json.dumps({
+    "id": "chatcmpl-mock",
+    "object": "chat.completion",
+    "model": "gpt-4o-mini",
+    "choices": [{"index": 0, "message": {"role": "assistant", "content": "A mock answer."}, "finish_reason": "stop"}],
+    "usage": {"prompt_tokens": 200, "completion_tokens": 4, "total_tokens": 204},
+}).encode()
+
+
+class MockServer:
+    """Keep-alive HTTP/1.1 server answering every POST with COMPLETION after latency_ms."""
+
+    def __init__(self, latency_ms: float = 0.0, ssl_context=None):
+        self.latency = latency_ms / 1000
+        self.ssl_context = ssl_context
+        self.connections = 0
+        self._writers = set()
+        self.port = None
+        self._ready = threading.Event()
+        self._loop = None
+
+    def __enter__(self) -> "MockServer":
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+    @property
+    def base_url(self) -> str:
+        scheme = "https" if self.ssl_context else "http"
+        return f"{scheme}://localhost:{self.port}/v1"
+
+    def _run(self) -> None:
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        server = self._loop.run_until_complete(
+            asyncio.start_server(self._handle, "127.0.0.1", 0, ssl=self.ssl_context)
+        )
+        self.port = server.sockets[0].getsockname()[1]
+        self._ready.set()
+        self._loop.run_forever()
+
+        # Stopped: close the connections clients left open and let their handlers finish
+        server.close()
+        for writer in list(self._writers):
+            writer.close()
+        self._loop.run_until_complete(asyncio.gather(*asyncio.all_tasks(self._loop), return_exceptions=True))
+        self._loop.close()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        self._writers.add(writer)
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = 0
+                for line in head.split(b"\r\n"):
+                    name, _, value = line.partition(b":")
+                    if name.strip().lower() == b"content-length":
+                        length = int(value)
+                await reader.readexactly(length)
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                    b"Content-Length: %d\r\nConnection: keep-alive\r\n\r\n%s" % (len(COMPLETION), COMPLETION)
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, ssl.SSLError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+
+def self_signed_certificate(directory: Path) -> tuple:
+    if shutil.which("openssl") is None:
+        raise SystemExit("--tls needs the openssl command line tool")
+    cert, key = directory / "cert.pem", directory / "key.pem"
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1", "-subj", "/CN=localhost",
+         "-addext", "subjectAltName=DNS:localhost", "-keyout", str(key), "-out", str(cert)],
+        check=True,
+        capture_output=True,
+    )
+    return cert, key
+
+
+def sdk_client(stats: http_pool.ConnectionStats, verify) -> httpx.AsyncClient:
+    return httpx.AsyncClient(limits=SDK_LIMITS, verify=verify, event_hooks={"request": [stats.aon_request]})
+
+
+async def run_scenario(name: str, base_url: str, args, verify) -> dict:
+    stats = http_pool.ConnectionStats()
+    shared = None
+    clients = []
+    if name == "shared":
+        shared = http_pool.create_async_http_client(stats, verify=verify)
+    elif name == "per-model":
+        clients = [sdk_client(stats, verify) for _ in range(args.models)]
+
+    body = {"model": "gpt-4o-mini", "messages": [{"role": "user", "content": "x" * args.prompt_chars}]}
+    latencies = []
+    queue = iter(range(args.requests))
+
+    async def call(i: int) -> None:
+        started = time.perf_counter()
+        if name == "per-request":
+            async with sdk_client(stats, verify) as client:
+                response = await client.post(f"{base_url}/chat/completions", json=body)
+        else:
+            client = shared or clients[i % len(clients)]
+            response = await client.post(f"{base_url}/chat/completions", json=body)
+        response.raise_for_status()
+        response.json()
+        latencies.append(time.perf_counter() - started)
+
+    async def worker() -> None:
+        for i in queue:
+            await call(i)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+    for client in clients + ([shared] if shared else []):
+        await client.aclose()
+
+    ms = 1000 * np.array(latencies)
+    return {
+        "scenario": name,
+        "requests_per_s": len(latencies) / elapsed,
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        **stats.stats(),
+    }
+
+
+async def main(args) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        server_context = None
+        verify = True
+        if args.tls:
+            cert, key = self_signed_certificate(Path(tmp))
+            server_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+            server_context.load_cert_chain(cert, key)
+            verify = ssl.create_default_context(cafile=str(cert))
+
+        with MockServer(args.latency_ms, server_context) as server:
+            rows = []
+            for name in ("per-request", "per-model", "shared"):
+                opened_before = server.connections
+                row = await run_scenario(name, server.base_url, args, verify)
+                row["server_connections"] = server.connections - opened_before
+                rows.append(row)
+
+    print(
+        f"{args.requests} requests, concurrency {args.concurrency}, {args.models} models, "
+        f"mock latency {args.latency_ms} ms, {'TLS' if args.tls else 'plain HTTP'}, "
+        f"HTTP/2 {'on' if http_pool.http2_enabled() else 'off'}\n"
+    )
+    print("| client | req/s | p50 ms | p95 ms | p99 ms | connections | TLS handshakes | reuse |")
+    print("|---|---|---|---|---|---|---|---|")
+    for row in rows:
+        print(
+            f"| {row['scenario']} | {row['requests_per_s']:.0f} | {row['p50_ms']:.2f} | {row['p95_ms']:.2f} "
+            f"| {row['p99_ms']:.2f} | {row['connections_opened']} | {row['tls_handshakes']} "
+            f"| {row['reuse_ratio']:.1%} |"
+        )
+    if args.output:
+        Path(args.output).write_text(json.dumps(rows, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--models", type=int, default=8, help="clients in the per-model scenario")
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="mock completion latency")
+    parser.add_argument("--prompt-chars", type=int, default=2000)
+    parser.add_argument("--tls", action="store_true", help="serve HTTPS with a self-signed certificate")
+    parser.add_argument("--output", help="also write the rows as JSON")
+    asyncio.run(main(parser.parse_args()))
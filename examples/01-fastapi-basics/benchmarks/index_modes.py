@@ -0,0 +1,141 @@
+"""
+Recall@k vs latency report for the index modes in retrieval.index_factory.
+
+Every mode is compared against exact IndexFlatL2 results on the same data.
+
+Usage (from examples/01-fastapi-basics):
+    python -m benchmarks.index_modes --num-vectors 200000 --k 10
+    python -m benchmarks.index_modes --corpus data/test.txt
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from retrieval import index_factory
+from retrieval.chunking import Chunk
+from retrieval.index_cache import load_cached_index, save_index
+
+SWEEPS = {
+    "flat": [{}],
+    "hnsw": [{"ef_search": ef} for ef in (16, 32, 64, 128, 256)],
+    "ivf_flat": [{"nprobe": n} for n in (1, 4, 16, 64)],
+    "ivf_pq": [{"nprobe": n} for n in (1, 4, 16, 64)],
+    "sq8": [{}],
+    "pq": [{}],
+}
+
+
+def synthetic_embeddings(num_vectors: int, dim: int, clusters: int = 256, seed: int = 0) -> np.ndarray:
+    """Unit-norm vectors drawn around random centres, roughly like sentence embeddings."""
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(clusters, dim)).astype("float32")
+    labels = rng.integers(0, clusters, size=num_vectors)
+    vectors = centres[labels] + 0.6 * rng.normal(size=(num_vectors, dim)).astype("float32")
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def corpus_embeddings(path: str) -> np.ndarray:
+    from sentence_transformers import SentenceTransformer
+
+    with open(path, "r", encoding="utf-8") as f:
+        sentences = [s for s in f.read().split(". ") if s.strip()]
+    return SentenceTransformer("all-MiniLM-L6-v2").encode(sentences).astype("float32")
+
+
+def recall_at_k(found: np.ndarray, exact: np.ndarray) -> float:
+    k = exact.shape[1]
+    hits = sum(len(set(f[f != -1]) & set(e)) for f, e in zip(found, exact))
+    return hits / (k * len(exact))
+
+
+def cache_load_ms(index, mode: str) -> float:
+    """Save the index to an index cache and load it back; fails if the cache cannot be read."""
+    chunks = [Chunk(text="", start=i, end=i) for i in range(index.ntotal)]
+    with tempfile.TemporaryDirectory() as tmp:
+        save_index(Path(tmp), {"mode": mode}, index, chunks)
+        started = time.perf_counter()
+        cached = load_cached_index(Path(tmp), {"mode": mode})
+        load_ms = 1000 * (time.perf_counter() - started)
+        if cached is None:
+            raise SystemExit(f"{mode}: a saved index cache did not load back")
+        if cached[0].ntotal != index.ntotal or type(cached[0]) is not type(index):
+            raise SystemExit(f"{mode}: the index loaded from the cache differs from the saved one")
+        del cached
+    return load_ms
+
+
+def run(vectors: np.ndarray, queries: np.ndarray, k: int, modes) -> list[dict]:
+    exact = index_factory.build_index(vectors, mode="flat")
+    _, truth = exact.search(queries, k)
+
+    rows = []
+    for mode in modes:
+        started = time.perf_counter()
+        index = index_factory.build_index(vectors, mode=mode)
+        build_s = time.perf_counter() - started
+        load_ms = cache_load_ms(index, mode)
+
+        for params in SWEEPS[mode]:
+            index_factory.tune_search(index, **params)
+
+            # Single-query latency is what a request sees; batch QPS is the throughput ceiling
+            latencies = []
+            found = []
+            for query in queries:
+                t0 = time.perf_counter()
+                _, ids = index.search(query[None, :], k)
+                latencies.append(time.perf_counter() - t0)
+                found.append(ids[0])
+
+            t0 = time.perf_counter()
+            index.search(queries, k)
+            batch_s = time.perf_counter() - t0
+
+            rows.append({
+                "mode": mode,
+                "params": ", ".join(f"{key}={value}" for key, value in params.items()) or "-",
+                "build_s": build_s,
+                "cache_load_ms": load_ms,
+                f"recall@{k}": recall_at_k(np.array(found), truth),
+                "p50_ms": 1000 * float(np.percentile(latencies, 50)),
+                "p95_ms": 1000 * float(np.percentile(latencies, 95)),
+                "batch_qps": len(queries) / batch_s,
+            })
+    return rows
+
+
+def print_table(rows: list[dict]) -> None:
+    headers = list(rows[0])
+    print("| " + " | ".join(headers) + " |")
+    print("|" + "|".join("---" for _ in headers) + "|")
+    for row in rows:
+        cells = [f"{v:.3f}" if isinstance(v, float) else str(v) for v in row.values()]
+        print("| " + " | ".join(cells) + " |")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--num-vectors", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--corpus", help="embed this text file instead of using synthetic vectors")
+    parser.add_argument("--modes", nargs="+", default=list(index_factory.INDEX_MODES))
+    args = parser.parse_args()
+
+    if args.corpus:
+        vectors = corpus_embeddings(args.corpus)
+    else:
+        vectors = synthetic_embeddings(args.num_vectors, args.dim)
+
+    # Queries are perturbed corpus vectors, so every query has true near neighbours
+    rng = np.random.default_rng(1)
+    picks = rng.choice(len(vectors), min(args.queries, len(vectors)), replace=False)
+    queries = vectors[picks] + 0.05 * rng.normal(size=(len(picks), vectors.shape[1])).astype("float32")
+
+    print(f"{len(vectors)} vectors, dim={vectors.shape[1]}, {len(queries)} queries, k={args.k}\n")
+    print_table(run(vectors, np.ascontiguousarray(queries, dtype="float32"), args.k, args.modes))
@@ -0,0 +1,248 @@
+"""
+In-process load test of the example apps, usable as a performance regression gate.
+
+Drives an ASGI app through httpx.ASGITransport (no sockets, no server) with
+--concurrency clients, each sending requests back to back for --duration
+seconds. Each request is drawn from a weighted mix. The embedding model,
+chat API and tokenizer are replaced by benchmarks.fakes before the app is
+imported, so the RAG routes run offline with a realistic latency profile.
+
+Reports throughput, latency percentiles and errors per mix entry and in
+total. A request is an error if it raises, answers with status >= 400 or
+sends an SSE "error" event. With any --max-*/--min-* threshold given, the
+exit status is 1 when the run breaks one, so CI can fail on regressions.
+
+A mix is a JSON list of {"method", "path", "json"?, "weight"?, "name"?}.
+"{i}" in the path or the JSON body becomes a per-request counter, so RAG
+questions do not all hit the answer cache. Built-in mixes: basics, rag,
+default (both), gateway (the root main.py's /graphs routes).
+
+Usage (from examples/01-fastapi-basics):
+    python -m benchmarks.load --concurrency 32 --duration 10
+    python -m benchmarks.load --mix rag --max-p95-ms 800 --max-error-rate 0 --min-rps 50
+    python -m benchmarks.load --app main:app --mix gateway   # the repository's gateway
+"""
+import argparse
+import asyncio
+import importlib
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import httpx
+import numpy as np
+
+from benchmarks import fakes
+
+EXAMPLE_DIR = Path(__file__).resolve().parents[1]
+REPOSITORY_DIR = EXAMPLE_DIR.parents[1]
+
+MIXES = {
+    "basics": [
+        {"name": "hello", "method": "GET", "path": "/fastapi-basics/hello", "weight": 1},
+        {"name": "hello_name", "method": "GET", "path": "/fastapi-basics/hello/user{i}", "weight": 1},
+        {
+            "name": "create_user",
+            "method": "POST",
+            "path": "/fastapi-basics/create_user",
+            "json": {"username": "user{i}", "email": "user{i}@example.com", "first_name": "Ada", "last_name": None},
+            "weight": 2,
+        },
+    ],
+    "rag": [
+        {
+            "name": "rag_stream",
+            "method": "GET",
+            "path": "/fastapi-basics/rag/stream?question=What+does+the+document+say+about+topic+{i}%3F",
+            "weight": 1,
+        },
+    ],
+    "gateway": [
+        {"name": "graphs", "method": "GET", "path": "/graphs", "weight": 1},
+        {
+            "name": "simple_graph",
+            "method": "POST",
+            "path": "/graphs/06-langgraph-fundamentals-module-1/simple_graph/invoke",
+            "json": {"input": {"graph_state": "Hi, this is run {i}."}},
+            "weight": 1,
+        },
+    ],
+}
+MIXES["default"] = MIXES["basics"] + MIXES["rag"]
+
+
+def load_mix(name_or_path: str) -> list:
+    if name_or_path in MIXES:
+        entries = MIXES[name_or_path]
+    else:
+        with open(name_or_path, "r", encoding="utf-8") as f:
+            entries = json.load(f)
+    return [
+        {"name": entry.get("name") or f"{entry['method']} {entry['path']}", "weight": 1, **entry}
+        for entry in entries
+    ]
+
+
+def fill(template, i: int):
+    """template with every "{i}" in its strings replaced by i."""
+    if isinstance(template, str):
+        return template.replace("{i}", str(i))
+    if isinstance(template, dict):
+        return {key: fill(value, i) for key, value in template.items()}
+    if isinstance(template, list):
+        return [fill(value, i) for value in template]
+    return template
+
+
+def import_app(target: str):
+    """"module.path:attribute"; example packages like 01-fastapi-basics are importable by name."""
+    for directory in (REPOSITORY_DIR, REPOSITORY_DIR / "examples"):
+        if str(directory) not in sys.path:
+            sys.path.insert(0, str(directory))
+    module_name, _, attribute = target.partition(":")
+    return getattr(importlib.import_module(module_name), attribute or "app")
+
+
+async def send(client: httpx.AsyncClient, entry: dict, i: int):
+    """(seconds, error or None) of one request, reading the whole response."""
+    started = time.perf_counter()
+    try:
+        async with client.stream(entry["method"], fill(entry["path"], i), json=fill(entry.get("json"), i)) as response:
+            body = await response.aread()
+        if response.status_code >= 400:
+            error = f"HTTP {response.status_code}"
+        elif response.headers.get("content-type", "").startswith("text/event-stream") and b"event: error" in body:
+            error = "SSE error event"
+        else:
+            error = None
+    except Exception as exc:
+        error = type(exc).__name__
+    return time.perf_counter() - started, error
+
+
+async def run(app, mix: list, concurrency: int, duration: float, seed: int) -> tuple:
+    results = defaultdict(list)  # entry name -> [(seconds, error)]
+    rng = random.Random(seed)
+    weights = [entry["weight"] for entry in mix]
+    counter = iter(range(sys.maxsize))
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=None) as client:
+        # Warm up every entry once: lazy imports, index loading and first-call caches are not the steady state
+        for entry in mix:
+            await send(client, entry, next(counter))
+
+        deadline = time.perf_counter() + duration
+
+        async def worker() -> None:
+            while time.perf_counter() < deadline:
+                entry = rng.choices(mix, weights)[0]
+                results[entry["name"]].append(await send(client, entry, next(counter)))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return results, elapsed
+
+
+def summarize(name: str, samples: list, elapsed: float) -> dict:
+    ms = 1000 * np.array([seconds for seconds, _ in samples] or [0.0])
+    errors = defaultdict(int)
+    for _, error in samples:
+        if error is not None:
+            errors[error] += 1
+    count = len(samples)
+    return {
+        "name": name,
+        "requests": count,
+        "requests_per_s": count / elapsed,
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "max_ms": float(ms.max()),
+        "errors": sum(errors.values()),
+        "error_rate": sum(errors.values()) / count if count else 0.0,
+        "error_kinds": dict(errors),
+    }
+
+
+def check_thresholds(total: dict, args) -> list:
+    """The thresholds the run broke, as messages; empty if it passed."""
+    broken = []
+    for key, limit, label in (
+        ("p50_ms", args.max_p50_ms, "p50"),
+        ("p95_ms", args.max_p95_ms, "p95"),
+        ("p99_ms", args.max_p99_ms, "p99"),
+    ):
+        if limit is not None and total[key] > limit:
+            broken.append(f"{label} {total[key]:.1f} ms > {limit} ms")
+    if args.max_error_rate is not None and total["error_rate"] > args.max_error_rate:
+        broken.append(f"error rate {total['error_rate']:.2%} > {args.max_error_rate:.2%}")
+    if args.min_rps is not None and total["requests_per_s"] < args.min_rps:
+        broken.append(f"throughput {total['requests_per_s']:.1f} req/s < {args.min_rps} req/s")
+    return broken
+
+
+def main(args) -> int:
+    # The fake index must not land in (or be read from) the real index cache
+    os.environ.setdefault("RAG_CACHE_DIR", tempfile.mkdtemp(prefix="rag-loadtest-"))
+    os.environ.pop("RAG_QUERY_CACHE_PATH", None)
+    fakes.install(fakes.FakeLatency(
+        embed_call_ms=args.embed_call_ms,
+        embed_item_ms=args.embed_item_ms,
+        llm_first_token_ms=args.llm_first_token_ms,
+        llm_token_ms=args.llm_token_ms,
+        llm_tokens=args.llm_tokens,
+    ))
+    app = import_app(args.app)
+    mix = load_mix(args.mix)
+
+    results, elapsed = asyncio.run(run(app, mix, args.concurrency, args.duration, args.seed))
+    rows = [summarize(entry["name"], results[entry["name"]], elapsed) for entry in mix]
+    total = summarize("total", [sample for entry in mix for sample in results[entry["name"]]], elapsed)
+
+    print(f"{args.app}, mix {args.mix}, concurrency {args.concurrency}, {elapsed:.1f} s\n")
+    print("| request | count | req/s | p50 ms | p95 ms | p99 ms | max ms | errors |")
+    print("|---|---|---|---|---|---|---|---|")
+    for row in rows + [total]:
+        kinds = ", ".join(f"{kind}: {count}" for kind, count in row["error_kinds"].items())
+        print(
+            f"| {row['name']} | {row['requests']} | {row['requests_per_s']:.1f} | {row['p50_ms']:.1f} "
+            f"| {row['p95_ms']:.1f} | {row['p99_ms']:.1f} | {row['max_ms']:.1f} | {row['errors']}"
+            f"{f' ({kinds})' if kinds else ''} |"
+        )
+    if args.output:
+        Path(args.output).write_text(json.dumps({"total": total, "requests": rows}, indent=2), encoding="utf-8")
+
+    broken = check_thresholds(total, args)
+    for message in broken:
+        print(f"FAIL: {message}", file=sys.stderr)
+    return 1 if broken else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--app", default="01-fastapi-basics.main:app", help="module:attribute of the ASGI app")
+    parser.add_argument("--mix", default="default", help=f"one of {', '.join(MIXES)}, or a JSON file")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds, after one warm-up request per entry")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="also write the results as JSON")
+    gate = parser.add_argument_group("regression gate (exit status 1 if broken)")
+    gate.add_argument("--max-p50-ms", type=float)
+    gate.add_argument("--max-p95-ms", type=float)
+    gate.add_argument("--max-p99-ms", type=float)
+    gate.add_argument("--max-error-rate", type=float, help="fraction, e.g. 0.01")
+    gate.add_argument("--min-rps", type=float)
+    backends = parser.add_argument_group("fake backends")
+    backends.add_argument("--embed-call-ms", type=float, default=5.0)
+    backends.add_argument("--embed-item-ms", type=float, default=0.5)
+    backends.add_argument("--llm-first-token-ms", type=float, default=300.0)
+    backends.add_argument("--llm-token-ms", type=float, default=10.0)
+    backends.add_argument("--llm-tokens", type=int, default=50)
+    sys.exit(main(parser.parse_args()))
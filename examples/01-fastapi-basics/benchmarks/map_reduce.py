@@ -0,0 +1,180 @@
+"""
+Wall-clock of "stuff" vs concurrent map-reduce answering over many chunks.
+
+A fake chat model stands in for the LLM: every call sleeps for a fixed
+overhead plus prompt processing time per input token plus generation time
+per output token, and fails if the prompt exceeds its context window. Map
+calls find evidence in a fixed fraction of the chunks (deterministically,
+by chunk hash) and return an extract of it, otherwise NONE.
+
+The chunks come from a large synthetic document; --k of them are answered
+from, as if retrieved. "stuff" sends them all in one prompt; map-reduce
+runs retrieval.map_reduce.amap_reduce at each --concurrency, and with
+--enough, stops mapping after that many relevant chunks.
+
+Usage (from examples/01-fastapi-basics):
+    python -m benchmarks.map_reduce --k 64 --concurrency 4,16,64 --enough 4
+    python -m benchmarks.map_reduce --k 512   # stuff overflows the window
+"""
+import argparse
+import asyncio
+import hashlib
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.e2e import synthetic_corpus
+from retrieval.map_reduce import MAP_PROMPT, NO_EVIDENCE, amap_reduce
+
+MAP_PREFIX = MAP_PROMPT.split("{context}")[0]
+# RetrievalQA's default "stuff" prompt
+STUFF_PROMPT = (
+    "Use the following pieces of context to answer the question at the end. If you don't know the answer, "
+    "just say that you don't know, don't try to make up an answer.\n\n{context}\n\nQuestion: {question}\nHelpful Answer:"
+)
+
+
+def count_tokens(text: str) -> int:
+    # ~4 tokens per 3 English words
+    return len(text.split()) * 4 // 3
+
+
+class ContextOverflow(Exception):
+    pass
+
+
+class FakeChatModel:
+    """Async completion with the latency profile of a hosted chat model."""
+
+    def __init__(self, args):
+        self.overhead = args.overhead_ms / 1000
+        self.prefill = args.prefill_ms_per_1k / 1000 / 1000
+        self.decode = args.decode_ms_per_token / 1000
+        self.window = args.context_window
+        self.relevant_fraction = args.relevant_fraction
+        self.extract_tokens = args.extract_tokens
+        self.answer_tokens = args.answer_tokens
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.max_prompt_tokens = 0
+
+    def _relevant(self, chunk: str) -> bool:
+        digest = hashlib.blake2b(chunk.encode("utf-8"), digest_size=2).digest()
+        return int.from_bytes(digest, "little") / 65536 < self.relevant_fraction
+
+    async def acomplete(self, prompt: str) -> str:
+        tokens = count_tokens(prompt)
+        self.calls += 1
+        self.prompt_tokens += tokens
+        self.max_prompt_tokens = max(self.max_prompt_tokens, tokens)
+        if tokens > self.window:
+            raise ContextOverflow(f"{tokens} prompt tokens > {self.window} token window")
+
+        if prompt.startswith(MAP_PREFIX):
+            chunk = prompt[len(MAP_PREFIX):].split("\n\nQuestion:")[0]
+            if self._relevant(chunk):
+                output = " ".join(chunk.split()[: self.extract_tokens * 3 // 4])
+            else:
+                output = NO_EVIDENCE
+        else:
+            output = " ".join(["answer"] * (self.answer_tokens * 3 // 4))
+        await asyncio.sleep(self.overhead + self.prefill * tokens + self.decode * max(1, count_tokens(output)))
+        return output
+
+
+def document_chunks(megabytes: float, chunk_tokens: int, seed: int) -> list:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "document.txt"
+        synthetic_corpus(path, megabytes, seed=seed)
+        words = path.read_text(encoding="utf-8").split()
+    size = chunk_tokens * 3 // 4
+    return [" ".join(words[i:i + size]) for i in range(0, len(words), size)]
+
+
+async def run_stuff(question: str, chunks: list, args) -> dict:
+    model = FakeChatModel(args)
+    started = time.perf_counter()
+    try:
+        await model.acomplete(STUFF_PROMPT.format(context="\n\n".join(chunks), question=question))
+        error = None
+    except ContextOverflow as exc:
+        error = str(exc)
+    return summary("stuff", model, time.perf_counter() - started, error=error)
+
+
+async def run_map_reduce(question: str, chunks: list, args, concurrency: int, enough) -> dict:
+    model = FakeChatModel(args)
+    partials = []
+    first = []
+    started = time.perf_counter()
+
+    def on_partial(partial):
+        if not first:
+            first.append(time.perf_counter() - started)
+        partials.append(partial)
+
+    await amap_reduce(question, chunks, model.acomplete, concurrency, enough, on_partial)
+    label = f"map_reduce c={concurrency}" + (f" enough={enough}" if enough else "")
+    return summary(
+        label,
+        model,
+        time.perf_counter() - started,
+        first_partial_s=first[0] if first else None,
+        relevant=sum(p.relevant for p in partials),
+    )
+
+
+def summary(label: str, model: FakeChatModel, seconds: float, **extra) -> dict:
+    return {
+        "mode": label,
+        "seconds": seconds,
+        "llm_calls": model.calls,
+        "prompt_tokens": model.prompt_tokens,
+        "max_prompt_tokens": model.max_prompt_tokens,
+        **extra,
+    }
+
+
+async def main(args) -> None:
+    chunks = document_chunks(args.document_mb, args.chunk_tokens, args.seed)
+    retrieved = chunks[: args.k]
+    question = "What does the document say about the quarterly results?"
+    print(
+        f"{len(chunks)} chunks of ~{args.chunk_tokens} tokens in a {args.document_mb} MB document, "
+        f"answering from {len(retrieved)}; {args.relevant_fraction:.0%} hold evidence\n"
+    )
+
+    rows = [await run_stuff(question, retrieved, args)]
+    for concurrency in [int(c) for c in args.concurrency.split(",")]:
+        rows.append(await run_map_reduce(question, retrieved, args, concurrency, None))
+        if args.enough:
+            rows.append(await run_map_reduce(question, retrieved, args, concurrency, args.enough))
+
+    # Calls are counted when they start: with early exit, cancelled ones are included
+    print("| mode | wall s | first partial s | LLM calls | prompt tokens | largest prompt | note |")
+    print("|---|---|---|---|---|---|---|")
+    for row in rows:
+        first = f"{row['first_partial_s']:.2f}" if row.get("first_partial_s") is not None else "-"
+        note = row.get("error") or (f"{row['relevant']} relevant" if "relevant" in row else "")
+        print(
+            f"| {row['mode']} | {row['seconds']:.2f} | {first} | {row['llm_calls']} | {row['prompt_tokens']} "
+            f"| {row['max_prompt_tokens']} | {note} |"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--document-mb", type=float, default=5.0)
+    parser.add_argument("--chunk-tokens", type=int, default=500)
+    parser.add_argument("--k", type=int, default=64, help="chunks answered from")
+    parser.add_argument("--concurrency", default="4,16,64", help="comma-separated map concurrency limits")
+    parser.add_argument("--enough", type=int, default=4, help="early exit after this many relevant chunks; 0 = off")
+    parser.add_argument("--relevant-fraction", type=float, default=0.2)
+    parser.add_argument("--overhead-ms", type=float, default=300, help="per call: network, queueing")
+    parser.add_argument("--prefill-ms-per-1k", type=float, default=60, help="per 1000 prompt tokens")
+    parser.add_argument("--decode-ms-per-token", type=float, default=12)
+    parser.add_argument("--context-window", type=int, default=128_000)
+    parser.add_argument("--extract-tokens", type=int, default=60, help="map output for a relevant chunk")
+    parser.add_argument("--answer-tokens", type=int, default=150)
+    parser.add_argument("--seed", type=int, default=0)
+    asyncio.run(main(parser.parse_args()))
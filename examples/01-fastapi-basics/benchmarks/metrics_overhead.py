@@ -0,0 +1,83 @@
+"""
+Per-request cost of metrics.MetricsMiddleware, and of a stage timer.
+
+Sends the same requests, in process through httpx.ASGITransport, to two
+apps with the example's routes: one with the middleware, one without. The
+difference in time per request is what the metrics cost. Also times
+metrics.stage() and /metrics rendering on their own.
+
+Usage (from examples/01-fastapi-basics):
+    python -m benchmarks.metrics_overhead --requests 5000
+"""
+import argparse
+import asyncio
+import importlib
+import sys
+import time
+from pathlib import Path
+
+import httpx
+from fastapi import FastAPI
+
+# main.py and routers.py use relative imports: load the example as a package, as uvicorn does
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+instrumented = importlib.import_module("01-fastapi-basics.main").app
+metrics = importlib.import_module("01-fastapi-basics.metrics")
+routers = importlib.import_module("01-fastapi-basics.routers")
+
+plain = FastAPI()
+plain.include_router(router=routers.router, prefix="/fastapi-basics")
+
+
+async def time_requests(apps: dict, paths: list, rounds: int) -> dict:
+    """Best of rounds per app, in microseconds per request; rounds alternate between the apps."""
+    clients = {
+        name: httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+        for name, app in apps.items()
+    }
+    best = dict.fromkeys(apps, float("inf"))
+    for client in clients.values():
+        for path in paths[:100]:
+            await client.get(path)
+    for _ in range(rounds):
+        for name, client in clients.items():
+            started = time.perf_counter()
+            for path in paths:
+                await client.get(path)
+            best[name] = min(best[name], time.perf_counter() - started)
+    for client in clients.values():
+        await client.aclose()
+    return {name: seconds / len(paths) * 1e6 for name, seconds in best.items()}
+
+
+def time_stage(count: int) -> float:
+    started = time.perf_counter()
+    for _ in range(count):
+        with metrics.stage("benchmark"):
+            pass
+    return (time.perf_counter() - started) / count * 1e6
+
+
+async def main(args) -> None:
+    paths = [f"/fastapi-basics/hello/user{i % 50}" if i % 2 else "/fastapi-basics/hello" for i in range(args.requests)]
+    timings = await time_requests({"without": plain, "with": instrumented}, paths, args.rounds)
+    without, with_metrics = timings["without"], timings["with"]
+    stage_us = time_stage(100_000)
+    started = time.perf_counter()
+    text = metrics.render()
+    render_ms = (time.perf_counter() - started) * 1000
+
+    print(f"{args.requests} GET requests, best of {args.rounds}\n")
+    print("| | us/request |")
+    print("|---|---|")
+    print(f"| without middleware | {without:.1f} |")
+    print(f"| with MetricsMiddleware | {with_metrics:.1f} |")
+    print(f"| overhead | {with_metrics - without:.1f} ({(with_metrics - without) / without:.1%}) |")
+    print(f"\nmetrics.stage(): {stage_us:.2f} us; rendering /metrics ({len(text.splitlines())} lines): {render_ms:.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--rounds", type=int, default=5)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,93 @@
+"""
+Load test: micro-batched vs unbatched retrieval under concurrent requests.
+
+The encoder is simulated with a fixed cost per call plus a cost per query
+(defaults are in the range of MiniLM on CPU). Calls are serialized, as a
+CPU-bound encoder already using every core effectively is. The search is a
+real FAISS IndexFlatL2, so the numbers show what batching saves without
+downloading a model.
+
+Usage (from examples/01-fastapi-basics):
+    python -m benchmarks.microbatch_load --concurrency 64 --duration 5
+"""
+import argparse
+import asyncio
+import threading
+import time
+
+import faiss
+import numpy as np
+
+from retrieval.microbatch import MicroBatcher
+
+
+def make_retrieve(num_vectors: int, dim: int, call_ms: float, item_ms: float, k: int):
+    rng = np.random.default_rng(0)
+    index = faiss.IndexFlatL2(dim)
+    index.add(rng.random((num_vectors, dim), dtype="float32"))
+    encoder = threading.Lock()
+
+    def retrieve(queries):
+        # Stand-in for embed_model.encode: per-call overhead dominates small batches
+        with encoder:
+            time.sleep((call_ms + item_ms * len(queries)) / 1000)
+        embeddings = rng.random((len(queries), dim), dtype="float32")
+        _, ids = index.search(embeddings, k)
+        return ids.tolist()
+
+    return retrieve
+
+
+async def drive(call, concurrency: int, duration: float) -> list:
+    latencies = []
+    deadline = time.perf_counter() + duration
+
+    async def client(worker: int):
+        n = 0
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            await call(f"question {worker}-{n}")
+            latencies.append(time.perf_counter() - started)
+            n += 1
+
+    await asyncio.gather(*(client(worker) for worker in range(concurrency)))
+    return latencies
+
+
+def report(label: str, latencies: list, duration: float, extra: str = "") -> None:
+    ms = 1000 * np.array(latencies)
+    print(
+        f"{label:<12} {len(latencies) / duration:>9.1f} req/s  "
+        f"p50 {np.percentile(ms, 50):>7.1f} ms  p95 {np.percentile(ms, 95):>7.1f} ms  "
+        f"p99 {np.percentile(ms, 99):>7.1f} ms  {extra}"
+    )
+
+
+async def main(args) -> None:
+    retrieve = make_retrieve(args.num_vectors, args.dim, args.call_ms, args.item_ms, args.k)
+
+    async def unbatched(question):
+        return (await asyncio.to_thread(retrieve, [question]))[0]
+
+    latencies = await drive(unbatched, args.concurrency, args.duration)
+    report("unbatched", latencies, args.duration)
+
+    batcher = MicroBatcher(retrieve, max_batch_size=args.max_batch_size, max_wait_ms=args.window_ms)
+    latencies = await drive(batcher.submit, args.concurrency, args.duration)
+    stats = batcher.stats()
+    report("batched", latencies, args.duration, f"mean batch {stats['mean_batch_size']:.1f}")
+    await batcher.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--window-ms", type=float, default=5.0)
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    parser.add_argument("--call-ms", type=float, default=8.0, help="simulated encode cost per call")
+    parser.add_argument("--item-ms", type=float, default=0.5, help="simulated encode cost per query")
+    parser.add_argument("--num-vectors", type=int, default=50_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--k", type=int, default=3)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,123 @@
+"""
+Memory per worker and recall for the vector/chunk storage modes.
+
+For every combination of vector encoding (flat float32, sq8, pq) and chunk
+storage (memory, mmap) the index is written to a cache directory and opened
+by several worker processes at once, the way uvicorn/gunicorn workers would.
+Each worker runs queries and reads the retrieved chunks, then reports:
+
+- RSS: resident memory, counting shared pages in full for every process
+- PSS: proportional set size, shared pages divided between the processes
+- USS: memory private to the worker (what one more worker really costs)
+
+PSS/USS come from /proc/self/smaps_rollup and are Linux-only.
+
+Usage (from examples/01-fastapi-basics):
+    python -m benchmarks.storage_modes --num-vectors 200000 --workers 4
+"""
+import argparse
+import multiprocessing
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks.index_modes import recall_at_k, synthetic_embeddings
+from retrieval import index_factory
+from retrieval.chunking import Chunk
+from retrieval.index_cache import load_cached_index, save_index
+
+VECTOR_MODES = ("flat", "sq8", "pq")
+CHUNK_STORAGE = ("memory", "mmap")
+
+
+def memory_kb() -> dict:
+    usage = {"rss": 0, "pss": 0, "uss": 0}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                name, value = line.split(":", 1)
+                kb = int(value.split()[0])
+                if name == "Rss":
+                    usage["rss"] = kb
+                elif name == "Pss":
+                    usage["pss"] = kb
+                elif name in ("Private_Clean", "Private_Dirty"):
+                    usage["uss"] += kb
+    except FileNotFoundError:
+        import resource
+
+        usage["rss"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage
+
+
+def worker(cache_dir, manifest, use_mmap, queries, k, barrier, results):
+    index, chunks = load_cached_index(Path(cache_dir), manifest, use_mmap=use_mmap)
+    _, ids = index.search(queries, k)
+    # Touch the retrieved texts like a request would
+    retrieved = sum(len(chunks[i].text) for row in ids for i in row if i != -1)
+    barrier.wait()  # measure while every worker is alive and mapped
+    results.put((memory_kb(), retrieved))
+    barrier.wait()
+
+
+def measure(cache_dir, manifest, use_mmap, queries, k, workers) -> dict:
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(workers)
+    results = context.Queue()
+    processes = [
+        context.Process(target=worker, args=(cache_dir, manifest, use_mmap, queries, k, barrier, results))
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    usages = [results.get()[0] for _ in processes]
+    for process in processes:
+        process.join()
+    return {key: np.mean([usage[key] for usage in usages]) / 1024 for key in ("rss", "pss", "uss")}
+
+
+def synthetic_chunks(count: int, chars: int = 1000) -> list:
+    words = ["alpha", "beta", "gamma", "delta", "epsilon", "zeta", "eta", "theta"]
+    rng = np.random.default_rng(0)
+    chunks = []
+    for i in range(count):
+        text = " ".join(rng.choice(words, chars // 6))
+        chunks.append(Chunk(text=text, start=i * chars, end=(i + 1) * chars))
+    return chunks
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--num-vectors", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    vectors = synthetic_embeddings(args.num_vectors, args.dim)
+    chunks = synthetic_chunks(args.num_vectors)
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.choice(len(vectors), args.queries, replace=False)]
+    _, truth = index_factory.build_index(vectors, mode="flat").search(queries, args.k)
+
+    print(f"{args.num_vectors} vectors, dim={args.dim}, {args.workers} workers, MB per worker\n")
+    print(f"| vectors | chunks | index MB | recall@{args.k} | RSS | PSS | USS |")
+    print("|---|---|---|---|---|---|---|")
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in VECTOR_MODES:
+            index = index_factory.build_index(vectors, mode=mode)
+            _, found = index.search(queries, args.k)
+            cache_dir = Path(tmp) / mode
+            manifest = {"mode": mode}
+            save_index(cache_dir, manifest, index, chunks)
+            del index
+            index_mb = (cache_dir / "index.faiss").stat().st_size / 1e6
+
+            for storage in CHUNK_STORAGE:
+                usage = measure(str(cache_dir), manifest, storage == "mmap", queries, args.k, args.workers)
+                print(
+                    f"| {mode} | {storage} | {index_mb:.1f} | {recall_at_k(found, truth):.3f} | "
+                    f"{usage['rss']:.1f} | {usage['pss']:.1f} | {usage['uss']:.1f} |"
+                )
@@ -0,0 +1,270 @@
+import atexit
+import importlib.util
+import ipaddress
+import itertools
+import math
+import os
+import ssl
+import threading
+import urllib.request
+from functools import lru_cache
+from typing import Dict, Optional
+
+import httpx
+
+OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
+# Connections open at once, and how many idle ones are kept for reuse; fewer
+# kept than concurrent requests means closing and reopening them all the time
+HTTP_MAX_CONNECTIONS = int(os.getenv("RAG_HTTP_MAX_CONNECTIONS", 100))
+HTTP_MAX_KEEPALIVE = int(os.getenv("RAG_HTTP_MAX_KEEPALIVE", HTTP_MAX_CONNECTIONS))
+# Seconds an idle connection stays in the pool
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("RAG_HTTP_KEEPALIVE_EXPIRY", 30))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("RAG_HTTP_CONNECT_TIMEOUT", 5))
+# Also bounds the gap between two streamed tokens
+HTTP_READ_TIMEOUT = float(os.getenv("RAG_HTTP_READ_TIMEOUT", 60))
+# "auto" uses HTTP/2 when the h2 package is installed, "on" requires it, "off" never
+HTTP2 = os.getenv("RAG_HTTP2", "auto")
+# Connection pools the limits above are split over; see ShardedTransport.
+# With HTTP/2 there is always one: it multiplexes requests over a connection
+HTTP_POOL_SHARDS = int(os.getenv("RAG_HTTP_POOL_SHARDS", 8))
+
+LIMITS = httpx.Limits(
+    max_connections=HTTP_MAX_CONNECTIONS,
+    max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+    keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+)
+TIMEOUT = httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT)
+
+
+def http2_enabled() -> bool:
+    return HTTP2 == "on" or (HTTP2 == "auto" and importlib.util.find_spec("h2") is not None)
+
+
+class ConnectionStats:
+    """
+    Requests and the connections opened for them, counted from httpcore trace events.
+
+    Every request that did not open a TCP connection reused a pooled one.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.connections = 0
+        self.tls_handshakes = 0
+        self.http2_requests = 0
+
+    def _record(self, event_name: str) -> None:
+        with self._lock:
+            if event_name == "connection.connect_tcp.complete":
+                self.connections += 1
+            elif event_name == "connection.start_tls.complete":
+                self.tls_handshakes += 1
+            elif event_name == "http2.send_request_headers.started":
+                self.http2_requests += 1
+
+    def trace(self, event_name: str, info: dict) -> None:
+        self._record(event_name)
+
+    async def atrace(self, event_name: str, info: dict) -> None:
+        self._record(event_name)
+
+    def on_request(self, request: httpx.Request) -> None:
+        with self._lock:
+            self.requests += 1
+        request.extensions["trace"] = self.trace
+
+    async def aon_request(self, request: httpx.Request) -> None:
+        with self._lock:
+            self.requests += 1
+        # The async transport awaits its trace callback
+        request.extensions["trace"] = self.atrace
+
+    def reset(self) -> None:
+        with self._lock:
+            self.requests = self.connections = self.tls_handshakes = self.http2_requests = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            reused = max(0, self.requests - self.connections)
+            return {
+                "requests": self.requests,
+                "connections_opened": self.connections,
+                "tls_handshakes": self.tls_handshakes,
+                "reused_connections": reused,
+                "reuse_ratio": reused / self.requests if self.requests else 0.0,
+                "http2_requests": self.http2_requests,
+            }
+
+
+connection_stats = ConnectionStats()
+
+
+class ShardedTransport(httpx.BaseTransport):
+    """
+    Requests spread round-robin over several connection pools.
+
+    httpcore matches every waiting request against every connection of its
+    pool on each request, which makes one pool CPU bound at a few dozen
+    concurrent requests. Pools of limits / shards connections each keep
+    that cheap while the client, and the total limits, stay shared.
+    """
+
+    def __init__(self, shards: int = HTTP_POOL_SHARDS, limits: httpx.Limits = LIMITS, verify=True, **kwargs):
+        limits = _split_limits(limits, shards)
+        verify = _ssl_context(verify)
+        self._transports = [httpx.HTTPTransport(limits=limits, verify=verify, **kwargs) for _ in range(shards)]
+        self._next = itertools.cycle(self._transports)
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        return next(self._next).handle_request(request)
+
+    def close(self) -> None:
+        for transport in self._transports:
+            transport.close()
+
+
+class AsyncShardedTransport(httpx.AsyncBaseTransport):
+    """ShardedTransport for httpx.AsyncClient."""
+
+    def __init__(self, shards: int = HTTP_POOL_SHARDS, limits: httpx.Limits = LIMITS, verify=True, **kwargs):
+        limits = _split_limits(limits, shards)
+        verify = _ssl_context(verify)
+        self._transports = [httpx.AsyncHTTPTransport(limits=limits, verify=verify, **kwargs) for _ in range(shards)]
+        self._next = itertools.cycle(self._transports)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await next(self._next).handle_async_request(request)
+
+    async def aclose(self) -> None:
+        for transport in self._transports:
+            await transport.aclose()
+
+
+def _ssl_context(verify):
+    # Loading the CA bundle takes milliseconds: do it once for all shards
+    return verify if isinstance(verify, ssl.SSLContext) else httpx.create_ssl_context(verify=verify)
+
+
+def _split_limits(limits: httpx.Limits, shards: int) -> httpx.Limits:
+    def share(limit):
+        return None if limit is None else max(1, math.ceil(limit / shards))
+
+    return httpx.Limits(
+        max_connections=share(limits.max_connections),
+        max_keepalive_connections=share(limits.max_keepalive_connections),
+        keepalive_expiry=limits.keepalive_expiry,
+    )
+
+
+def pool_shards() -> int:
+    # An HTTP/2 pool sends every request over one multiplexed connection per
+    # host; more pools would only mean more connections and TLS handshakes
+    return 1 if http2_enabled() else HTTP_POOL_SHARDS
+
+
+def environment_proxies() -> Dict[str, Optional[str]]:
+    """
+    Mount patterns for the proxy variables, mapped to a proxy URL or to None for no proxy.
+
+    HTTP_PROXY, HTTPS_PROXY and ALL_PROXY give "http://", "https://" and
+    "all://"; a proxy without a scheme is an http:// one. NO_PROXY entries
+    follow curl: "*" turns every proxy off, IP addresses, networks and
+    localhost match those hosts only, and a domain matches itself and its subdomains
+    (".example.com" only the subdomains).
+    """
+    # getproxies() also reads the system settings on Windows and macOS
+    settings = urllib.request.getproxies()
+    mounts: Dict[str, Optional[str]] = {}
+    for scheme in ("http", "https", "all"):
+        proxy = settings.get(scheme)
+        if proxy:
+            mounts[f"{scheme}://"] = proxy if "://" in proxy else f"http://{proxy}"
+
+    for host in (host.strip() for host in settings.get("no", "").split(",")):
+        if host == "*":
+            return {}
+        if not host:
+            continue
+        if "://" in host:
+            mounts[host] = None
+            continue
+        try:
+            # An address or a network such as 192.168.0.0/16
+            network = ipaddress.ip_network(host, strict=False)
+        except ValueError:
+            network = None
+        if isinstance(network, ipaddress.IPv6Network):
+            mounts[f"all://[{host}]"] = None
+        elif network is not None or host.lower() == "localhost":
+            mounts[f"all://{host}"] = None
+        else:
+            mounts[f"all://*{host}"] = None
+    return mounts
+
+
+def proxy_mounts(transport_class, trust_env: bool = True, **transport_kwargs) -> dict:
+    """
+    Transports for HTTP_PROXY, HTTPS_PROXY, ALL_PROXY and NO_PROXY, as httpx.Client(mounts=...).
+
+    httpx reads these variables only for clients without a custom transport,
+    so clients with a sharded one mount them here (see environment_proxies).
+    NO_PROXY hosts map to None, i.e. the client's own transport.
+    """
+    if not trust_env:
+        return {}
+    return {
+        pattern: None if proxy is None else transport_class(proxy=proxy, **transport_kwargs)
+        for pattern, proxy in environment_proxies().items()
+    }
+
+
+def create_http_client(stats: ConnectionStats = connection_stats, verify=True, **kwargs) -> httpx.Client:
+    # With a custom transport, limits, HTTP/2, TLS and proxy settings belong to the transports
+    transport_kwargs = {"shards": pool_shards(), "http2": http2_enabled(), "verify": verify}
+    return httpx.Client(
+        transport=ShardedTransport(**transport_kwargs),
+        mounts=proxy_mounts(ShardedTransport, kwargs.get("trust_env", True), **transport_kwargs),
+        timeout=TIMEOUT,
+        event_hooks={"request": [stats.on_request]},
+        **kwargs,
+    )
+
+
+def create_async_http_client(
+    stats: ConnectionStats = connection_stats, verify=True, **kwargs
+) -> httpx.AsyncClient:
+    transport_kwargs = {"shards": pool_shards(), "http2": http2_enabled(), "verify": verify}
+    return httpx.AsyncClient(
+        transport=AsyncShardedTransport(**transport_kwargs),
+        mounts=proxy_mounts(AsyncShardedTransport, kwargs.get("trust_env", True), **transport_kwargs),
+        timeout=TIMEOUT,
+        event_hooks={"request": [stats.aon_request]},
+        **kwargs,
+    )
+
+
+# Every OpenAI / ChatOpenAI client builds its own connection pool unless it is
+# given one, so each model instance pays its own TCP and TLS handshakes. These
+# two are created once per process and shared by all chat models.
+@lru_cache(maxsize=None)
+def get_http_client() -> httpx.Client:
+    """The process-wide sync client, closed at exit."""
+    client = create_http_client()
+    atexit.register(client.close)
+    return client
+
+
+@lru_cache(maxsize=None)
+def get_async_http_client() -> httpx.AsyncClient:
+    """
+    The process-wide async client.
+
+    Its connections belong to the event loop that opened them: share it
+    within one loop (the FastAPI server's), not across asyncio.run() calls.
+    """
+    return create_async_http_client()
+
+
+def stats() -> dict:
+    return {"http2": http2_enabled(), "pool_shards": pool_shards(), **connection_stats.stats()}
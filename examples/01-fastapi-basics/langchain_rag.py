@@ -1,15 +1,61 @@
+import asyncio
+import hashlib
+import json
 import os
-from typing import Optional
+import shutil
+from pathlib import Path
+from typing import Callable, List, Optional
 
 from pydantic import Field, SecretStr
 from langchain_community.document_loaders import TextLoader
+from langchain.embeddings import CacheBackedEmbeddings
+from langchain.storage import LocalFileStore
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.embeddings import SentenceTransformerEmbeddings
 from langchain_community.vectorstores import FAISS
 from langchain.chains import RetrievalQA
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
 from langchain_openai import ChatOpenAI
 from langchain_core.utils.utils import secret_from_env
 
+try:
+    from . import http_pool
+    from .retrieval.embed_pool import EmbeddingPool
+    from .retrieval.index_cache import build_manifest
+    from .retrieval.map_reduce import Partial, amap_reduce
+except ImportError:
+    # Running as a script (python langchain_rag.py) rather than as part of the package
+    import http_pool
+    from retrieval.embed_pool import EmbeddingPool
+    from retrieval.index_cache import build_manifest
+    from retrieval.map_reduce import Partial, amap_reduce
+
+EMBED_MODEL_NAME = "all-MiniLM-L6-v2"
+CHUNK_SIZE = 500
+CHUNK_OVERLAP = 50
+# Use path relative to this file
+DATA_PATH = Path(__file__).parent / "data" / "test.txt"
+# Saved vector stores and the embedding cache live in <RAG_CACHE_DIR>/langchain
+CACHE_DIR = Path(os.getenv("RAG_CACHE_DIR", Path(__file__).parent / ".index_cache")) / "langchain"
+# "disk" reuses the saved FAISS store while the corpus fingerprint matches and
+# caches every embedding by text hash; "off" rebuilds in memory on every run
+VECTORSTORE_CACHE = os.getenv("RAG_VECTORSTORE_CACHE", "disk")
+# Processes embedding the documents when the index is built, each with its
+# own model; 0 encodes in this process
+EMBED_WORKERS = int(os.getenv("RAG_EMBED_WORKERS", 0))
+# Documents per model.encode batch inside each embedding worker
+EMBED_BATCH_SIZE = int(os.getenv("RAG_EMBED_BATCH_SIZE", 32))
+# "stuff" puts every retrieved chunk into one prompt; "map_reduce" condenses
+# each chunk with its own concurrent call and answers from the extracts
+CHAIN_TYPE = os.getenv("RAG_CHAIN_TYPE", "stuff")
+# Chunks retrieved per question
+RETRIEVER_K = int(os.getenv("RAG_RETRIEVER_K", 4))
+# Map calls running at once
+MAP_CONCURRENCY = int(os.getenv("RAG_MAP_CONCURRENCY", 8))
+# Stop mapping once this many chunks turned out relevant; 0 maps all of them
+MAP_ENOUGH_EVIDENCE = int(os.getenv("RAG_MAP_ENOUGH_EVIDENCE", 0))
+
 class ChatOpenRouter(ChatOpenAI):
     openai_api_key: Optional[SecretStr] = Field(
         alias="api_key",
@@ -27,32 +73,164 @@ class ChatOpenRouter(ChatOpenAI):
         openai_api_key = (
             openai_api_key or os.environ.get("OPENROUTER_API_KEY")
         )
+        # Unless given their own, all instances share one connection pool per process
+        kwargs.setdefault("http_client", http_pool.get_http_client())
+        kwargs.setdefault("http_async_client", http_pool.get_async_http_client())
+        kwargs.setdefault("timeout", http_pool.TIMEOUT)
         super().__init__(
-            base_url="https://openrouter.ai/api/v1",
+            base_url=http_pool.OPENROUTER_BASE_URL,
             openai_api_key=openai_api_key,
             **kwargs
         )
 
-loader = TextLoader("day_1/data/test.txt")
-documents = loader.load()
 
-text_splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50)
-docs = text_splitter.split_documents(documents)
+class PooledEmbeddings(Embeddings):
+    """Documents embedded by an EmbeddingPool, queries by `embedding` in this process."""
+
+    def __init__(self, pool: EmbeddingPool, embedding: Embeddings):
+        self.pool = pool
+        self.embedding = embedding
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.pool.encode(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embedding.embed_query(text)
+
+
+def cached_embeddings(embedding: Embeddings, model_name: str = EMBED_MODEL_NAME) -> Embeddings:
+    """
+    `embedding` behind an on-disk cache of document vectors keyed by the SHA-256 of each text.
+
+    Only documents never seen before reach the model. Queries are not
+    cached: every distinct question would add a file, with nothing to bound
+    them, and one query costs a single model call. The namespace keeps
+    vectors of different models apart.
+    """
+    if VECTORSTORE_CACHE == "off":
+        return embedding
+    return CacheBackedEmbeddings.from_bytes_store(
+        embedding,
+        LocalFileStore(CACHE_DIR / "embeddings"),
+        namespace=model_name,
+        key_encoder="sha256",
+    )
 
-embedding = SentenceTransformerEmbeddings(model_name="all-MiniLM-L6-v2")
 
-vectorstore = FAISS.from_documents(docs, embedding)
+def split_documents(source: Path = DATA_PATH) -> List[Document]:
+    documents = TextLoader(str(source), encoding="utf-8").load()
+    text_splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    return text_splitter.split_documents(documents)
+
+
+def corpus_fingerprint(source: Path = DATA_PATH) -> str:
+    """Hash of the source file, the embedding model and the splitter settings."""
+    manifest = build_manifest(
+        source, EMBED_MODEL_NAME, splitter="recursive", chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP
+    )
+    return hashlib.sha256(json.dumps(manifest, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def build_vectorstore(docs, embedding: SentenceTransformerEmbeddings) -> FAISS:
+    """
+    FAISS.from_documents through the embedding cache.
+
+    With EMBED_WORKERS set, the documents missing from the cache are
+    embedded by an EmbeddingPool.
+    """
+    if not EMBED_WORKERS:
+        return FAISS.from_documents(docs, cached_embeddings(embedding))
+
+    texts = [doc.page_content for doc in docs]
+    with EmbeddingPool(embedding.model_name, EMBED_WORKERS, batch_size=EMBED_BATCH_SIZE) as pool:
+        vectors = cached_embeddings(PooledEmbeddings(pool, embedding)).embed_documents(texts)
+    # Queries are still embedded in this process by `embedding`
+    return FAISS.from_embeddings(
+        zip(texts, vectors), cached_embeddings(embedding), metadatas=[doc.metadata for doc in docs]
+    )
 
-llm = ChatOpenRouter(
-    model_name="gpt-4o-mini",
-)
 
-qa = RetrievalQA.from_chain_type(
-    llm=llm,
-    chain_type="stuff",
-    retriever=vectorstore.as_retriever(),
-)
+def load_or_build_vectorstore(source: Path = DATA_PATH, embedding: Optional[Embeddings] = None) -> FAISS:
+    """
+    The FAISS store saved for the current corpus fingerprint, built and saved if there is none.
 
-query = "Розкажи суть цього документу"
-result = qa.run(query)
-print(result)
+    A saved store is loaded without reading or splitting the source at all;
+    any change to the file, the model or the splitter settings gives a new
+    fingerprint, and the stores of older fingerprints are deleted.
+    """
+    source = Path(source)
+    embedding = embedding or SentenceTransformerEmbeddings(model_name=EMBED_MODEL_NAME)
+    if VECTORSTORE_CACHE == "off":
+        return build_vectorstore(split_documents(source), embedding)
+
+    folder = CACHE_DIR / "faiss" / f"{source.stem}-{corpus_fingerprint(source)}"
+    if folder.is_dir():
+        # The pickled docstore was written by save_local below, not taken from elsewhere
+        return FAISS.load_local(str(folder), cached_embeddings(embedding), allow_dangerous_deserialization=True)
+
+    vectorstore = build_vectorstore(split_documents(source), embedding)
+    # Save next to the target and rename, so a half-written store is never loaded
+    tmp = folder.with_name(folder.name + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    vectorstore.save_local(str(tmp))
+    os.replace(tmp, folder)
+    for stale in folder.parent.glob(f"{source.stem}-{'[0-9a-f]' * 16}"):
+        if stale != folder:
+            shutil.rmtree(stale, ignore_errors=True)
+    return vectorstore
+
+
+async def amap_reduce_answer(
+    question: str,
+    vectorstore: FAISS,
+    llm: ChatOpenAI,
+    k: int = RETRIEVER_K,
+    on_partial: Optional[Callable[[Partial], None]] = None,
+) -> str:
+    """
+    Map-reduce counterpart of RetrievalQA's "stuff" chain.
+
+    The k retrieved chunks are condensed by concurrent map calls (at most
+    MAP_CONCURRENCY at once, stopping early after MAP_ENOUGH_EVIDENCE
+    relevant ones if set), and one reduce call answers from the extracts.
+    No prompt ever holds more than one chunk or the extracts.
+    """
+    docs = await vectorstore.as_retriever(search_kwargs={"k": k}).ainvoke(question)
+
+    async def acomplete(prompt: str) -> str:
+        return (await llm.ainvoke(prompt)).content
+
+    return await amap_reduce(
+        question,
+        [doc.page_content for doc in docs],
+        acomplete,
+        max_concurrency=MAP_CONCURRENCY,
+        enough=MAP_ENOUGH_EVIDENCE or None,
+        on_partial=on_partial,
+    )
+
+
+def print_partial(partial: Partial) -> None:
+    status = "relevant" if partial.relevant else "no evidence"
+    print(f"[chunk {partial.index}, {partial.seconds:.1f}s, {status}] {partial.text.strip()[:200]}")
+
+
+# Embedding pool workers re-import this script, so nothing may run at import
+if __name__ == "__main__":
+    vectorstore = load_or_build_vectorstore(DATA_PATH)
+
+    llm = ChatOpenRouter(
+        model_name="gpt-4o-mini",
+    )
+
+    query = "Розкажи суть цього документу"
+    if CHAIN_TYPE == "map_reduce":
+        result = asyncio.run(amap_reduce_answer(query, vectorstore, llm, on_partial=print_partial))
+    else:
+        qa = RetrievalQA.from_chain_type(
+            llm=llm,
+            chain_type="stuff",
+            retriever=vectorstore.as_retriever(search_kwargs={"k": RETRIEVER_K}),
+        )
+        result = qa.run(query)
+    print(result)
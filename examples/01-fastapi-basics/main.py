@@ -1,4 +1,6 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
+
+from . import metrics
 from .routers import router
 
 app = FastAPI(
@@ -11,4 +13,11 @@ app.include_router(
     router=router,
     prefix="/fastapi-basics",
     tags=["FastAPI Basics"]
-)
\ No newline at end of file
+)
+
+app.add_middleware(metrics.MetricsMiddleware)
+
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
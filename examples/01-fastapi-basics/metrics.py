@@ -0,0 +1,213 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Sequence, Tuple
+
+# What Prometheus expects from a text-format scrape
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+# Requests that matched no route share one label, so random paths cannot grow the series without bound
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    def escape(value: str) -> str:
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    return ",".join(f'{name}="{escape(value)}"' for name, value in zip(names, values))
+
+
+class Histogram:
+    """
+    A Prometheus histogram with one series per label values tuple.
+
+    observe() is a bisect and three additions under a lock: cheap enough
+    for every request, and safe from worker threads.
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str], buckets: Sequence[float]):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        # labels -> [count per bucket..., count above the last bucket, sum]
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, labels: Tuple[str, ...], value: float) -> None:
+        bucket = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[bucket] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            snapshot = {labels: list(series) for labels, series in self._series.items()}
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, series in sorted(snapshot.items()):
+            label_text = _format_labels(self.labelnames, labels)
+            prefix = f"{label_text}," if label_text else ""
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                lines.append(f'{self.name}_bucket{{{prefix}le="{le}"}} {cumulative}')
+            braces = f"{{{label_text}}}" if label_text else ""
+            lines.append(f"{self.name}_sum{braces} {series[-1]!r}")
+            lines.append(f"{self.name}_count{braces} {cumulative}")
+        return lines
+
+
+class Gauge:
+    """A value that goes up and down, without labels."""
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self._lock = threading.Lock()
+        self.value = 0
+
+    def inc(self, amount: int = 1) -> None:
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: int = 1) -> None:
+        with self._lock:
+            self.value -= amount
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge", f"{self.name} {self.value}"]
+
+
+request_seconds = Histogram(
+    "http_request_duration_seconds",
+    "Time from the request arriving to the last byte of the response.",
+    ("method", "route", "status"),
+    LATENCY_BUCKETS,
+)
+request_bytes = Histogram(
+    "http_request_size_bytes", "Request body size.", ("method", "route"), SIZE_BUCKETS
+)
+response_bytes = Histogram(
+    "http_response_size_bytes", "Response body size.", ("method", "route"), SIZE_BUCKETS
+)
+requests_in_flight = Gauge("http_requests_in_flight", "Requests being handled right now.")
+stage_seconds = Histogram(
+    "rag_stage_seconds",
+    "Time spent in a named stage of answering: embed, search, llm_first_token, llm_total.",
+    ("stage",),
+    LATENCY_BUCKETS,
+)
+METRICS = [request_seconds, request_bytes, response_bytes, requests_in_flight, stage_seconds]
+
+
+def observe_stage(name: str, seconds: float) -> None:
+    """Record a stage timed by the caller, e.g. the time to an LLM's first token."""
+    stage_seconds.observe((name,), seconds)
+
+
+@contextmanager
+def stage(name: str):
+    """
+    Time the block as the named stage.
+
+        with metrics.stage("embed"):
+            embeddings = embed_model.encode(queries)
+
+    A stage run once for a micro-batch of questions is recorded once.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_seconds.observe((name,), time.perf_counter() - started)
+
+
+def render() -> str:
+    return "\n".join(line for metric in METRICS for line in metric.render()) + "\n"
+
+
+# id(route) -> its full template; one entry per route of the app
+_templates: Dict[int, str] = {}
+
+
+def route_template(scope) -> str:
+    """
+    The template of the route that handled the request, e.g. /fastapi-basics/hello/{name}.
+
+    The router puts the matched route into the scope. Routes of an included
+    router may carry only their own path (/hello/{name}); the prefix is
+    whatever the request path has in front of the filled-in route path.
+    """
+    route = scope.get("route")
+    template = getattr(route, "path", None)
+    if template is None:
+        return UNMATCHED_ROUTE
+    path = scope["path"]
+    cached = _templates.get(id(route))
+    # A router included twice under different prefixes shares its routes: check the prefix still fits
+    if cached is not None and path.startswith(cached[: len(cached) - len(template)]):
+        return cached
+    try:
+        concrete = route.path_format.format(**scope.get("path_params", {}))
+    except (AttributeError, KeyError, IndexError, ValueError):
+        return template
+    if concrete and path.endswith(concrete):
+        template = path[: len(path) - len(concrete)] + template
+    _templates[id(route)] = template
+    return template
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording latency, payload sizes and in-flight requests per route.
+
+    Pure ASGI rather than @app.middleware("http"): BaseHTTPMiddleware runs
+    the app in a separate task and copies every streamed response body
+    through a memory channel, which costs more than the metrics themselves.
+    Routes are labelled by their template (/hello/{name}), not the path.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+        received = sent = 0
+
+        async def counting_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+            return message
+
+        async def counting_send(message) -> None:
+            nonlocal status, sent
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                sent += len(message.get("body", b""))
+            await send(message)
+
+        requests_in_flight.inc()
+        try:
+            await self.app(scope, counting_receive, counting_send)
+        finally:
+            requests_in_flight.dec()
+            path = route_template(scope)
+            method = scope["method"]
+            request_seconds.observe((method, path, str(status)), time.perf_counter() - started)
+            request_bytes.observe((method, path), received)
+            response_bytes.observe((method, path), sent)
@@ -1,4 +1,8 @@
-from pydantic import BaseModel, EmailStr, Field
+from functools import lru_cache
+from typing import Optional, Sequence, Tuple
+
+import pydantic_core
+from pydantic import BaseModel, EmailStr, Field, TypeAdapter, ValidationError
 
 
 class User(BaseModel):
@@ -17,3 +21,58 @@ class User(BaseModel):
     email: EmailStr = Field(default=None)
     first_name: str | None
     last_name: str | None
+
+
+@lru_cache(maxsize=None)
+def user_adapter() -> TypeAdapter:
+    # Built once: creating an adapter compiles its validator and serializer
+    return TypeAdapter(User)
+
+
+def validate_user_lines(
+    lines: Sequence[bytes], first_line: int = 1, max_line_bytes: Optional[int] = None
+) -> Tuple[bytes, int]:
+    """
+    Validate NDJSON lines as Users.
+
+    Returns one NDJSON result line per record, {"line": n, "result": user}
+    or {"line": n, "errors": [...]}, and how many records failed. Blank lines
+    are skipped but still counted, so n is the line number in the input.
+    Lines longer than max_line_bytes fail without being parsed.
+    """
+    adapter = user_adapter()
+    results = []
+    failed = 0
+    for number, line in enumerate(lines, start=first_line):
+        if not line.strip():
+            continue
+        if max_line_bytes is not None and len(line) > max_line_bytes:
+            results.append(_error_line(number, "line_too_long", f"Line is longer than {max_line_bytes} bytes"))
+            failed += 1
+            continue
+        try:
+            result = {"line": number, "result": adapter.validate_json(line)}
+        except ValidationError as exc:
+            result = {"line": number, "errors": exc.errors(include_url=False, include_context=False)}
+            failed += 1
+        try:
+            # pydantic_core serializes the models directly, without model_dump() and json.dumps()
+            results.append(pydantic_core.to_json(result))
+        except pydantic_core.PydanticSerializationError as exc:
+            if "errors" in result:
+                # The input of a line that is not UTF-8 cannot be echoed back as JSON
+                results.append(pydantic_core.to_json(
+                    {"line": number, "errors": _without_input(result["errors"])}
+                ))
+            else:
+                results.append(_error_line(number, "serialization_error", str(exc)))
+                failed += 1
+    return b"".join(line + b"\n" for line in results), failed
+
+
+def _without_input(errors: list) -> list:
+    return [{key: value for key, value in error.items() if key != "input"} for error in errors]
+
+
+def _error_line(number: int, error_type: str, message: str) -> bytes:
+    return pydantic_core.to_json({"line": number, "errors": [{"type": error_type, "loc": [], "msg": message}]})
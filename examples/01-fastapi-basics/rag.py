@@ -1,72 +1,557 @@
+import asyncio
+import atexit
 import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 from pathlib import Path
-from typing import List
+from typing import AsyncIterator, List, Optional, Sequence, Tuple
 
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 import faiss
+import numpy as np
 from dotenv import load_dotenv
 from sentence_transformers import SentenceTransformer
 
+try:
+    from . import http_pool, metrics
+    from .retrieval import index_factory, search
+    from .retrieval.answer_cache import SemanticAnswerCache
+    from .retrieval.bm25 import BM25Index, LazyBM25Index
+    from .retrieval.index_cache import (
+        CHUNKS_FILE,
+        build_manifest,
+        cache_lock,
+        load_cached_index,
+        load_cached_lexical,
+        save_index,
+        save_lexical,
+    )
+    from .retrieval.chunking import Chunk, TokenChunker
+    from .retrieval.context import ContextPacker
+    from .retrieval.embed_pool import EmbeddingPool
+    from .retrieval.hot_swap import HotSwapStore
+    from .retrieval.incremental import IncrementalStore, SyncStats
+    from .retrieval.ingest import IngestStats, ingest_stream, iter_text_blocks, print_progress
+    from .retrieval.microbatch import MicroBatcher
+    from .retrieval.query_cache import QueryEmbeddingCache
+    from .retrieval.shards import CollectionManager, DocumentStore, Hit, directory_size
+    from .retrieval.storage import ChunkStore, ChunkStoreWriter
+except ImportError:
+    # Running as a script (python rag.py) rather than as part of the package
+    import http_pool
+    import metrics
+    from retrieval import index_factory, search
+    from retrieval.answer_cache import SemanticAnswerCache
+    from retrieval.bm25 import BM25Index, LazyBM25Index
+    from retrieval.index_cache import (
+        CHUNKS_FILE,
+        build_manifest,
+        cache_lock,
+        load_cached_index,
+        load_cached_lexical,
+        save_index,
+        save_lexical,
+    )
+    from retrieval.chunking import Chunk, TokenChunker
+    from retrieval.context import ContextPacker
+    from retrieval.embed_pool import EmbeddingPool
+    from retrieval.hot_swap import HotSwapStore
+    from retrieval.incremental import IncrementalStore, SyncStats
+    from retrieval.ingest import IngestStats, ingest_stream, iter_text_blocks, print_progress
+    from retrieval.microbatch import MicroBatcher
+    from retrieval.query_cache import QueryEmbeddingCache
+    from retrieval.shards import CollectionManager, DocumentStore, Hit, directory_size
+    from retrieval.storage import ChunkStore, ChunkStoreWriter
+
 load_dotenv()
-client = OpenAI(
-    base_url="https://openrouter.ai/api/v1",
-    api_key=os.getenv("OPENROUTER_API_KEY"),
-)
-embed_model = SentenceTransformer("all-MiniLM-L6-v2")
+CHAT_MODEL = "gpt-4o-mini"
+EMBED_MODEL_NAME = "all-MiniLM-L6-v2"
+# Tokens shared between consecutive chunks
+CHUNK_OVERLAP_TOKENS = int(os.getenv("RAG_CHUNK_OVERLAP_TOKENS", 32))
+CACHE_DIR = Path(os.getenv("RAG_CACHE_DIR", Path(__file__).parent / ".index_cache"))
+# "auto" picks flat / hnsw / ivf_flat / ivf_pq from the number of chunks
+INDEX_MODE = os.getenv("RAG_INDEX_MODE", "auto")
+INDEX_NPROBE = int(os.getenv("RAG_INDEX_NPROBE", index_factory.DEFAULT_NPROBE))
+INDEX_EF_SEARCH = int(os.getenv("RAG_INDEX_EF_SEARCH", index_factory.DEFAULT_EF_SEARCH))
+# "vector" (FAISS only), "lexical" (BM25 only) or "hybrid" (both, merged with
+# reciprocal rank fusion); search functions also take a per-call mode
+SEARCH_MODE = os.getenv("RAG_SEARCH_MODE", "vector")
+# Candidates taken from each retriever before fusion in hybrid mode
+HYBRID_CANDIDATES = int(os.getenv("RAG_HYBRID_CANDIDATES", search.DEFAULT_HYBRID_CANDIDATES))
+# "mmap" keeps chunk texts in the memory-mapped cache file, shared by every
+# worker process through the page cache; "memory" loads them into a list
+CHUNK_STORAGE = os.getenv("RAG_CHUNK_STORAGE", "memory")
+# "rebuild" re-embeds the whole source whenever it changes; "incremental" keeps
+# an ID-mapped flat index keyed by chunk-text hashes and re-embeds only the
+# chunks that changed (exact search, INDEX_MODE is ignored)
+INDEX_UPDATES = os.getenv("RAG_INDEX_UPDATES", "rebuild")
+# Chunks embedded and added to the index per step while ingesting
+INGEST_BATCH_SIZE = int(os.getenv("RAG_INGEST_BATCH_SIZE", 256))
+# Processes embedding the corpus during ingestion, each with its own model;
+# 0 encodes in this process
+EMBED_WORKERS = int(os.getenv("RAG_EMBED_WORKERS", 0))
+# Chunks per model.encode batch inside each embedding worker
+EMBED_BATCH_SIZE = int(os.getenv("RAG_EMBED_BATCH_SIZE", 32))
+# Query embeddings kept in the LRU cache; 0 disables it
+QUERY_CACHE_SIZE = int(os.getenv("RAG_QUERY_CACHE_SIZE", 4096))
+# Optional .npz file the query cache is loaded from at start and saved to at exit
+QUERY_CACHE_PATH = os.getenv("RAG_QUERY_CACHE_PATH")
+# Answers reused for questions within this cosine similarity that retrieve the same chunks
+ANSWER_CACHE_SIZE = int(os.getenv("RAG_ANSWER_CACHE_SIZE", 1024))
+ANSWER_CACHE_THRESHOLD = float(os.getenv("RAG_ANSWER_CACHE_THRESHOLD", 0.95))
+ANSWER_CACHE_TTL = float(os.getenv("RAG_ANSWER_CACHE_TTL", 3600))
+# Concurrent async queries are retrieved together: a batch closes after this
+# many milliseconds or once it holds RAG_BATCH_MAX_SIZE queries
+BATCH_WINDOW_MS = float(os.getenv("RAG_BATCH_WINDOW_MS", 5))
+BATCH_MAX_SIZE = int(os.getenv("RAG_BATCH_MAX_SIZE", 32))
+# Prompt token budget for the retrieved context, in CHAT_MODEL tokens;
+# overlapping chunks are merged and repeated sentences dropped before it is filled
+CONTEXT_MAX_TOKENS = int(os.getenv("RAG_CONTEXT_MAX_TOKENS", 1500))
+# Directory of document collections, one .txt file per collection, served
+# as separate index shards named after the file
+COLLECTIONS_DIR = Path(os.getenv("RAG_COLLECTIONS_DIR", Path(__file__).parent / "data"))
+# Shards are loaded on first use; least recently used ones are dropped when
+# their indexes and chunks together exceed this many megabytes
+COLLECTIONS_MEMORY_MB = float(os.getenv("RAG_COLLECTIONS_MEMORY_MB", 1024))
+# Threads searching shards in parallel (FAISS releases the GIL)
+SHARD_SEARCH_WORKERS = int(os.getenv("RAG_SHARD_SEARCH_WORKERS", 8))
+# Upper bound on concurrent chat completions issued by generate_answers
+ANSWER_WORKERS = int(os.getenv("RAG_ANSWER_WORKERS", 8))
+# Seconds between checks of the source file; when it changes the index is
+# rebuilt in the background and swapped in. 0 disables watching
+WATCH_INTERVAL = float(os.getenv("RAG_WATCH_INTERVAL", 0))
 
 # Use path relative to this file
 data_path = Path(__file__).parent / "data" / "test.txt"
-with open(data_path, "r", encoding="utf-8") as f:
-    raw_text = f.read()
 
 
-def split_text(text: str, max_words: int = 100) -> List[str]:
-    sentences = text.split(". ")
-    chunks = []
-    chunk = ""
-    for sentence in sentences:
-        if len((chunk + sentence).split()) < max_words:
-            chunk += sentence + ". "
-        else:
-            chunks.append(chunk.strip())
-            chunk = sentence + ". "
-    if chunk:
-        chunks.append(chunk.strip())
-    return chunks
+def split_text(text: str) -> List[str]:
+    return [chunk.text for chunk in chunker.split(text)]
 
 
-chunks = split_text(raw_text)
-chunk_embeddings = embed_model.encode(chunks).astype("float32")
+def build_index(source: Path, chunks_path: Path) -> Tuple[faiss.Index, ChunkStore]:
+    """
+    Stream the source file into a new index, and its chunks into a chunk store at chunks_path.
 
-index = faiss.IndexFlatL2(chunk_embeddings.shape[1])
-index.add(chunk_embeddings)
+    The file is read in blocks and embedded INGEST_BATCH_SIZE chunks at a
+    time, and chunk texts go to disk as they are embedded. What still grows
+    with the corpus is the index (4 * dim bytes per chunk unless compressed
+    by sq8/pq/ivf_pq) and three integers per chunk for the store. The BM25
+    index is not built here: see load_or_build_index.
+    With RAG_EMBED_WORKERS set, the chunks are embedded by a process pool.
+    """
+    # The chunk count is only known at the end; estimate it (~4 bytes per token)
+    # so "auto" can still pick an index type up front
+    expected_chunks = max(1, Path(source).stat().st_size // (4 * chunker.max_tokens))
+    index = index_factory.create_index(
+        embed_model.get_sentence_embedding_dimension(), expected_chunks, mode=INDEX_MODE
+    )
 
+    stats = IngestStats()
+    chunk_stream = chunker.split_stream(iter_text_blocks(source, stats=stats))
+    pool = EmbeddingPool(EMBED_MODEL_NAME, EMBED_WORKERS, batch_size=EMBED_BATCH_SIZE) if EMBED_WORKERS else None
+    with pool or nullcontext(), ChunkStoreWriter(chunks_path) as chunk_store:
+        ingest_stream(
+            chunk_stream,
+            pool.encode if pool else lambda batch: embed_model.encode(batch),
+            index,
+            # Every step has to give each worker at least one shard
+            batch_size=max(INGEST_BATCH_SIZE, pool.workers * pool.chunk_size) if pool else INGEST_BATCH_SIZE,
+            train_size=index_factory.default_train_size(index),
+            stats=stats,
+            on_progress=print_progress,
+            sink=chunk_store.extend,
+        )
+    print(f"\nIndexed {stats.chunks} chunks in {stats.elapsed:.1f}s")
+    return index, ChunkStore(chunks_path)
 
-def search_similar_chunks(query: str, k: int = 3) -> List[str]:
-    query_embedding = embed_model.encode([query]).astype("float32")
-    _, indices = index.search(query_embedding, k)
-    return [chunks[i] for i in indices[0]]
 
+def load_or_build_index(
+    source: Path, cache_dir: Path = CACHE_DIR
+) -> Tuple[faiss.Index, Sequence[Chunk], LazyBM25Index]:
+    """
+    Reuse the on-disk index when the manifest still matches, rebuild otherwise.
+
+    The BM25 index is only loaded, or built from the chunks and cached, on
+    the first lexical or hybrid search; right away if SEARCH_MODE needs it.
+    """
+    manifest = build_manifest(
+        source,
+        EMBED_MODEL_NAME,
+        chunker="token",
+        max_tokens=chunker.max_tokens,
+        overlap_tokens=chunker.overlap_tokens,
+        index=INDEX_MODE,
+        lexical="bm25",
+    )
+    use_mmap = CHUNK_STORAGE == "mmap"
+    # Workers starting together wait here while the first one builds, then load its cache
+    with cache_lock(cache_dir):
+        cached = load_cached_index(cache_dir, manifest, use_mmap=use_mmap)
+        if cached is None:
+            # The chunks are streamed to a scratch store, copied into the cache by save_index
+            with tempfile.TemporaryDirectory(dir=cache_dir, ignore_cleanup_errors=True) as scratch:
+                built = build_index(source, Path(scratch) / CHUNKS_FILE)
+                save_index(cache_dir, manifest, *built)
+            # Re-open what was just written, so this process maps the same pages
+            # as every other worker instead of keeping its private copy
+            cached = load_cached_index(cache_dir, manifest, use_mmap=use_mmap) or built
+    index, chunks = cached
+
+    # Search-time knobs are not part of the manifest: changing them needs no rebuild
+    index_factory.tune_search(index, nprobe=INDEX_NPROBE, ef_search=INDEX_EF_SEARCH)
+    lexical = LazyBM25Index(lambda: load_or_build_lexical(chunks, cache_dir, manifest))
+    if SEARCH_MODE != "vector":
+        lexical.get()
+    return index, chunks, lexical
 
-def generate_answer(question: str) -> str:
-    relevant_chunks = search_similar_chunks(question)
-    context = "\n---\n".join(relevant_chunks)
 
-    prompt = f"Answer the question based on the following context. Context: {context} Question: {question} Answer:"
+def load_or_build_lexical(chunks: Sequence[Chunk], cache_dir: Path, manifest: dict) -> BM25Index:
+    """The cached BM25 index of a cached vector index, built from its chunks if it is missing."""
+    with cache_lock(cache_dir):
+        lexical = load_cached_lexical(cache_dir, manifest)
+        if lexical is None:
+            lexical = BM25Index.build(chunk.text for chunk in chunks)
+            save_lexical(cache_dir, manifest, lexical)
+    return lexical
 
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.2,
+
+def open_incremental_store(cache_dir: Path = CACHE_DIR / "incremental") -> IncrementalStore:
+    return IncrementalStore.load_or_create(
+        cache_dir,
+        incremental_manifest(),
+        embed_model.get_sentence_embedding_dimension(),
+        lambda batch: embed_model.encode(batch),
+        batch_size=INGEST_BATCH_SIZE,
     )
+
+
+def incremental_manifest() -> dict:
+    # No source hash: the stored vectors stay valid for whatever text still matches
+    return {
+        "model_name": EMBED_MODEL_NAME,
+        "params": {
+            "chunker": "token",
+            "max_tokens": chunker.max_tokens,
+            "overlap_tokens": chunker.overlap_tokens,
+            "index": "idmap_flat",
+        },
+    }
+
+
+def sync_incremental_store(
+    store: IncrementalStore, source: Path, cache_dir: Path = CACHE_DIR / "incremental"
+) -> SyncStats:
+    """Re-chunk the source and embed only the chunks that are not in the store yet."""
+    stats = store.sync(chunker.split_stream(iter_text_blocks(source)))
+    if stats.added or stats.removed:
+        # One worker's index, chunks and ids at a time, never a mix of two
+        with cache_lock(cache_dir):
+            store.save(cache_dir, incremental_manifest())
+    print(
+        f"Synced {source.name}: {stats.added} chunks embedded, {stats.removed} removed, "
+        f"{stats.unchanged} unchanged in {stats.seconds:.2f}s"
+    )
+    return stats
+
+
+def load_store() -> DocumentStore:
+    if INDEX_UPDATES == "incremental":
+        sync_incremental_store(incremental_store, data_path)
+        return incremental_store.snapshot("default")
+    index, chunks, lexical = load_or_build_index(data_path)
+    return DocumentStore("default", index, chunks, lexical)
+
+
+def reload_index() -> None:
+    """Pick up changes to the source file (rebuilding only if the manifest changed)."""
+    live.rebuild()
+
+
+def reload_index_in_background() -> bool:
+    """reload_index off the request path; False if a rebuild is already running."""
+    return live.rebuild_in_background()
+
+
+def encode_queries(queries: List[str]) -> np.ndarray:
+    with metrics.stage("embed"):
+        if QUERY_CACHE_SIZE <= 0:
+            return embed_model.encode(queries).astype("float32")
+        return query_cache.encode(queries)
+
+
+def search_similar_chunks_batch(
+    queries: List[str], k: int = 3, mode: Optional[str] = None, store: Optional[DocumentStore] = None
+) -> List[List[str]]:
+    """
+    Retrieve chunks for many queries at once.
+
+    All queries go through a single batched encode and a single matrix
+    index.search, which is far cheaper than one round trip per query.
+    """
+    if not queries:
+        return []
+    store = store or live.current
+    return [
+        [store.chunks[i].text for i in chunk_ids]
+        for chunk_ids in search_chunk_ids(queries, encode_queries(queries), k, mode, store)
+    ]
+
+
+def search_chunk_ids(
+    queries: List[str],
+    query_embeddings: np.ndarray,
+    k: int = 3,
+    mode: Optional[str] = None,
+    store: Optional[DocumentStore] = None,
+) -> List[List[int]]:
+    """Chunk ids per query, best first, for the given search mode (SEARCH_MODE by default)."""
+    store = store or live.current
+    with metrics.stage("search"):
+        return search.search_chunk_ids(
+            store.index, store.lexical, queries, query_embeddings, k, mode or SEARCH_MODE, HYBRID_CANDIDATES
+        )
+
+
+def search_similar_chunks(query: str, k: int = 3, mode: Optional[str] = None) -> List[str]:
+    return search_similar_chunks_batch([query], k, mode)[0]
+
+
+def retrieve_batch(requests: List[Tuple[str, int]]) -> List[Tuple[np.ndarray, List[int], DocumentStore]]:
+    """
+    (question, k) pairs -> (query embedding, chunk ids, store) triples, with one encode and one search.
+
+    The store the ids were found in comes along, so the chunks are read
+    from it even if a newer index is swapped in meanwhile.
+    """
+    store = live.current
+    questions = [question for question, _ in requests]
+    query_embeddings = encode_queries(questions)
+    all_ids = search_chunk_ids(questions, query_embeddings, max(k for _, k in requests), store=store)
+    return [
+        (embedding, chunk_ids[:k], store)
+        for embedding, chunk_ids, (_, k) in zip(query_embeddings, all_ids, requests)
+    ]
+
+
+def build_prompt(question: str, relevant_chunks: List[str]) -> str:
+    context = "\n---\n".join(relevant_chunks)
+    return f"Answer the question based on the following context. Context: {context} Question: {question} Answer:"
+
+
+def chat_request(prompt: str) -> dict:
+    return {
+        "model": CHAT_MODEL,
+        "messages": [{"role": "user", "content": prompt}],
+        "temperature": 0.2,
+    }
+
+
+def complete(prompt: str) -> str:
+    with metrics.stage("llm_total"):
+        response = client.chat.completions.create(**chat_request(prompt))
     return response.choices[0].message.content
 
 
+def answer_cache_key(store: DocumentStore, chunk_ids: List[int]) -> Tuple[int, ...]:
+    # An answer put by a request that started before a swap never matches
+    # the same ids in the new index
+    return (store.generation, *chunk_ids)
+
+
+def answer_from_chunks(
+    question: str, query_embedding: np.ndarray, chunk_ids: List[int], store: Optional[DocumentStore] = None
+) -> str:
+    """Answer from already retrieved chunks, reusing a semantically equivalent cached answer."""
+    store = store or live.current
+    cache_key = answer_cache_key(store, chunk_ids)
+    if ANSWER_CACHE_SIZE > 0:
+        cached = answer_cache.get(query_embedding, cache_key)
+        if cached is not None:
+            return cached
+
+    context = context_packer.pack(chunk_ids, store.chunks)
+    answer = complete(build_prompt(question, [context.text]))
+    if ANSWER_CACHE_SIZE > 0:
+        answer_cache.put(query_embedding, cache_key, answer)
+    return answer
+
+
+def generate_answer(question: str) -> str:
+    store = live.current
+    query_embeddings = encode_queries([question])
+    chunk_ids = search_chunk_ids([question], query_embeddings, store=store)[0]
+    return answer_from_chunks(question, query_embeddings[0], chunk_ids, store)
+
+
+async def astream_answer(question: str, k: int = 3) -> AsyncIterator[str]:
+    """
+    Async counterpart of generate_answer that yields the answer as it is generated.
+
+    Encoding and FAISS search are CPU bound and run in a worker thread so the
+    event loop stays free, micro-batched with other concurrent questions; the
+    completion is streamed with AsyncOpenAI and every token is yielded as
+    soon as it arrives.
+    """
+    query_embedding, chunk_ids, store = await retrieval_batcher.submit((question, k))
+    cache_key = answer_cache_key(store, chunk_ids)
+
+    if ANSWER_CACHE_SIZE > 0:
+        cached = answer_cache.get(query_embedding, cache_key)
+        if cached is not None:
+            yield cached
+            return
+
+    context = context_packer.pack(chunk_ids, store.chunks)
+    parts = []
+    async for token in astream_completion(build_prompt(question, [context.text])):
+        parts.append(token)
+        yield token
+
+    if ANSWER_CACHE_SIZE > 0:
+        answer_cache.put(query_embedding, cache_key, "".join(parts))
+
+
+async def astream_completion(prompt: str) -> AsyncIterator[str]:
+    started = time.perf_counter()
+    first_token = True
+    stream = await async_client.chat.completions.create(**chat_request(prompt), stream=True)
+    async for event in stream:
+        if not event.choices:
+            continue
+        token = event.choices[0].delta.content
+        if token:
+            if first_token:
+                metrics.observe_stage("llm_first_token", time.perf_counter() - started)
+                first_token = False
+            yield token
+    metrics.observe_stage("llm_total", time.perf_counter() - started)
+
+
+def generate_answers(
+    questions: List[str], k: int = 3, max_workers: Optional[int] = None
+) -> List[str]:
+    """
+    Answer many questions, e.g. for offline evaluation or FAQ pre-answering.
+
+    Retrieval is batched; the chat completions are I/O bound and run on a
+    thread pool of at most max_workers (RAG_ANSWER_WORKERS by default).
+    Answers are returned in the order of the questions.
+    """
+    if not questions:
+        return []
+    store = live.current
+    query_embeddings = encode_queries(questions)
+    chunk_ids = search_chunk_ids(questions, query_embeddings, k, store=store)
+    with ThreadPoolExecutor(max_workers=max_workers or ANSWER_WORKERS) as pool:
+        return list(pool.map(answer_from_chunks, questions, query_embeddings, chunk_ids, [store] * len(questions)))
+
+
+def list_collections() -> List[str]:
+    return sorted(path.stem for path in COLLECTIONS_DIR.glob("*.txt"))
+
+
+def load_collection(name: str) -> DocumentStore:
+    """Shard loader for `collections`: the cached index of COLLECTIONS_DIR/<name>.txt, built if needed."""
+    # Names come from requests: only ever open files that are really in the directory
+    if name not in list_collections():
+        raise KeyError(f"Unknown collection {name!r}")
+    cache_dir = CACHE_DIR / "collections" / name
+    index, chunks, lexical = load_or_build_index(COLLECTIONS_DIR / f"{name}.txt", cache_dir)
+    return DocumentStore(name, index, chunks, lexical, nbytes=directory_size(cache_dir))
+
+
+def search_collections(
+    question: str, names: Optional[List[str]] = None, k: int = 3, mode: Optional[str] = None
+) -> List[Hit]:
+    """The k best chunks for a question over the named collections (all of them by default)."""
+    names = names or list_collections()
+    query_embeddings = encode_queries([question])
+    with metrics.stage("search"):
+        return collections.search(names, [question], query_embeddings, k, mode or SEARCH_MODE, HYBRID_CANDIDATES)[0]
+
+
+def collection_prompt(question: str, hits: List[Hit]) -> str:
+    context = context_packer.pack_chunks(
+        [hit.chunk for hit in hits], [hit.chunk_id for hit in hits], [hit.collection for hit in hits]
+    )
+    return build_prompt(question, [context.text])
+
+
+def generate_collection_answer(question: str, names: Optional[List[str]] = None, k: int = 3) -> str:
+    return complete(collection_prompt(question, search_collections(question, names, k)))
+
+
+async def astream_collection_answer(
+    question: str, names: Optional[List[str]] = None, k: int = 3
+) -> AsyncIterator[str]:
+    """astream_answer over document collections; shards are searched in a worker thread."""
+    hits = await asyncio.to_thread(search_collections, question, names, k)
+    async for token in astream_completion(collection_prompt(question, hits)):
+        yield token
+
+
+# Embedding pool workers re-import the script that started them as
+# __mp_main__ (python rag.py). They only need the definitions above: the
+# model, API clients, tokenizers, caches, thread pools and the index are
+# set up in the serving process alone
+if __name__ != "__mp_main__":
+    # Both share the process-wide connection pools of http_pool with every other chat model
+    client = OpenAI(
+        base_url=http_pool.OPENROUTER_BASE_URL,
+        api_key=os.getenv("OPENROUTER_API_KEY"),
+        timeout=http_pool.TIMEOUT,
+        http_client=http_pool.get_http_client(),
+    )
+    # Used by the streaming path, which runs inside the FastAPI event loop
+    async_client = AsyncOpenAI(
+        base_url=http_pool.OPENROUTER_BASE_URL,
+        api_key=os.getenv("OPENROUTER_API_KEY"),
+        timeout=http_pool.TIMEOUT,
+        http_client=http_pool.get_async_http_client(),
+    )
+
+    embed_model = SentenceTransformer(EMBED_MODEL_NAME)
+    # Chunks fill the model's input window (256 tokens for MiniLM) as measured by its own tokenizer
+    chunker = TokenChunker.from_sentence_transformer(embed_model, overlap_tokens=CHUNK_OVERLAP_TOKENS)
+
+    query_cache = QueryEmbeddingCache(
+        lambda queries: embed_model.encode(queries), maxsize=QUERY_CACHE_SIZE, model_name=EMBED_MODEL_NAME
+    )
+    if QUERY_CACHE_PATH:
+        query_cache.load(QUERY_CACHE_PATH)
+        atexit.register(query_cache.save, QUERY_CACHE_PATH)
+
+    answer_cache = SemanticAnswerCache(
+        threshold=ANSWER_CACHE_THRESHOLD, ttl=ANSWER_CACHE_TTL, maxsize=ANSWER_CACHE_SIZE
+    )
+    # Shared by all requests of the async path; see retrieval.microbatch
+    retrieval_batcher = MicroBatcher(retrieve_batch, max_batch_size=BATCH_MAX_SIZE, max_wait_ms=BATCH_WINDOW_MS)
+    context_packer = ContextPacker.for_model(CHAT_MODEL, max_tokens=CONTEXT_MAX_TOKENS)
+    collections = CollectionManager(
+        load_collection,
+        memory_budget=int(COLLECTIONS_MEMORY_MB * 1024 * 1024),
+        max_workers=SHARD_SEARCH_WORKERS,
+    )
+
+    if INDEX_UPDATES == "incremental":
+        incremental_store = open_incremental_store()
+    # Every request reads live.current once and uses that store throughout;
+    # after a swap, cached answers refer to chunk ids of the previous index
+    live = HotSwapStore(load_store, on_swap=lambda store: answer_cache.clear())
+    if WATCH_INTERVAL > 0:
+        live.watch([data_path], WATCH_INTERVAL)
+
+
 if __name__ == "__main__":
     while True:
         user_q = input("\nAsk something about the document:\n> ")
         if user_q.lower() in ["exit", "quit"]:
             break
 
+        saved_before = context_packer.stats()["tokens_saved"]
         answer = generate_answer(user_q)
         print("\n💬 Answer:\n", answer)
+        print(f"\n(context packing saved {context_packer.stats()['tokens_saved'] - saved_before} prompt tokens)")
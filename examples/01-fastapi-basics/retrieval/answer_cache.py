@@ -0,0 +1,106 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+
+
+@dataclass
+class _Entry:
+    embedding: np.ndarray
+    chunk_ids: Tuple[int, ...]
+    answer: str
+    created_at: float
+
+
+class SemanticAnswerCache:
+    """
+    Cache of generated answers looked up by question similarity.
+
+    A cached answer is returned when a new question's embedding is within
+    `threshold` cosine similarity of a stored one *and* retrieval returned the
+    same chunks, so the answer was produced from the same context. Entries
+    expire after `ttl` seconds and the least recently used ones are evicted
+    beyond `maxsize`. Call clear() whenever the index is rebuilt, since chunk
+    ids are only meaningful for the index they came from.
+    """
+
+    def __init__(self, threshold: float = 0.95, ttl: float = 3600.0, maxsize: int = 1024):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._matrix: Optional[np.ndarray] = None  # stacked embeddings, rebuilt lazily
+        self._keys: list = []
+        self._next_key = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, embedding: np.ndarray, chunk_ids: Sequence[int]) -> Optional[str]:
+        embedding = _unit(embedding)
+        chunk_ids = tuple(chunk_ids)
+        with self._lock:
+            self._expire()
+            if self._entries:
+                if self._matrix is None:
+                    self._keys = list(self._entries)
+                    self._matrix = np.stack([self._entries[key].embedding for key in self._keys])
+                similarities = self._matrix @ embedding
+                # Best match first; stop at the first one below the threshold
+                for position in np.argsort(-similarities):
+                    if similarities[position] < self.threshold:
+                        break
+                    key = self._keys[position]
+                    entry = self._entries[key]
+                    if entry.chunk_ids == chunk_ids:
+                        self._entries.move_to_end(key)
+                        self.hits += 1
+                        return entry.answer
+            self.misses += 1
+            return None
+
+    def put(self, embedding: np.ndarray, chunk_ids: Sequence[int], answer: str) -> None:
+        with self._lock:
+            self._entries[self._next_key] = _Entry(_unit(embedding), tuple(chunk_ids), answer, time.monotonic())
+            self._next_key += 1
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            self._matrix = None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._matrix = None
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def _expire(self) -> None:
+        deadline = time.monotonic() - self.ttl
+        expired = [key for key, entry in self._entries.items() if entry.created_at < deadline]
+        for key in expired:
+            del self._entries[key]
+        if expired:
+            self._matrix = None
+
+
+def _unit(vector: np.ndarray) -> np.ndarray:
+    vector = np.asarray(vector, dtype="float32").ravel()
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
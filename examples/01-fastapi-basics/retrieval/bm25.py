@@ -0,0 +1,156 @@
+import re
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+_TOKEN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    # Keep things like error codes and tickers ("E1001", "btcusdt") intact
+    return _TOKEN.findall(text.casefold())
+
+
+class BM25Index:
+    """
+    Okapi BM25 over an inverted index with precomputed postings.
+
+    Postings are stored CSR-style: for term t, doc_ids[indptr[t]:indptr[t + 1]]
+    are the documents containing it and weights[...] their full BM25 term
+    weight (idf and length normalization included). Scoring a query is then
+    a gather of the query terms' postings plus one np.add.at, with no
+    per-document Python work.
+    """
+
+    def __init__(
+        self,
+        vocabulary: Dict[str, int],
+        indptr: np.ndarray,
+        doc_ids: np.ndarray,
+        weights: np.ndarray,
+        num_docs: int,
+    ):
+        self.vocabulary = vocabulary
+        self.indptr = indptr
+        self.doc_ids = doc_ids
+        self.weights = weights
+        self.num_docs = num_docs
+
+    @classmethod
+    def build(cls, texts: Iterable[str], k1: float = 1.5, b: float = 0.75) -> "BM25Index":
+        vocabulary: Dict[str, int] = {}
+        rows: List[np.ndarray] = []  # term ids per document
+        freqs: List[np.ndarray] = []
+        lengths = []
+        for text in texts:
+            counts = Counter(tokenize(text))
+            term_ids = (vocabulary.setdefault(term, len(vocabulary)) for term in counts)
+            rows.append(np.fromiter(term_ids, dtype=np.int64, count=len(counts)))
+            freqs.append(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))
+            lengths.append(sum(counts.values()))
+
+        num_docs = len(rows)
+        lengths = np.asarray(lengths, dtype=np.float32)
+        term_ids = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int64)
+        tf = np.concatenate(freqs) if freqs else np.zeros(0, dtype=np.float32)
+        doc_ids = np.repeat(np.arange(num_docs, dtype=np.int32), [len(row) for row in rows])
+
+        # Group postings by term
+        order = np.argsort(term_ids, kind="stable")
+        term_ids, tf, doc_ids = term_ids[order], tf[order], doc_ids[order]
+        df = np.bincount(term_ids, minlength=len(vocabulary))
+        indptr = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum(df, out=indptr[1:])
+        df = df.astype(np.float32)
+
+        idf = np.log(1 + (num_docs - df + 0.5) / (df + 0.5))
+        avg_length = lengths.mean() if num_docs else 0.0
+        norm = k1 * (1 - b + b * lengths[doc_ids] / max(avg_length, 1e-9))
+        weights = (idf[term_ids] * tf * (k1 + 1) / (tf + norm)).astype(np.float32)
+        return cls(vocabulary, indptr, doc_ids, weights, num_docs)
+
+    def scores(self, query: str) -> np.ndarray:
+        term_ids = [self.vocabulary[t] for t in set(tokenize(query)) if t in self.vocabulary]
+        scores = np.zeros(self.num_docs, dtype=np.float32)
+        if term_ids:
+            postings = np.concatenate([np.arange(self.indptr[t], self.indptr[t + 1]) for t in term_ids])
+            np.add.at(scores, self.doc_ids[postings], self.weights[postings])
+        return scores
+
+    def search(self, query: str, k: int) -> List[Tuple[int, float]]:
+        """Top-k (doc id, score) pairs, best first; documents without any query term are skipped."""
+        scores = self.scores(query)
+        matched = np.flatnonzero(scores)
+        if len(matched) > k:
+            matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        ranked = matched[np.argsort(-scores[matched], kind="stable")]
+        return [(int(i), float(scores[i])) for i in ranked]
+
+    def save(self, path: Path) -> None:
+        terms = np.array(sorted(self.vocabulary, key=self.vocabulary.get))
+        with open(path, "wb") as f:
+            np.savez(
+                f,
+                terms=terms,
+                indptr=self.indptr,
+                doc_ids=self.doc_ids,
+                weights=self.weights,
+                num_docs=self.num_docs,
+            )
+
+    @classmethod
+    def load(cls, path: Path) -> "BM25Index":
+        with np.load(path) as data:
+            vocabulary = {term: i for i, term in enumerate(data["terms"].tolist())}
+            return cls(vocabulary, data["indptr"], data["doc_ids"], data["weights"], int(data["num_docs"]))
+
+
+class LazyBM25Index:
+    """
+    A BM25Index that load() returns on the first search, not before.
+
+    Its postings take several times the memory of the chunk texts, so a
+    process that only ever runs vector searches should never build one.
+    """
+
+    def __init__(self, load: Callable[[], BM25Index]):
+        self._load = load
+        self._index: Optional[BM25Index] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._index is not None
+
+    def get(self) -> BM25Index:
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    self._index = self._load()
+        return self._index
+
+    def search(self, query: str, k: int) -> List[Tuple[int, float]]:
+        return self.get().search(query, k)
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[int]], k: int = 60) -> List[int]:
+    """
+    Merge ranked id lists: score(d) = sum over lists of 1 / (k + rank of d).
+
+    Only ranks are used, so dense distances and BM25 scores never have to be
+    put on a common scale.
+    """
+    fused = fused_scores(rankings, k)
+    return sorted(fused, key=fused.get, reverse=True)
+
+
+def fused_scores(rankings: Sequence[Sequence[int]], k: int = 60) -> Dict[int, float]:
+    """The reciprocal rank fusion score of every id in rankings."""
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+    return fused
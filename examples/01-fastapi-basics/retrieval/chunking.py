@@ -0,0 +1,219 @@
+import re
+from collections import deque
+from dataclasses import dataclass
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple
+
+# Sentence-final punctuation and the whitespace after it, or a blank line.
+# No lookbehind: the regex engine can then skip straight to the next
+# candidate character instead of trying the pattern at every position
+_BOUNDARY = re.compile(r"[.!?]\s+|\n\s*\n")
+_WORD = re.compile(r"\S+")
+
+# Text without any sentence boundary is cut at whitespace once the carry-over
+# between streamed blocks grows past this many characters
+MAX_CARRY_CHARS = 1 << 16
+
+
+@dataclass(frozen=True)
+class Chunk:
+    """A chunk of the source text and its [start, end) character offsets."""
+    text: str
+    start: int
+    end: int
+
+
+# A sentence (or a slice of an over-long one) with the whitespace before it:
+# (start, end, text, gap, tokens). A plain tuple; a NamedTuple per sentence
+# costs more than the rest of the packing
+_Unit = Tuple[int, int, str, str, int]
+_TOKENS = 4
+
+
+class TokenChunker:
+    """
+    Single-pass chunker that sizes chunks in embedding-model tokens.
+
+    Text is split into sentences, which are packed into chunks of at most
+    max_tokens tokens; consecutive chunks share up to overlap_tokens tokens
+    of whole trailing sentences. Sentences longer than max_tokens are split
+    between words.
+
+    Token counts are computed per word and memoized, which is exact for
+    WordPiece tokenizers such as MiniLM's (they never merge across
+    whitespace) and means a word is only ever tokenized once. The memo is a
+    plain dict read with map() in C, emptied once it holds cache_size words.
+    """
+
+    def __init__(
+        self,
+        count_tokens: Callable[[str], int],
+        max_tokens: int = 254,
+        overlap_tokens: int = 32,
+        cache_size: int = 1 << 16,
+    ):
+        if not 0 <= overlap_tokens < max_tokens:
+            raise ValueError("overlap_tokens must be in [0, max_tokens)")
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self.cache_size = cache_size
+        self._count_word = count_tokens
+        self._token_cache: Dict[str, int] = {}
+
+    @classmethod
+    def from_sentence_transformer(cls, model, overlap_tokens: int = 32, **kwargs) -> "TokenChunker":
+        """Chunker matched to a SentenceTransformer's tokenizer and input window."""
+        tokenizer = model.tokenizer
+        # Leave room for the [CLS] and [SEP] tokens added around every input
+        max_tokens = model.max_seq_length - tokenizer.num_special_tokens_to_add()
+        return cls(
+            lambda word: len(tokenizer.encode(word, add_special_tokens=False)),
+            max_tokens=max_tokens,
+            overlap_tokens=overlap_tokens,
+            **kwargs,
+        )
+
+    def count_tokens(self, word: str) -> int:
+        tokens = self._token_cache.get(word)
+        if tokens is None:
+            tokens = self._count_new([word])
+        return tokens
+
+    def _count_new(self, words: List[str]) -> int:
+        """Total tokens of words, tokenizing the ones not in the memo yet."""
+        cache = self._token_cache
+        if len(cache) + len(words) > self.cache_size:
+            cache.clear()
+        for word in words:
+            if word not in cache:
+                cache[word] = self._count_word(word)
+        return sum(map(cache.__getitem__, words))
+
+    def split(self, text: str) -> List[Chunk]:
+        return list(self.split_stream([text]))
+
+    def split_stream(self, blocks: Iterable[str]) -> Iterator[Chunk]:
+        """Chunk text arriving in blocks; offsets are relative to the whole stream."""
+        max_tokens = self.max_tokens
+        window: deque = deque()
+        window_tokens = 0
+
+        for unit in self._units(blocks):
+            tokens = unit[_TOKENS]
+            if window and window_tokens + tokens > max_tokens:
+                yield self._emit(window)
+                window, window_tokens = self._overlap(window)
+                while window and window_tokens + tokens > max_tokens:
+                    window_tokens -= window.popleft()[_TOKENS]
+            window.append(unit)
+            window_tokens += tokens
+
+        if window:
+            yield self._emit(window)
+
+    def _overlap(self, window: deque):
+        kept: deque = deque()
+        kept_tokens = 0
+        for unit in reversed(window):
+            if kept_tokens + unit[_TOKENS] > self.overlap_tokens:
+                break
+            kept.appendleft(unit)
+            kept_tokens += unit[_TOKENS]
+        return kept, kept_tokens
+
+    @staticmethod
+    def _emit(window: deque) -> Chunk:
+        start, _, text, _, _ = window[0]
+        if len(window) > 1:
+            text += "".join(gap + unit_text for _, _, unit_text, gap, _ in islice(window, 1, None))
+        return Chunk(text=text, start=start, end=window[-1][1])
+
+    def _units(self, blocks: Iterable[str]) -> Iterator[_Unit]:
+        carry = ""
+        carry_offset = 0
+        gap = ""
+        for block in blocks:
+            buffer = carry + block
+            # The carry-over holds no complete boundary, except maybe in its trailing whitespace
+            cut = _last_boundary(buffer, max(0, len(carry.rstrip()) - 1))
+            if cut is None:
+                carry = buffer
+                continue
+            gap = yield from self._piece_units(buffer[:cut], carry_offset, gap)
+            carry = buffer[cut:]
+            carry_offset += cut
+        if carry:
+            yield from self._piece_units(carry, carry_offset, gap)
+
+    def _piece_units(self, piece: str, offset: int, gap: str):
+        """Yield the units of a piece ending on a sentence boundary; return its trailing gap."""
+        position = 0
+        max_tokens = self.max_tokens
+        lookup = self._token_cache.__getitem__
+        for start, end in iter_sentences(piece):
+            sentence = piece[start:end]
+            words = sentence.split()
+            if not words:
+                continue
+            try:
+                tokens = sum(map(lookup, words))
+            except KeyError:
+                tokens = self._count_new(words)
+            if tokens <= max_tokens:
+                # Fast path: the whole sentence is one unit
+                start += len(sentence) - len(sentence.lstrip())
+                end -= len(sentence) - len(sentence.rstrip())
+                yield (offset + start, offset + end, piece[start:end], gap + piece[position:start], tokens)
+                gap, position = "", end
+                continue
+
+            words = list(_WORD.finditer(piece, start, end))
+            start = words[0].start()
+            tokens = 0
+            for word in words:
+                word_tokens = self.count_tokens(word.group())
+                if tokens and tokens + word_tokens > max_tokens:
+                    # Over-long sentence: cut it between words
+                    end = previous_end
+                    yield (offset + start, offset + end, piece[start:end], gap + piece[position:start], tokens)
+                    gap, position = "", end
+                    start, tokens = word.start(), 0
+                tokens += word_tokens
+                previous_end = word.end()
+            yield (offset + start, offset + previous_end, piece[start:previous_end], gap + piece[position:start], tokens)
+            gap, position = "", previous_end
+        return gap + piece[position:]
+
+
+def iter_sentences(piece: str) -> Iterator[Tuple[int, int]]:
+    """[start, end) offsets of the sentences in piece, without the whitespace between them."""
+    start = 0
+    for boundary in _BOUNDARY.finditer(piece):
+        # A sentence ends after its punctuation, or where the blank line begins
+        end = boundary.start() if piece[boundary.start()] == "\n" else boundary.start() + 1
+        if end > start:
+            yield start, end
+        start = boundary.end()
+    if start < len(piece):
+        yield start, len(piece)
+
+
+def _last_boundary(buffer: str, lo: int = 0):
+    """Offset just past the last complete boundary in buffer[lo:], or None."""
+    cut = None
+    # Look at a growing tail of the buffer rather than scanning all of it
+    tail = 4096
+    while cut is None:
+        # One character early: a boundary match starts at the punctuation before the whitespace
+        for boundary in _BOUNDARY.finditer(buffer, max(lo, len(buffer) - tail - 1)):
+            # A boundary touching the end of the buffer may continue in the next block
+            if boundary.end() < len(buffer):
+                cut = boundary.end()
+        if tail >= len(buffer) - lo:
+            break
+        tail *= 4
+    if cut is None and len(buffer) > MAX_CARRY_CHARS:
+        space = buffer.rfind(" ", 0, len(buffer) - 1)
+        if space > 0:
+            cut = space + 1
+    return cut
@@ -0,0 +1,250 @@
+import math
+import re
+import threading
+from collections import defaultdict
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable, Dict, Hashable, List, Optional, Sequence
+
+from .chunking import Chunk, iter_sentences
+
+DEFAULT_SEPARATOR = "\n---\n"
+_WORD = re.compile(r"\w+")
+
+
+@dataclass
+class PackedContext:
+    """Context for one prompt and what packing it saved."""
+    text: str
+    chunk_ids: List[int]  # chunks that contributed, most relevant span first
+    tokens: int
+    naive_tokens: int  # the retrieved chunks simply joined with the separator
+    duplicate_sentences: int = 0
+    truncated: bool = False
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.naive_tokens - self.tokens
+
+
+@dataclass
+class _Group:
+    # Retrieved chunks that touch or overlap in the source, merged into one span
+    document: Hashable
+    chunk_ids: List[int]
+    rank: int  # best relevance rank among them
+    text: str
+    start: int
+    end: int
+
+
+class ContextPacker:
+    """
+    Assemble retrieved chunks into a prompt context of at most max_tokens tokens.
+
+    1. Chunks that overlap in the source (the chunker's sentence overlap) or
+       are consecutive are merged into one span, so shared text appears once.
+    2. Sentences that repeat one already in the context are dropped: exactly
+       the same words, or word-set Jaccard similarity >= similarity.
+    3. Spans are added most relevant first, sentence by sentence, until the
+       budget is full.
+
+    Token counts come from count_tokens (the chat model's tokenizer, see
+    for_model) and are memoized per sentence. stats() sums up the tokens
+    saved over all packed contexts.
+    """
+
+    def __init__(
+        self,
+        count_tokens: Callable[[str], int],
+        max_tokens: int = 1500,
+        separator: str = DEFAULT_SEPARATOR,
+        similarity: float = 0.9,
+        cache_size: int = 1 << 14,
+    ):
+        self.count_tokens = lru_cache(maxsize=cache_size)(count_tokens)
+        self.max_tokens = max_tokens
+        self.separator = separator
+        self.similarity = similarity
+        self._separator_tokens = count_tokens(separator)
+        self._lock = threading.Lock()
+        self.contexts = 0
+        self.naive_tokens = 0
+        self.packed_tokens = 0
+        self.duplicate_sentences = 0
+        self.truncated = 0
+
+    @classmethod
+    def for_model(cls, model_name: str, **kwargs) -> "ContextPacker":
+        """Packer counting tokens with the tiktoken encoding of an OpenAI chat model."""
+        import tiktoken
+
+        try:
+            encoding = tiktoken.encoding_for_model(model_name.rsplit("/", 1)[-1])
+        except KeyError:
+            encoding = tiktoken.get_encoding("o200k_base")
+        return cls(lambda text: len(encoding.encode_ordinary(text)), **kwargs)
+
+    def pack(self, chunk_ids: Sequence[int], chunks: Sequence[Chunk]) -> PackedContext:
+        """Pack chunks[i] for i in chunk_ids, given most relevant first."""
+        return self.pack_chunks([chunks[i] for i in chunk_ids], chunk_ids)
+
+    def pack_chunks(
+        self,
+        retrieved: Sequence[Chunk],
+        chunk_ids: Sequence[int],
+        documents: Optional[Sequence[Hashable]] = None,
+    ) -> PackedContext:
+        """
+        Pack already fetched chunks, most relevant first.
+
+        When they come from several documents, documents[i] names the one
+        retrieved[i] belongs to; offsets and ids are only compared within a
+        document.
+        """
+        naive_tokens = self.count_tokens(self.separator.join(chunk.text for chunk in retrieved))
+
+        parts: List[str] = []
+        used_ids: List[int] = []
+        seen = _SeenSentences(self.similarity)
+        remaining = self.max_tokens
+        duplicates = 0
+        truncated = False
+
+        for group in _merge(chunk_ids, retrieved, documents or [None] * len(retrieved)):
+            pieces: List[str] = []
+            previous_end = None
+            for start, end in iter_sentences(group.text):
+                sentence = group.text[start:end].strip()
+                if not sentence:
+                    continue
+                start = group.text.index(sentence, start)
+                words = _WORD.findall(sentence.casefold())
+                if seen.contains(words):
+                    duplicates += 1
+                    previous_end = None
+                    continue
+
+                cost = self.count_tokens(sentence)
+                if not pieces and parts:
+                    cost += self._separator_tokens
+                if cost > remaining:
+                    truncated = True
+                    break
+                remaining -= cost
+
+                if pieces:
+                    # Original whitespace between neighbouring sentences, a space across a dropped one
+                    pieces.append(group.text[previous_end:start] if previous_end is not None else " ")
+                pieces.append(sentence)
+                previous_end = start + len(sentence)
+                seen.add(words)
+
+            if pieces:
+                parts.append("".join(pieces))
+                used_ids.extend(group.chunk_ids)
+
+        text = self.separator.join(parts)
+        packed = PackedContext(
+            text=text,
+            chunk_ids=used_ids,
+            tokens=self.count_tokens(text) if parts else 0,
+            naive_tokens=naive_tokens,
+            duplicate_sentences=duplicates,
+            truncated=truncated,
+        )
+        with self._lock:
+            self.contexts += 1
+            self.naive_tokens += packed.naive_tokens
+            self.packed_tokens += packed.tokens
+            self.duplicate_sentences += duplicates
+            self.truncated += truncated
+        return packed
+
+    def stats(self) -> dict:
+        saved = self.naive_tokens - self.packed_tokens
+        return {
+            "contexts": self.contexts,
+            "naive_tokens": self.naive_tokens,
+            "packed_tokens": self.packed_tokens,
+            "tokens_saved": saved,
+            "tokens_saved_per_context": saved / self.contexts if self.contexts else 0.0,
+            "duplicate_sentences": self.duplicate_sentences,
+            "truncated": self.truncated,
+        }
+
+
+class _SeenSentences:
+    """
+    Sentences already in the context, looked up exactly and by Jaccard similarity.
+
+    Near-duplicate lookup uses prefix filtering: with every word set sorted
+    in one global order, two sets with Jaccard >= t must share a word among
+    the first n - ceil(t * n) + 1 words of each. Only sentences sharing
+    such a word are compared, instead of all of them.
+    """
+
+    # Short sentences ("Yes.", headings) are only deduplicated exactly
+    MIN_WORDS = 4
+
+    def __init__(self, similarity: float):
+        self.similarity = similarity
+        self._keys = set()
+        self._by_prefix_word: Dict[str, List[frozenset]] = defaultdict(list)
+
+    def _prefix(self, words: frozenset) -> List[str]:
+        # Longest words first: they tend to be the rare ones, which keeps the
+        # candidate lists short
+        ordered = sorted(words, key=lambda word: (-len(word), word))
+        return ordered[:len(ordered) - math.ceil(self.similarity * len(ordered)) + 1]
+
+    def contains(self, words: List[str]) -> bool:
+        if " ".join(words) in self._keys:
+            return True
+        unique = frozenset(words)
+        if len(unique) < self.MIN_WORDS or self.similarity >= 1:
+            return False
+        threshold = self.similarity
+        for word in self._prefix(unique):
+            for other in self._by_prefix_word.get(word, ()):
+                if len(unique & other) >= threshold * len(unique | other):
+                    return True
+        return False
+
+    def add(self, words: List[str]) -> None:
+        self._keys.add(" ".join(words))
+        unique = frozenset(words)
+        if len(unique) >= self.MIN_WORDS and self.similarity < 1:
+            for word in self._prefix(unique):
+                self._by_prefix_word[word].append(unique)
+
+
+def _merge(chunk_ids: Sequence[int], retrieved: Sequence[Chunk], documents: Sequence[Hashable]) -> List[_Group]:
+    """Merge overlapping or consecutive chunks; groups come back most relevant first."""
+    # Group by document, then by position; the key avoids comparing unorderable documents
+    order = {document: i for i, document in enumerate(dict.fromkeys(documents))}
+    ranked = sorted(
+        zip(chunk_ids, retrieved, range(len(retrieved)), documents),
+        key=lambda item: (order[item[3]], item[1].start),
+    )
+    groups: List[_Group] = []
+    previous_id = None
+    for chunk_id, chunk, rank, document in ranked:
+        group = groups[-1] if groups and groups[-1].document == document else None
+        if group is not None and chunk.start < group.end:
+            # Overlap: append only the part past the group's end
+            if chunk.end > group.end:
+                group.text += chunk.text[group.end - chunk.start:]
+                group.end = chunk.end
+        elif group is not None and previous_id is not None and chunk_id == previous_id + 1:
+            # Consecutive chunks without overlap: only whitespace lies between them
+            group.text += " " + chunk.text
+            group.end = chunk.end
+        else:
+            groups.append(_Group(document, [], rank, chunk.text, chunk.start, chunk.end))
+            group = groups[-1]
+        group.chunk_ids.append(chunk_id)
+        group.rank = min(group.rank, rank)
+        previous_id = chunk_id
+    groups.sort(key=lambda group: group.rank)
+    return groups
@@ -0,0 +1,117 @@
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Sequence
+
+import numpy as np
+
+# Shared memory on Linux: the embeddings never touch the disk
+DEFAULT_TMP_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+_model = None  # this worker's SentenceTransformer
+
+
+def _init_worker(model_name: str, threads: int, device: str) -> None:
+    global _model
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    # N workers x all cores each would oversubscribe the CPU
+    torch.set_num_threads(threads)
+    _model = SentenceTransformer(model_name, device=device)
+
+
+def _dimension() -> int:
+    return _model.get_sentence_embedding_dimension()
+
+
+def _encode_into(path: str, shape: tuple, start: int, texts: list, batch_size: int) -> int:
+    out = np.memmap(path, dtype="float32", mode="r+", shape=shape)
+    out[start:start + len(texts)] = _model.encode(texts, batch_size=batch_size)
+    del out
+    return len(texts)
+
+
+class EmbeddingPool:
+    """
+    Encode with a SentenceTransformer in several processes at once.
+
+    Each worker loads its own copy of the model. encode() splits the texts
+    into shards of chunk_size, and every worker writes its embeddings
+    straight into its rows of one memory-mapped output file. Results come
+    back in input order and no vectors are pickled through pipes or
+    concatenated; the returned array is that mapping.
+
+    Workers are spawned, so they re-import the script that created the pool
+    under the name __mp_main__: keep its top level free of side effects, or
+    guard them with `if __name__ == "__main__"`.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        workers: Optional[int] = None,
+        batch_size: int = 32,
+        chunk_size: Optional[int] = None,
+        device: str = "cpu",
+        threads_per_worker: Optional[int] = None,
+        tmp_dir: Optional[str] = DEFAULT_TMP_DIR,
+    ):
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        # Texts per task: a few model batches, so workers stay busy without
+        # one slow shard holding up the end of the call
+        self.chunk_size = chunk_size or 4 * batch_size
+        self.tmp_dir = tmp_dir
+        threads = threads_per_worker or max(1, (os.cpu_count() or 1) // self.workers)
+        self._executor = ProcessPoolExecutor(
+            self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(model_name, threads, device),
+        )
+        self.dim = self._executor.submit(_dimension).result()
+
+    def encode(self, texts: Sequence[str]) -> np.ndarray:
+        """(len(texts), dim) float32 embeddings in input order."""
+        if not len(texts):
+            return np.zeros((0, self.dim), dtype="float32")
+
+        fd, path = tempfile.mkstemp(prefix="embeddings-", suffix=".f32", dir=self.tmp_dir)
+        os.close(fd)
+        shape = (len(texts), self.dim)
+        try:
+            out = np.memmap(path, dtype="float32", mode="w+", shape=shape)
+            futures = [
+                self._executor.submit(
+                    _encode_into, path, shape, start, list(texts[start:start + self.chunk_size]), self.batch_size
+                )
+                for start in range(0, len(texts), self.chunk_size)
+            ]
+            for future in futures:
+                future.result()
+        except BaseException:
+            os.unlink(path)
+            raise
+
+        try:
+            # The mapping stays valid after unlinking; the pages are freed
+            # once the returned array is garbage collected
+            os.unlink(path)
+        except PermissionError:
+            # Windows refuses to delete a mapped file
+            embeddings = np.array(out)
+            del out
+            os.unlink(path)
+            return embeddings
+        return out
+
+    def close(self) -> None:
+        self._executor.shutdown()
+
+    def __enter__(self) -> "EmbeddingPool":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -0,0 +1,122 @@
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Optional, Sequence
+
+from .shards import DocumentStore
+
+
+class HotSwapStore:
+    """
+    The DocumentStore requests read, replaceable without downtime.
+
+    Requests take `current` once and use that snapshot to the end, so a swap
+    never mixes ids of one index with chunks of another. rebuild_in_background()
+    loads a new store on a separate thread, off the request path, then
+    replaces the reference in a single assignment: new requests see the new
+    version at once, in-flight ones finish on the old one, which is freed
+    when the last of them drops it.
+
+    Every swap bumps `generation` (also stamped on the store) and records
+    how long the rebuild took and when the swap happened; on_swap runs
+    after each swap, e.g. to clear caches keyed on chunk ids.
+    """
+
+    def __init__(
+        self,
+        load: Callable[[], DocumentStore],
+        on_swap: Optional[Callable[[DocumentStore], None]] = None,
+    ):
+        self._load = load
+        self._on_swap = on_swap
+        self._rebuild_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._watcher: Optional[threading.Thread] = None
+        self.generation = 0
+        self.rebuilds = 0
+        self.last_rebuild_seconds: Optional[float] = None
+        self.swapped_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.rebuild()
+
+    @property
+    def current(self) -> DocumentStore:
+        return self._current
+
+    @property
+    def rebuilding(self) -> bool:
+        return self._rebuild_lock.locked()
+
+    def rebuild(self) -> DocumentStore:
+        """Load a new store in this thread and swap it in; concurrent calls run one after another."""
+        with self._rebuild_lock:
+            started = time.perf_counter()
+            try:
+                store = self._load()
+            except Exception as exc:
+                self.last_error = f"{type(exc).__name__}: {exc}"
+                raise
+            self.last_rebuild_seconds = time.perf_counter() - started
+            store.generation = self.generation + 1
+            self._current = store  # the swap: one reference assignment
+            self.generation = store.generation
+            self.rebuilds += 1
+            self.swapped_at = time.time()
+            self.last_error = None
+        if self._on_swap is not None:
+            self._on_swap(store)
+        return store
+
+    def rebuild_in_background(self) -> bool:
+        """Start a rebuild thread; False if one is already running."""
+        if self._thread is not None and self._thread.is_alive():
+            return False
+        self._thread = threading.Thread(target=self._rebuild_quietly, name="index-rebuild", daemon=True)
+        self._thread.start()
+        return True
+
+    def watch(self, paths: Sequence[Path], interval: float = 5.0) -> None:
+        """Poll the files' size and mtime every interval seconds and rebuild when they change."""
+        if self._watcher is not None:
+            return
+
+        def signature():
+            return tuple((p.stat().st_mtime_ns, p.stat().st_size) if p.exists() else None for p in paths)
+
+        def poll():
+            last = signature()
+            while True:
+                time.sleep(interval)
+                current = signature()
+                if current != last and self.rebuild_in_background():
+                    last = current
+
+        paths = [Path(p) for p in paths]
+        self._watcher = threading.Thread(target=poll, name="index-watch", daemon=True)
+        self._watcher.start()
+
+    def stats(self) -> dict:
+        store = self._current
+        return {
+            "generation": self.generation,
+            "rebuilding": self.rebuilding,
+            "rebuilds": self.rebuilds,
+            "last_rebuild_seconds": self.last_rebuild_seconds,
+            "swapped_at": _isoformat(self.swapped_at),
+            "last_error": self.last_error,
+            "chunks": len(store.chunks),
+        }
+
+    def _rebuild_quietly(self) -> None:
+        try:
+            self.rebuild()
+        except Exception:
+            # Keep serving the current store; the error is in stats()
+            pass
+
+
+def _isoformat(timestamp: Optional[float]) -> Optional[str]:
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).isoformat()
@@ -0,0 +1,393 @@
+import hashlib
+import io
+import json
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import faiss
+import numpy as np
+
+from .bm25 import BM25Index
+from .chunking import Chunk
+from .files import dump_json, write_atomic
+from .index_cache import CHUNKS_FILE, INDEX_FILE, MANIFEST_FILE
+from .ingest import DEFAULT_BATCH_SIZE, iter_batches
+from .shards import DocumentStore
+from .storage import load_chunks, write_chunk_store
+
+IDS_FILE = "ids.npy"
+JOURNAL_FILE = "journal.bin"
+# save() rewrites everything once the journal outgrows this fraction of index.faiss
+COMPACT_RATIO = 0.5
+
+
+def chunk_id(text: str) -> int:
+    """Stable id of a chunk's text: 63 bits of its BLAKE2 hash (FAISS ids are signed, -1 means none)."""
+    digest = hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little") & (2**63 - 1)
+
+
+@dataclass
+class SyncStats:
+    """What sync() changed; only `added` chunks were embedded."""
+    added: int = 0
+    removed: int = 0
+    unchanged: int = 0
+    embed_seconds: float = 0.0
+    seconds: float = 0.0
+
+
+class IncrementalStore:
+    """
+    A FAISS IndexIDMap whose ids are hashes of the chunk texts.
+
+    A chunk's id depends only on its text, so after an edit of the source
+    the chunks that did not change keep their ids and vectors. sync() diffs
+    the new chunk list against the stored ids: it removes the ids that are
+    gone, embeds only the new texts, and refreshes the offsets of the rest.
+    Editing one paragraph re-embeds the few chunks around it instead of the
+    whole corpus. Chunks with identical text share one id and one vector.
+
+    The store is mutated in place and is not meant to be searched directly;
+    snapshot() returns a DocumentStore with its own copy of the index, which
+    later updates do not touch (see HotSwapStore).
+
+    save() appends the changes since the previous save to a journal next to
+    the saved index, so a small edit writes a few kilobytes, not the corpus.
+    """
+
+    def __init__(
+        self,
+        dim: int,
+        encode: Callable[[List[str]], np.ndarray],
+        index: Optional[faiss.Index] = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ):
+        # The inner index has to support remove_ids: flat or IVF, not HNSW
+        self.index = index if index is not None else faiss.IndexIDMap(faiss.IndexFlatL2(dim))
+        self.encode = encode
+        self.batch_size = batch_size
+        self._chunks: Dict[int, Chunk] = {}  # in source order
+        self._lock = threading.Lock()
+        # Changes since the last save, tracked only while that save can take a
+        # journal record: vectors of added ids, removed ids, ids with new offsets
+        self._unsaved_vectors: Dict[int, np.ndarray] = {}
+        self._unsaved_removed: Set[int] = set()
+        self._unsaved_moved: Set[int] = set()
+        # Directory holding our last save, which the journal may extend
+        self._saved_to: Optional[Path] = None
+
+    def __len__(self) -> int:
+        return len(self._chunks)
+
+    def __contains__(self, id: int) -> bool:
+        return id in self._chunks
+
+    @property
+    def ids(self) -> List[int]:
+        return list(self._chunks)
+
+    def add(self, chunks: Iterable[Chunk]) -> List[int]:
+        """Embed and add the chunks whose text is not stored yet; returns their ids."""
+        with self._lock:
+            return self._add(chunks)
+
+    def remove(self, ids: Iterable[int]) -> int:
+        """Remove chunks by id; returns how many were stored."""
+        with self._lock:
+            return self._remove(ids)
+
+    def upsert(self, chunks: Iterable[Chunk]) -> List[int]:
+        """add() the new chunks and update the offsets of those already stored; returns all their ids."""
+        chunks = list(chunks)
+        with self._lock:
+            self._add(chunks)
+            ids = []
+            for chunk in chunks:
+                id = chunk_id(chunk.text)
+                self._move(id, chunk)
+                ids.append(id)
+            return ids
+
+    def sync(self, chunks: Iterable[Chunk]) -> SyncStats:
+        """Make the store hold exactly these chunks (the whole re-chunked source), in this order."""
+        started = time.perf_counter()
+        wanted: Dict[int, Chunk] = {}
+        for chunk in chunks:
+            wanted.setdefault(chunk_id(chunk.text), chunk)
+
+        with self._lock:
+            stats = SyncStats()
+            stats.removed = self._remove([id for id in self._chunks if id not in wanted])
+            embed_started = time.perf_counter()
+            stats.added = len(self._add(chunk for id, chunk in wanted.items() if id not in self._chunks))
+            stats.embed_seconds = time.perf_counter() - embed_started
+            stats.unchanged = len(wanted) - stats.added
+            # Unchanged texts may have moved in the source: take the new offsets and order
+            for id, chunk in wanted.items():
+                self._move(id, chunk)
+            self._chunks = wanted
+        stats.seconds = time.perf_counter() - started
+        return stats
+
+    def snapshot(self, name: str) -> DocumentStore:
+        """
+        An immutable DocumentStore of the current contents.
+
+        Copying the index is a memcpy of the vectors. BM25 has no ids to
+        keep, so it is rebuilt from all chunk texts, on the first lexical or
+        hybrid search rather than here.
+        """
+        with self._lock:
+            index = faiss.clone_index(self.index)
+            chunks = dict(self._chunks)
+        return DocumentStore(name, index, chunks, _LazyBM25(chunks), nbytes=index.ntotal * index.d * 4)
+
+    def save(self, directory: Path, manifest: dict, compact_ratio: float = COMPACT_RATIO) -> bool:
+        """
+        Persist the changes since the last save; True if everything was rewritten.
+
+        If directory holds this store's last save, the changes are appended
+        to its journal: removed ids, the added chunks with their vectors and
+        the new offsets of moved chunks. Otherwise, or once the journal
+        outgrows compact_ratio times the saved index, the whole store is
+        written again (see compact()). Saves to one directory must not run
+        concurrently; rag.py holds cache_lock around them. Several stores
+        syncing the same source may share a directory: replaying a journal
+        record is idempotent.
+        """
+        directory = Path(directory)
+        try:
+            if (
+                self._saved_to != directory.resolve()
+                or _read_manifest(directory) != manifest
+                or _file_size(directory / JOURNAL_FILE) > compact_ratio * (directory / INDEX_FILE).stat().st_size
+            ):
+                self.compact(directory, manifest)
+                return True
+        except FileNotFoundError:
+            self.compact(directory, manifest)
+            return True
+
+        with self._lock:
+            record = self._take_changes()
+        if record is None:
+            return False
+        try:
+            with open(directory / JOURNAL_FILE, "ab") as f:
+                f.write(len(record).to_bytes(8, "little"))
+                f.write(record)
+        except BaseException:
+            # The changes are gone from memory: the next save writes everything
+            self._saved_to = None
+            raise
+        return False
+
+    def compact(self, directory: Path, manifest: dict) -> None:
+        """Write the index, chunks and ids and drop the journal; the manifest goes last, as in index_cache.save_index."""
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        manifest_path = directory / MANIFEST_FILE
+        manifest_path.unlink(missing_ok=True)
+        with self._lock:
+            self._take_changes()
+            chunks = dict(self._chunks)
+            write_atomic(directory / INDEX_FILE, lambda tmp: faiss.write_index(self.index, str(tmp)))
+            # Changes from here on go to the journal of this save
+            self._saved_to = directory.resolve()
+        try:
+            write_atomic(directory / CHUNKS_FILE, lambda tmp: write_chunk_store(tmp, list(chunks.values())))
+            write_atomic(directory / IDS_FILE, lambda tmp: _save_ids(tmp, list(chunks)))
+            (directory / JOURNAL_FILE).unlink(missing_ok=True)
+            write_atomic(manifest_path, lambda tmp: dump_json(tmp, manifest))
+        except BaseException:
+            self._saved_to = None
+            raise
+
+    @classmethod
+    def load_or_create(
+        cls,
+        directory: Path,
+        manifest: dict,
+        dim: int,
+        encode: Callable[[List[str]], np.ndarray],
+        **kwargs: Any,
+    ) -> "IncrementalStore":
+        """
+        The store saved in directory, or an empty one.
+
+        Unlike index_cache, the manifest must not include the source hash:
+        a changed source is what sync() is for. It should describe the
+        embedding model and chunker, since vectors from another model
+        cannot be mixed in.
+        """
+        store = cls(dim, encode, **kwargs)
+        directory = Path(directory)
+        try:
+            if _read_manifest(directory) != manifest:
+                return store
+            index = faiss.read_index(str(directory / INDEX_FILE))
+            chunks = load_chunks(directory / CHUNKS_FILE, use_mmap=False)
+            ids = np.load(directory / IDS_FILE).tolist()
+        except (FileNotFoundError, json.JSONDecodeError, RuntimeError, ValueError):
+            return store
+        if not index.ntotal == len(chunks) == len(ids):
+            return store
+        store.index = index
+        store._chunks = dict(zip(ids, chunks))
+        records, complete = _read_journal(directory / JOURNAL_FILE)
+        for record in records:
+            store._replay(record)
+        if records:
+            # Records add chunks at the end: restore source order
+            store._chunks = dict(sorted(store._chunks.items(), key=lambda item: item[1].start))
+        # Records appended behind a torn one would never be read: the next save rewrites everything
+        store._saved_to = directory.resolve() if complete else None
+        return store
+
+    def _add(self, chunks: Iterable[Chunk]) -> List[int]:
+        added = []
+        for batch in iter_batches(chunks, self.batch_size):
+            new: Dict[int, Chunk] = {}
+            for chunk in batch:
+                id = chunk_id(chunk.text)
+                if id not in self._chunks:
+                    new.setdefault(id, chunk)
+            if not new:
+                continue
+            embeddings = np.ascontiguousarray(self.encode([chunk.text for chunk in new.values()]), dtype="float32")
+            self.index.add_with_ids(embeddings, np.fromiter(new, dtype="int64", count=len(new)))
+            self._chunks.update(new)
+            if self._saved_to is not None:
+                self._unsaved_vectors.update(zip(new, embeddings))
+            added.extend(new)
+        return added
+
+    def _remove(self, ids: Iterable[int]) -> int:
+        stored = [id for id in dict.fromkeys(ids) if id in self._chunks]
+        if stored:
+            # One call: removing from a flat index compacts all of its vectors
+            self.index.remove_ids(np.array(stored, dtype="int64"))
+            for id in stored:
+                del self._chunks[id]
+                self._unsaved_vectors.pop(id, None)
+                self._unsaved_moved.discard(id)
+            if self._saved_to is not None:
+                self._unsaved_removed.update(stored)
+        return len(stored)
+
+    def _move(self, id: int, chunk: Chunk) -> None:
+        # Store chunk, already embedded under id, with possibly new offsets
+        stored = self._chunks.get(id)
+        if self._saved_to is not None and stored is not None and (stored.start, stored.end) != (chunk.start, chunk.end):
+            self._unsaved_moved.add(id)
+        self._chunks[id] = chunk
+
+    def _take_changes(self) -> Optional[bytes]:
+        # The unsaved changes as one journal record (None if there are none), then forget them
+        if not (self._unsaved_vectors or self._unsaved_removed or self._unsaved_moved):
+            return None
+        added = np.fromiter(self._unsaved_vectors, dtype="int64", count=len(self._unsaved_vectors))
+        moved = np.fromiter(
+            (id for id in self._unsaved_moved if id not in self._unsaved_vectors), dtype="int64"
+        )
+        texts = [self._chunks[id].text.encode("utf-8") for id in added.tolist()]
+        offsets = [(self._chunks[id].start, self._chunks[id].end) for id in (*added.tolist(), *moved.tolist())]
+        buffer = io.BytesIO()
+        np.savez(
+            buffer,
+            removed=np.fromiter(self._unsaved_removed, dtype="int64", count=len(self._unsaved_removed)),
+            added=added,
+            vectors=np.array(list(self._unsaved_vectors.values()), dtype="float32").reshape(len(added), self.index.d),
+            text_ends=np.cumsum([len(text) for text in texts], dtype="int64"),
+            texts=np.frombuffer(b"".join(texts), dtype="uint8"),
+            moved=moved,
+            offsets=np.array(offsets, dtype="int64").reshape(len(offsets), 2),
+        )
+        self._unsaved_vectors = {}
+        self._unsaved_removed = set()
+        self._unsaved_moved = set()
+        return buffer.getvalue()
+
+    def _replay(self, record: Dict[str, np.ndarray]) -> None:
+        # Apply one journal record; ids already removed or added are skipped
+        self._remove(record["removed"].tolist())
+        added = record["added"].tolist()
+        texts = record["texts"].tobytes()
+        text_ends = record["text_ends"].tolist()
+        new = [i for i, id in enumerate(added) if id not in self._chunks]
+        if new:
+            self.index.add_with_ids(record["vectors"][new], record["added"][new])
+        offsets = record["offsets"].tolist()
+        for i in new:
+            start, end = offsets[i]
+            text = texts[text_ends[i - 1] if i else 0 : text_ends[i]].decode("utf-8")
+            self._chunks[added[i]] = Chunk(text, start, end)
+        for id, (start, end) in zip(added + record["moved"].tolist(), offsets):
+            stored = self._chunks.get(id)
+            if stored is not None:
+                self._chunks[id] = Chunk(stored.text, start, end)
+
+
+class _LazyBM25:
+    # BM25Index built on first use; it numbers documents by position, searches answer with chunk ids
+    def __init__(self, chunks: Dict[int, Chunk]):
+        self._chunks = chunks
+        self._ids: Sequence[int] = list(chunks)
+        self._index: Optional[BM25Index] = None
+        self._lock = threading.Lock()
+
+    def search(self, query: str, k: int) -> List[Tuple[int, float]]:
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    self._index = BM25Index.build(chunk.text for chunk in self._chunks.values())
+        return [(self._ids[i], score) for i, score in self._index.search(query, k)]
+
+
+def _read_manifest(directory: Path) -> Any:
+    with open(directory / MANIFEST_FILE, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _file_size(path: Path) -> int:
+    try:
+        return path.stat().st_size
+    except FileNotFoundError:
+        return 0
+
+
+def _read_journal(path: Path) -> Tuple[List[Dict[str, np.ndarray]], bool]:
+    """
+    The records of a journal, and whether all of it could be read.
+
+    Each record is a uint64 length and an .npz payload. A record cut short
+    (a crash while appending) ends the journal: it and anything after it
+    are skipped, and the changes it held are re-embedded by the next sync.
+    """
+    try:
+        data = path.read_bytes()
+    except FileNotFoundError:
+        return [], True
+    records = []
+    position = 0
+    while position < len(data):
+        size = int.from_bytes(data[position : position + 8], "little")
+        payload = data[position + 8 : position + 8 + size]
+        if len(payload) < size or position + 8 > len(data):
+            return records, False
+        try:
+            with np.load(io.BytesIO(payload)) as record:
+                records.append({name: record[name] for name in record.files})
+        except (OSError, ValueError, KeyError):
+            return records, False
+        position += 8 + size
+    return records, True
+
+
+def _save_ids(path: Path, ids: List[int]) -> None:
+    with open(path, "wb") as f:
+        np.save(f, np.array(ids, dtype="int64"))
@@ -0,0 +1,171 @@
+import hashlib
+import json
+import shutil
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Optional, Sequence, Tuple
+
+import faiss
+
+from .bm25 import BM25Index
+from .chunking import Chunk
+from .files import dump_json, write_atomic
+from .storage import ChunkStore, load_chunks, write_chunk_store
+
+INDEX_FILE = "index.faiss"
+CHUNKS_FILE = "chunks.bin"
+LEXICAL_FILE = "bm25.npz"
+MANIFEST_FILE = "manifest.json"
+LOCK_FILE = ".lock"
+
+
+def file_sha256(path: Path, block_size: int = 1 << 20) -> str:
+    """Hash a file in fixed-size blocks so large corpora are never fully loaded."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def build_manifest(source: Path, model_name: str, **params: Any) -> dict:
+    """
+    Describe everything the cached index depends on.
+
+    Any change in the source file, the embedding model or the chunker/index
+    parameters produces a different manifest and therefore a rebuild.
+    """
+    return {
+        "source": str(Path(source).resolve()),
+        "source_sha256": file_sha256(source),
+        "model_name": model_name,
+        "params": params,
+    }
+
+
+def load_cached_index(
+    cache_dir: Path, manifest: dict, use_mmap: bool = True
+) -> Optional[Tuple[faiss.Index, Sequence[Chunk]]]:
+    """
+    Return (index, chunks) from cache_dir if its manifest matches, else None.
+
+    The index is memory-mapped instead of being copied onto the heap, so a
+    warm start costs a file open rather than re-embedding the corpus. With
+    use_mmap the chunks stay memory-mapped too (a storage.ChunkStore);
+    otherwise they are read into a list.
+    """
+    cache_dir = Path(cache_dir)
+    try:
+        with open(cache_dir / MANIFEST_FILE, "r", encoding="utf-8") as f:
+            cached_manifest = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+    if cached_manifest != manifest:
+        return None
+
+    try:
+        index = read_index_mmap(cache_dir / INDEX_FILE)
+        chunks = load_chunks(cache_dir / CHUNKS_FILE, use_mmap=use_mmap)
+    except (RuntimeError, FileNotFoundError, ValueError):
+        return None
+
+    if index.ntotal != len(chunks):
+        return None
+    return index, chunks
+
+
+def read_index_mmap(path: Path) -> faiss.Index:
+    """Memory-map a saved index of any mode."""
+    try:
+        return faiss.read_index(str(path), faiss.IO_FLAG_MMAP | faiss.IO_FLAG_MMAP_IFC)
+    except RuntimeError:
+        # The IFC hook cannot read IVF inverted lists; plain IO_FLAG_MMAP maps those too
+        return faiss.read_index(str(path), faiss.IO_FLAG_MMAP)
+
+
+def load_cached_lexical(cache_dir: Path, manifest: dict) -> Optional[BM25Index]:
+    """The BM25 index saved next to a matching cached index, if any."""
+    cache_dir = Path(cache_dir)
+    try:
+        with open(cache_dir / MANIFEST_FILE, "r", encoding="utf-8") as f:
+            if json.load(f) != manifest:
+                return None
+        return BM25Index.load(cache_dir / LEXICAL_FILE)
+    except (FileNotFoundError, json.JSONDecodeError, KeyError, ValueError):
+        return None
+
+
+def save_lexical(cache_dir: Path, manifest: dict, lexical: BM25Index) -> bool:
+    """
+    Add a BM25 index to the cached index it was built for.
+
+    Nothing is written, and False returned, if the cache has meanwhile been
+    rebuilt for another manifest.
+    """
+    cache_dir = Path(cache_dir)
+    try:
+        with open(cache_dir / MANIFEST_FILE, "r", encoding="utf-8") as f:
+            if json.load(f) != manifest:
+                return False
+    except (FileNotFoundError, json.JSONDecodeError):
+        return False
+    write_atomic(cache_dir / LEXICAL_FILE, lexical.save)
+    return True
+
+
+def save_index(
+    cache_dir: Path,
+    manifest: dict,
+    index: faiss.Index,
+    chunks: Sequence[Chunk],
+    lexical: Optional[BM25Index] = None,
+) -> None:
+    """
+    Persist index, chunks, the optional BM25 index and the manifest.
+
+    The manifest is written last, so a crash halfway through leaves a cache
+    that simply fails to match and gets rebuilt on the next start.
+    """
+    cache_dir = Path(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+
+    manifest_path = cache_dir / MANIFEST_FILE
+    manifest_path.unlink(missing_ok=True)
+
+    write_atomic(cache_dir / INDEX_FILE, lambda tmp: faiss.write_index(index, str(tmp)))
+    if isinstance(chunks, ChunkStore):
+        # Already on disk (streamed there while ingesting): copy the file as it is
+        write_atomic(cache_dir / CHUNKS_FILE, lambda tmp: shutil.copyfile(chunks.path, tmp))
+    else:
+        write_atomic(cache_dir / CHUNKS_FILE, lambda tmp: write_chunk_store(tmp, chunks))
+    if lexical is not None:
+        write_atomic(cache_dir / LEXICAL_FILE, lexical.save)
+    else:
+        (cache_dir / LEXICAL_FILE).unlink(missing_ok=True)
+    write_atomic(manifest_path, lambda tmp: dump_json(tmp, manifest))
+
+
+@contextmanager
+def cache_lock(cache_dir: Path):
+    """
+    Hold an exclusive lock on cache_dir for the block.
+
+    Workers starting together take it around "load, else build and save",
+    so one of them embeds the corpus and the others load what it saved.
+    Without fcntl (Windows) the block runs unlocked: every worker builds,
+    and the atomic writes still keep the cache consistent.
+    """
+    cache_dir = Path(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    try:
+        import fcntl
+    except ImportError:  # Windows
+        yield
+        return
+    with open(cache_dir / LOCK_FILE, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
@@ -0,0 +1,189 @@
+import math
+from typing import Optional
+
+import faiss
+import numpy as np
+
+INDEX_MODES = ("flat", "ivf_flat", "ivf_pq", "hnsw", "sq8", "pq")
+
+# Chunk counts at which the automatic selection switches to the next mode
+FLAT_MAX_CHUNKS = 10_000
+HNSW_MAX_CHUNKS = 200_000
+IVF_FLAT_MAX_CHUNKS = 2_000_000
+
+# Training vectors per IVF list, and in total: streaming ingestion buffers
+# them until the index is trained, so this caps that buffer at
+# MAX_TRAIN_VECTORS * dim * 4 bytes (154 MB for 384 dimensions)
+TRAIN_PER_LIST = 64
+MAX_TRAIN_VECTORS = 100_000
+# FAISS warns, and clusters poorly, with fewer training points per centroid
+MIN_TRAIN_PER_LIST = 39
+
+DEFAULT_NPROBE = 16
+DEFAULT_EF_SEARCH = 64
+
+
+def choose_index_mode(num_vectors: int) -> str:
+    """
+    Pick an index type from the corpus size.
+
+    Brute force is exact and fastest to build for small corpora; HNSW gives
+    the best latency/recall trade-off for mid-sized ones; IVF keeps build time
+    and memory in check once the corpus gets large, with PQ on top when even
+    float32 vectors no longer fit comfortably in RAM.
+    """
+    if num_vectors <= FLAT_MAX_CHUNKS:
+        return "flat"
+    if num_vectors <= HNSW_MAX_CHUNKS:
+        return "hnsw"
+    if num_vectors <= IVF_FLAT_MAX_CHUNKS:
+        return "ivf_flat"
+    return "ivf_pq"
+
+
+def default_nlist(num_vectors: int) -> int:
+    # ~4*sqrt(n) lists, but keep at least 39 training points per centroid
+    # (FAISS warns below that and the clustering gets noisy), within the
+    # capped training sample too
+    return max(
+        1,
+        min(
+            int(4 * math.sqrt(num_vectors)),
+            num_vectors // MIN_TRAIN_PER_LIST,
+            MAX_TRAIN_VECTORS // MIN_TRAIN_PER_LIST,
+        ),
+    )
+
+
+def default_pq_m(dim: int) -> int:
+    """Largest number of sub-quantizers <= dim / 8 that divides dim."""
+    for m in range(max(1, dim // 8), 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
+
+
+def build_index(
+    embeddings: np.ndarray,
+    mode: str = "auto",
+    nlist: Optional[int] = None,
+    pq_m: Optional[int] = None,
+    hnsw_m: int = 32,
+    train_size: Optional[int] = None,
+) -> faiss.Index:
+    """
+    Create, train and fill an index of the given mode.
+
+    mode is one of INDEX_MODES or "auto" (see choose_index_mode).
+    Untrained indexes are trained on at most train_size vectors (see default_train_size).
+    """
+    embeddings = np.ascontiguousarray(embeddings, dtype="float32")
+    num_vectors, dim = embeddings.shape
+    index = create_index(dim, num_vectors, mode, nlist=nlist, pq_m=pq_m, hnsw_m=hnsw_m)
+
+    if not index.is_trained:
+        train_size = train_size or default_train_size(index)
+        if num_vectors > train_size:
+            sample = np.random.default_rng(0).choice(num_vectors, train_size, replace=False)
+            index.train(embeddings[np.sort(sample)])
+        else:
+            index.train(embeddings)
+
+    index.add(embeddings)
+    return index
+
+
+def default_train_size(index: faiss.Index) -> int:
+    """
+    Vectors to train index on, 0 if it needs no training.
+
+    TRAIN_PER_LIST per IVF list, never more than MAX_TRAIN_VECTORS in all,
+    but at least MIN_TRAIN_PER_LIST per list for a caller-chosen nlist.
+    """
+    if index.is_trained:
+        return 0
+    if isinstance(index, faiss.IndexIVF):
+        return max(MIN_TRAIN_PER_LIST * index.nlist, min(TRAIN_PER_LIST * index.nlist, MAX_TRAIN_VECTORS))
+    # Scalar/product quantizers: enough for 256 PQ centroids per sub-space
+    return min(100 * 256, MAX_TRAIN_VECTORS)
+
+
+def create_index(
+    dim: int,
+    num_vectors: int,
+    mode: str = "auto",
+    nlist: Optional[int] = None,
+    pq_m: Optional[int] = None,
+    hnsw_m: int = 32,
+) -> faiss.Index:
+    """Create an empty (possibly untrained) index for num_vectors vectors."""
+    if mode == "auto":
+        mode = choose_index_mode(num_vectors)
+
+    if mode == "flat":
+        return faiss.IndexFlatL2(dim)
+
+    if mode == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, hnsw_m)
+        index.hnsw.efConstruction = max(40, 2 * hnsw_m)
+        return index
+
+    if mode in ("ivf_flat", "ivf_pq"):
+        nlist = nlist or default_nlist(num_vectors)
+        quantizer = faiss.IndexFlatL2(dim)
+        if mode == "ivf_flat":
+            index = faiss.IndexIVFFlat(quantizer, dim, nlist)
+        else:
+            # 8-bit codes need 39 * 256 training points; use fewer bits on small corpora
+            nbits = max(1, min(8, int(math.log2(max(2, num_vectors // 39)))))
+            index = faiss.IndexIVFPQ(quantizer, dim, nlist, pq_m or default_pq_m(dim), nbits)
+        return index
+
+    # Compressed exhaustive search: 1 byte per dimension (sq8) or per sub-vector (pq)
+    # instead of 4 bytes per dimension; never picked by "auto"
+    if mode == "sq8":
+        return faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_8bit)
+
+    if mode == "pq":
+        nbits = max(1, min(8, int(math.log2(max(2, num_vectors // 39)))))
+        return faiss.IndexPQ(dim, pq_m or default_pq_m(dim), nbits)
+
+    raise ValueError(f"Unknown index mode {mode!r}, expected 'auto' or one of {INDEX_MODES}")
+
+
+def index_mode(index: faiss.Index) -> str:
+    """Inverse of create_index: name the mode of an existing index."""
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivf_flat"
+    if isinstance(index, faiss.IndexScalarQuantizer):
+        return "sq8"
+    if isinstance(index, faiss.IndexPQ):
+        return "pq"
+    return "flat"
+
+
+def tune_search(
+    index: faiss.Index,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+) -> faiss.Index:
+    """
+    Set the query-time accuracy knobs in place.
+
+    nprobe is the number of inverted lists visited by IVF indexes and
+    ef_search the size of the HNSW candidate queue; both trade latency for
+    recall and can be changed without rebuilding. Other indexes are untouched.
+    """
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = ef_search or DEFAULT_EF_SEARCH
+    else:
+        try:
+            ivf = faiss.extract_index_ivf(index)
+        except RuntimeError:
+            return index
+        ivf.nprobe = min(nprobe or DEFAULT_NPROBE, ivf.nlist)
+    return index
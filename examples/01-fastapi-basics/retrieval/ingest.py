@@ -0,0 +1,122 @@
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List, Optional
+
+import faiss
+import numpy as np
+
+from .chunking import Chunk
+
+DEFAULT_BLOCK_CHARS = 1 << 20
+DEFAULT_BATCH_SIZE = 256
+
+
+@dataclass
+class IngestStats:
+    """Progress of a streaming ingestion, updated after every batch."""
+    chars_read: int = 0
+    chunks: int = 0
+    batches: int = 0
+    started_at: float = field(default_factory=time.perf_counter)
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started_at
+
+    @property
+    def chunks_per_second(self) -> float:
+        return self.chunks / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def mb_per_second(self) -> float:
+        return self.chars_read / 1e6 / self.elapsed if self.elapsed else 0.0
+
+
+def print_progress(stats: IngestStats) -> None:
+    print(
+        f"\r{stats.chunks} chunks, {stats.chars_read / 1e6:.1f}M chars, "
+        f"{stats.chunks_per_second:.0f} chunks/s, {stats.mb_per_second:.2f} MB/s",
+        end="",
+        flush=True,
+    )
+
+
+def iter_text_blocks(
+    path: Path, block_chars: int = DEFAULT_BLOCK_CHARS, stats: Optional[IngestStats] = None
+) -> Iterator[str]:
+    """Read a text file in blocks of block_chars characters."""
+    with open(path, "r", encoding="utf-8") as f:
+        for block in iter(lambda: f.read(block_chars), ""):
+            if stats is not None:
+                stats.chars_read += len(block)
+            yield block
+
+
+def iter_batches(items: Iterable, batch_size: int) -> Iterator[list]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def ingest_stream(
+    chunks: Iterable[Chunk],
+    encode: Callable[[List[str]], np.ndarray],
+    index: faiss.Index,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    train_size: int = 0,
+    stats: Optional[IngestStats] = None,
+    on_progress: Optional[Callable[[IngestStats], None]] = None,
+    sink: Optional[Callable[[List[Chunk]], None]] = None,
+) -> List[Chunk]:
+    """
+    Embed chunks batch by batch and add each batch to index.
+
+    Only one batch of embeddings is alive at a time; an untrained (IVF) index
+    is the exception, buffering the first train_size vectors to train on
+    (index_factory.default_train_size caps that at MAX_TRAIN_VECTORS).
+    The index itself still grows with the corpus.
+
+    Returns the chunks in index order. With sink (e.g. a
+    storage.ChunkStoreWriter's extend), every batch is handed to it instead
+    and the list returned is empty, so chunk texts are not kept either.
+    """
+    stats = stats or IngestStats()
+    ingested: List[Chunk] = []
+    sink = sink or ingested.extend
+    pending: List[np.ndarray] = []
+    pending_rows = 0
+
+    for batch in iter_batches(chunks, batch_size):
+        embeddings = np.ascontiguousarray(encode([chunk.text for chunk in batch]), dtype="float32")
+        sink(batch)
+
+        if index.is_trained:
+            index.add(embeddings)
+        else:
+            pending.append(embeddings)
+            pending_rows += len(embeddings)
+            if pending_rows >= train_size:
+                _train_and_flush(index, pending)
+                pending, pending_rows = [], 0
+
+        stats.chunks += len(batch)
+        stats.batches += 1
+        if on_progress is not None:
+            on_progress(stats)
+
+    if pending:
+        # Corpus ended before train_size was reached: train on what we have
+        _train_and_flush(index, pending)
+    return ingested
+
+
+def _train_and_flush(index: faiss.Index, pending: List[np.ndarray]) -> None:
+    sample = np.concatenate(pending)
+    index.train(sample)
+    index.add(sample)
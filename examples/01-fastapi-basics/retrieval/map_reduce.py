@@ -0,0 +1,99 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import AsyncIterator, Awaitable, Callable, List, Optional, Sequence
+
+# What a map call answers when its chunk says nothing about the question
+NO_EVIDENCE = "NONE"
+
+MAP_PROMPT = (
+    "Use the following part of a document to see if any of it is relevant to the question. "
+    f"Return any relevant text verbatim, or {NO_EVIDENCE} if there is none.\n\n"
+    "{context}\n\nQuestion: {question}\nRelevant text, if any:"
+)
+REDUCE_PROMPT = (
+    "Given the following extracted parts of a long document and a question, answer the question. "
+    "If the parts do not contain the answer, say that you don't know.\n\n"
+    "{summaries}\n\nQuestion: {question}\nAnswer:"
+)
+SEPARATOR = "\n---\n"
+
+
+@dataclass
+class Partial:
+    """The map result for one chunk."""
+    index: int  # position of the chunk in the retrieved list
+    text: str
+    seconds: float
+
+    @property
+    def relevant(self) -> bool:
+        text = self.text.strip()
+        return bool(text) and text.rstrip(".").upper() != NO_EVIDENCE
+
+
+async def amap_chunks(
+    question: str,
+    chunks: Sequence[str],
+    acomplete: Callable[[str], Awaitable[str]],
+    max_concurrency: int = 8,
+    enough: Optional[int] = None,
+) -> AsyncIterator[Partial]:
+    """
+    Run the map prompt over every chunk and yield the results as they complete.
+
+    At most max_concurrency completions run at once. With enough set, the
+    remaining calls are cancelled as soon as that many relevant partials
+    have been yielded.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def map_one(index: int, chunk: str) -> Partial:
+        async with semaphore:
+            started = time.perf_counter()
+            text = await acomplete(MAP_PROMPT.format(context=chunk, question=question))
+            return Partial(index, text, time.perf_counter() - started)
+
+    tasks = [asyncio.ensure_future(map_one(i, chunk)) for i, chunk in enumerate(chunks)]
+    relevant = 0
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            partial = await next_done
+            yield partial
+            relevant += partial.relevant
+            if enough is not None and relevant >= enough:
+                return
+    finally:
+        # Early exit, or the consumer stopped iterating
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def reduce_prompt(question: str, partials: List[Partial]) -> str:
+    # Most relevant chunk first, whichever call finished first
+    relevant = sorted((p for p in partials if p.relevant), key=lambda p: p.index)
+    return REDUCE_PROMPT.format(summaries=SEPARATOR.join(p.text.strip() for p in relevant), question=question)
+
+
+async def amap_reduce(
+    question: str,
+    chunks: Sequence[str],
+    acomplete: Callable[[str], Awaitable[str]],
+    max_concurrency: int = 8,
+    enough: Optional[int] = None,
+    on_partial: Optional[Callable[[Partial], None]] = None,
+) -> str:
+    """
+    Answer from many chunks without putting them all into one prompt.
+
+    Each chunk is condensed by its own small "map" call, run concurrently
+    (see amap_chunks); a single "reduce" call then answers from the
+    relevant extracts. on_partial sees every map result as it arrives.
+    """
+    partials = []
+    async for partial in amap_chunks(question, chunks, acomplete, max_concurrency, enough):
+        partials.append(partial)
+        if on_partial is not None:
+            on_partial(partial)
+    return await acomplete(reduce_prompt(question, partials))
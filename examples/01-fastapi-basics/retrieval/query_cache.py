@@ -0,0 +1,120 @@
+import threading
+import zipfile
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, List
+
+import numpy as np
+
+from .files import write_atomic
+
+
+def normalize_query(text: str) -> str:
+    """Case- and whitespace-insensitive cache key."""
+    return " ".join(text.casefold().split())
+
+
+class QueryEmbeddingCache:
+    """
+    Bounded LRU cache of normalized query text -> embedding in front of an encoder.
+
+    encode() looks every query up first and sends only the misses to the
+    encoder, in one batch. Counters for hits, misses and evictions are kept
+    for monitoring; the cache is safe to share between threads.
+    """
+
+    def __init__(self, encode: Callable[[List[str]], np.ndarray], maxsize: int = 4096, model_name: str = ""):
+        self._encode = encode
+        self.maxsize = maxsize
+        self.model_name = model_name
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def encode(self, queries: List[str]) -> np.ndarray:
+        keys = [normalize_query(query) for query in queries]
+        found = {}
+        with self._lock:
+            for key in keys:
+                vector = self._entries.get(key)
+                if vector is not None:
+                    self._entries.move_to_end(key)
+                    found[key] = vector
+                    self.hits += 1
+                else:
+                    self.misses += 1
+
+        # Encode outside the lock; duplicates within the batch are encoded once
+        missing = list(dict.fromkeys(key for key in keys if key not in found))
+        if missing:
+            vectors = np.asarray(self._encode(missing), dtype="float32")
+            found.update(zip(missing, vectors))
+            with self._lock:
+                for key, vector in zip(missing, vectors):
+                    self._put(key, vector)
+
+        return np.stack([found[key] for key in keys])
+
+    def _put(self, key: str, vector: np.ndarray) -> None:
+        # A copy: a row of the encoded batch or loaded file would keep all of it alive
+        self._entries[key] = vector.copy()
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def save(self, path: Path) -> None:
+        """Write the entries (least recently used first) to an .npz file."""
+        with self._lock:
+            keys = list(self._entries)
+            vectors = list(self._entries.values())
+        if not keys:
+            return
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        def write(tmp: Path) -> None:
+            with open(tmp, "wb") as f:
+                np.savez(f, keys=np.array(keys), vectors=np.stack(vectors), model_name=np.array(self.model_name))
+
+        # A process killed halfway through the save leaves the previous file intact
+        write_atomic(path, write)
+
+    def load(self, path: Path) -> int:
+        """
+        Warm the cache from a file written by save(); returns the entries loaded.
+
+        Files written for another embedding model are ignored, and so are
+        files that cannot be read, e.g. cut short: the cache starts empty.
+        """
+        try:
+            with np.load(path) as data:
+                if str(data["model_name"]) != self.model_name:
+                    return 0
+                keys, vectors = data["keys"], data["vectors"]
+        except (OSError, EOFError, KeyError, ValueError, zipfile.BadZipFile):
+            return 0
+        with self._lock:
+            for key, vector in zip(keys.tolist(), vectors):
+                self._put(key, vector)
+        return len(keys)
@@ -0,0 +1,69 @@
+from typing import List, Optional, Tuple
+
+import faiss
+import numpy as np
+
+from .bm25 import BM25Index, fused_scores
+
+SEARCH_MODES = ("vector", "lexical", "hybrid")
+DEFAULT_HYBRID_CANDIDATES = 20
+
+
+def dense_chunk_ids(index: faiss.Index, query_embeddings: np.ndarray, k: int) -> List[List[int]]:
+    return [[i for _, i in hits] for hits in dense_hits(index, query_embeddings, k)]
+
+
+def dense_hits(index: faiss.Index, query_embeddings: np.ndarray, k: int) -> List[List[Tuple[float, int]]]:
+    distances, indices = index.search(np.ascontiguousarray(query_embeddings, dtype="float32"), k)
+    # Approximate indexes pad with -1 when fewer than k neighbours are found
+    return [
+        [(float(d), int(i)) for d, i in zip(row_distances, row) if i != -1]
+        for row_distances, row in zip(distances, indices)
+    ]
+
+
+def search_chunk_ids(
+    index: faiss.Index,
+    lexical: Optional[BM25Index],
+    queries: List[str],
+    query_embeddings: np.ndarray,
+    k: int = 3,
+    mode: str = "vector",
+    hybrid_candidates: int = DEFAULT_HYBRID_CANDIDATES,
+) -> List[List[int]]:
+    """Chunk ids per query, best first, from the dense index, BM25 or both."""
+    hits = search_hits(index, lexical, queries, query_embeddings, k, mode, hybrid_candidates)
+    return [[i for _, i in row] for row in hits]
+
+
+def search_hits(
+    index: faiss.Index,
+    lexical: Optional[BM25Index],
+    queries: List[str],
+    query_embeddings: np.ndarray,
+    k: int = 3,
+    mode: str = "vector",
+    hybrid_candidates: int = DEFAULT_HYBRID_CANDIDATES,
+) -> List[List[Tuple[float, int]]]:
+    """
+    (score, chunk id) pairs per query, best first.
+
+    Lower scores are better in every mode (L2 distance, negated BM25 or
+    fusion score), so hits from several indexes searched the same way can
+    be merged by score.
+    """
+    if mode == "vector":
+        return dense_hits(index, query_embeddings, k)
+    if mode == "lexical":
+        return [[(-score, i) for i, score in lexical.search(query, k)] for query in queries]
+    if mode == "hybrid":
+        # Exact-term matches (names, tickers, error codes) that dense search
+        # ranks low still make it into the top k without over-fetching
+        candidates = max(k, hybrid_candidates)
+        results = []
+        for query, dense in zip(queries, dense_chunk_ids(index, query_embeddings, candidates)):
+            fused = fused_scores([dense, [i for i, _ in lexical.search(query, candidates)]])
+            best = sorted(fused, key=fused.get, reverse=True)[:k]
+            results.append([(-fused[i], i) for i in best])
+        return results
+    raise ValueError(f"Unknown search mode {mode!r}, expected one of {SEARCH_MODES}")
@@ -0,0 +1,149 @@
+import heapq
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from itertools import islice
+from operator import attrgetter
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence
+
+import faiss
+import numpy as np
+
+from . import search
+from .bm25 import BM25Index
+from .chunking import Chunk
+
+
+@dataclass
+class DocumentStore:
+    """Everything needed to search one document collection: vectors, chunk texts and BM25."""
+    name: str
+    index: faiss.Index
+    chunks: Sequence[Chunk]  # chunks[chunk id]: a list, a ChunkStore or, with hashed ids, a dict
+    lexical: Optional[BM25Index] = None
+    nbytes: int = 0  # approximate memory footprint, used for eviction
+    generation: int = 0  # bumped by HotSwapStore on every rebuild
+
+    def search(
+        self,
+        queries: List[str],
+        query_embeddings: np.ndarray,
+        k: int,
+        mode: str = "vector",
+        hybrid_candidates: int = search.DEFAULT_HYBRID_CANDIDATES,
+    ) -> List[List["Hit"]]:
+        hits = search.search_hits(self.index, self.lexical, queries, query_embeddings, k, mode, hybrid_candidates)
+        return [[Hit(score, self.name, i, self.chunks[i]) for score, i in row] for row in hits]
+
+
+class Hit(NamedTuple):
+    score: float  # lower is better, see search.search_hits
+    collection: str
+    chunk_id: int
+    chunk: Chunk
+
+
+def directory_size(path: Path) -> int:
+    return sum(f.stat().st_size for f in Path(path).iterdir() if f.is_file())
+
+
+class CollectionManager:
+    """
+    Many DocumentStores ("shards", one per document or tenant) behind one search.
+
+    Shards are loaded with load(name) the first time they are needed and kept
+    in LRU order; once their total nbytes exceeds memory_budget the least
+    recently used ones are dropped (a search still using one keeps it alive
+    until it finishes). search() queries the requested shards in parallel on
+    a thread pool, since FAISS releases the GIL, and merges the per-shard
+    top-k lists with a heap.
+    """
+
+    def __init__(
+        self,
+        load: Callable[[str], DocumentStore],
+        memory_budget: int = 1 << 30,
+        max_workers: int = 8,
+    ):
+        self._load = load
+        self.memory_budget = memory_budget
+        self._stores: "OrderedDict[str, DocumentStore]" = OrderedDict()
+        self._loading: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix="shard-search")
+        self.loads = 0
+        self.evictions = 0
+
+    def get(self, name: str) -> DocumentStore:
+        with self._lock:
+            store = self._stores.get(name)
+            if store is not None:
+                self._stores.move_to_end(name)
+                return store
+            loading = self._loading.setdefault(name, threading.Lock())
+
+        # One load per shard; concurrent requests for it wait for that load
+        with loading:
+            with self._lock:
+                store = self._stores.get(name)
+            if store is None:
+                store = self._load(name)
+                with self._lock:
+                    self._stores[name] = store
+                    self.loads += 1
+                    self._evict()
+            with self._lock:
+                self._loading.pop(name, None)
+        return store
+
+    def unload(self, name: str) -> None:
+        with self._lock:
+            self._stores.pop(name, None)
+
+    def search(
+        self,
+        names: Sequence[str],
+        queries: List[str],
+        query_embeddings: np.ndarray,
+        k: int = 3,
+        mode: str = "vector",
+        hybrid_candidates: int = search.DEFAULT_HYBRID_CANDIDATES,
+    ) -> List[List[Hit]]:
+        """The k best hits per query over all the named shards."""
+        futures = [
+            self._executor.submit(
+                lambda name: self.get(name).search(queries, query_embeddings, k, mode, hybrid_candidates), name
+            )
+            for name in names
+        ]
+        per_shard = [future.result() for future in futures]
+        # Every shard's list is already sorted, so a lazy k-way merge is enough
+        return [
+            list(islice(heapq.merge(*(shard[q] for shard in per_shard), key=attrgetter("score")), k))
+            for q in range(len(queries))
+        ]
+
+    @property
+    def nbytes(self) -> int:
+        return sum(store.nbytes for store in self._stores.values())
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "loaded": list(self._stores),
+                "nbytes": self.nbytes,
+                "memory_budget": self.memory_budget,
+                "loads": self.loads,
+                "evictions": self.evictions,
+            }
+
+    def close(self) -> None:
+        self._executor.shutdown()
+
+    def _evict(self) -> None:
+        # Never evict the most recently used shard, even if it alone is over budget
+        while len(self._stores) > 1 and self.nbytes > self.memory_budget:
+            self._stores.popitem(last=False)
+            self.evictions += 1
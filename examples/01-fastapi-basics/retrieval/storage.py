@@ -0,0 +1,134 @@
+import mmap
+import shutil
+from array import array
+from pathlib import Path
+from typing import Iterable, Iterator, Sequence
+
+import numpy as np
+
+from .chunking import Chunk
+
+MAGIC = b"RAGCHNK1"
+_HEADER = len(MAGIC) + 8  # magic + uint64 chunk count
+
+
+def write_chunk_store(path: Path, chunks: Iterable[Chunk]) -> None:
+    """
+    Write chunks to a single file that ChunkStore can memory-map.
+
+    Layout: magic, count, then count+1 uint64 byte offsets into the text
+    blob, count int64 start and end character offsets, then the UTF-8 text
+    of all chunks back to back.
+    """
+    with ChunkStoreWriter(path) as writer:
+        writer.extend(chunks)
+
+
+class ChunkStoreWriter:
+    """
+    Write a chunk store a batch of chunks at a time, e.g. while ingesting.
+
+    Texts go straight to a spill file next to path; only three integers per
+    chunk stay in memory. close() writes the header and copies the texts in
+    behind it. Leaving the `with` block on an exception writes nothing.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._spill_path = self.path.with_name(self.path.name + ".text")
+        self._spill = open(self._spill_path, "wb")
+        self._lengths = array("q")
+        self._starts = array("q")
+        self._ends = array("q")
+
+    def __len__(self) -> int:
+        return len(self._starts)
+
+    def extend(self, chunks: Iterable[Chunk]) -> None:
+        for chunk in chunks:
+            encoded = chunk.text.encode("utf-8")
+            self._spill.write(encoded)
+            self._lengths.append(len(encoded))
+            self._starts.append(chunk.start)
+            self._ends.append(chunk.end)
+
+    def close(self) -> None:
+        self._spill.close()
+        offsets = np.zeros(len(self._lengths) + 1, dtype="<u8")
+        np.cumsum(np.asarray(self._lengths, dtype="<u8"), out=offsets[1:])
+        try:
+            with open(self.path, "wb") as f, open(self._spill_path, "rb") as texts:
+                f.write(MAGIC)
+                f.write(np.array([len(self)], dtype="<u8").tobytes())
+                f.write(offsets.tobytes())
+                f.write(np.asarray(self._starts, dtype="<i8").tobytes())
+                f.write(np.asarray(self._ends, dtype="<i8").tobytes())
+                shutil.copyfileobj(texts, f, 1 << 20)
+        finally:
+            self._spill_path.unlink(missing_ok=True)
+
+    def abort(self) -> None:
+        self._spill.close()
+        self._spill_path.unlink(missing_ok=True)
+
+    def __enter__(self) -> "ChunkStoreWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class ChunkStore(Sequence[Chunk]):
+    """
+    Read-only, memory-mapped list of chunks written by write_chunk_store.
+
+    Nothing is copied onto the Python heap until a chunk is accessed, and all
+    processes opening the same file share its pages through the OS page
+    cache instead of each holding its own list of strings.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[: len(MAGIC)] != MAGIC:
+            self._mmap.close()
+            raise ValueError(f"{self.path} is not a chunk store")
+
+        count = int(np.frombuffer(self._mmap, dtype="<u8", count=1, offset=len(MAGIC))[0])
+        position = _HEADER
+        self._offsets = np.frombuffer(self._mmap, dtype="<u8", count=count + 1, offset=position)
+        position += 8 * (count + 1)
+        self._starts = np.frombuffer(self._mmap, dtype="<i8", count=count, offset=position)
+        position += 8 * count
+        self._ends = np.frombuffer(self._mmap, dtype="<i8", count=count, offset=position)
+        self._text_offset = position + 8 * count
+
+    def __len__(self) -> int:
+        return len(self._starts)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("chunk index out of range")
+        return Chunk(text=self.text(i), start=int(self._starts[i]), end=int(self._ends[i]))
+
+    def __iter__(self) -> Iterator[Chunk]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def text(self, i: int) -> str:
+        begin = self._text_offset + int(self._offsets[i])
+        end = self._text_offset + int(self._offsets[i + 1])
+        return self._mmap[begin:end].decode("utf-8")
+
+
+def load_chunks(path: Path, use_mmap: bool = True) -> Sequence[Chunk]:
+    store = ChunkStore(path)
+    return store if use_mmap else list(store)
@@ -1,9 +1,22 @@
+import asyncio
+import importlib
+import json
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
 from fastapi.routing import APIRouter
 
-from .models import User
+from . import http_pool
+from .models import User, validate_user_lines
 
 router = APIRouter()
 
+# Records of /create_users validated, and answered, per batch
+BULK_CHUNK_SIZE = 1000
+# A User is a few hundred bytes; longer lines are answered with an error, and
+# only their first BULK_MAX_LINE_BYTES + 1 bytes are ever held
+BULK_MAX_LINE_BYTES = 1 << 16
+
 
 @router.get("/hello")
 async def hello_world():
@@ -15,9 +28,152 @@ async def hello_name(name: str):
     return {"message": f"Hello {name}"}
 
 
+async def load_rag():
+    """
+    Import rag.py on first use.
+
+    Importing it loads the embedding model and the index, which takes seconds;
+    doing that in a thread keeps the event loop serving other requests.
+    """
+    return await asyncio.to_thread(importlib.import_module, ".rag", __package__)
+
+
+def sse_event(data, event: str | None = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@router.get("/rag/collections")
+async def rag_collections():
+    """Document collections that can be searched, and which of their shards are loaded."""
+    rag = await load_rag()
+    return {"collections": rag.list_collections(), "shards": rag.collections.stats()}
+
+
+@router.get("/rag/http")
+async def rag_http():
+    """Requests sent to the chat models and how many reused a pooled connection."""
+    return http_pool.stats()
+
+
+@router.get("/rag/index")
+async def rag_index():
+    """Generation of the served index, whether a rebuild is running and how long the last one took."""
+    rag = await load_rag()
+    return rag.live.stats()
+
+
+@router.post("/rag/index/rebuild", status_code=202)
+async def rag_index_rebuild():
+    """
+    Rebuild the index from the source file in the background.
+
+    Queries keep being answered from the current index until the new one
+    is swapped in; poll /rag/index for its generation.
+    """
+    rag = await load_rag()
+    started = rag.reload_index_in_background()
+    return {"started": started, **rag.live.stats()}
+
+
+@router.get("/rag/stream")
+async def rag_stream(question: str, collections: str | None = None):
+    """
+    Answer a question about the document as Server-Sent Events, one event per token.
+
+    With collections (comma-separated names from /rag/collections) the
+    answer is drawn from those document collections instead.
+    """
+    rag = await load_rag()
+    if collections:
+        answer = rag.astream_collection_answer(question, [name.strip() for name in collections.split(",")])
+    else:
+        answer = rag.astream_answer(question)
+
+    async def events():
+        try:
+            async for token in answer:
+                yield sse_event(token)
+        except Exception as exc:
+            yield sse_event(str(exc), event="error")
+            return
+        yield sse_event("", event="end")
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # Disable proxy buffering so tokens reach the client immediately
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.post("/create_user")
 async def create_user(user: User):
     return {
         "message": f"User '{user.username}' created!",
         "result": user,
     }
+
+
+async def ndjson_chunks(request: Request, size: int = BULK_CHUNK_SIZE, max_line_bytes: int = BULK_MAX_LINE_BYTES):
+    """
+    The lines of an NDJSON request body, size at a time, as the body arrives.
+
+    Lines are cut to max_line_bytes + 1 bytes while they are read, so a body
+    without newlines cannot grow a line without bound; the length still
+    shows that the line was too long.
+    """
+    chunk = []
+    partial = b""
+    limit = max_line_bytes + 1
+    async for piece in request.stream():
+        lines = (partial + piece).split(b"\n")
+        partial = lines.pop()[:limit]
+        chunk.extend(line[:limit] for line in lines)
+        while len(chunk) >= size:
+            yield chunk[:size]
+            chunk = chunk[size:]
+    if partial:
+        chunk.append(partial)
+    if chunk:
+        yield chunk
+
+
+class DuplexStreamingResponse(StreamingResponse):
+    """
+    A StreamingResponse whose body is produced while the request body is read.
+
+    StreamingResponse also awaits receive() to notice a client disconnect,
+    which takes request body messages away from request.stream(). Here the
+    body's own request.stream() sees the disconnect instead.
+    """
+
+    async def __call__(self, scope, receive, send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+@router.post("/create_users")
+async def create_users(request: Request):
+    """
+    Create users from an NDJSON body, one User per line.
+
+    Streams back one NDJSON line per record as its chunk is validated,
+    {"line": n, "result": user} or {"line": n, "errors": [...]}, then
+    {"created": ..., "failed": ...}. Neither the request nor the response
+    is held in memory whole.
+    """
+    async def results():
+        line = 1
+        created = failed = 0
+        async for chunk in ndjson_chunks(request):
+            # Validating a chunk takes ~0.1 s: keep the event loop serving meanwhile
+            body, chunk_failed = await asyncio.to_thread(validate_user_lines, chunk, line, BULK_MAX_LINE_BYTES)
+            yield body
+            line += len(chunk)
+            created += sum(1 for record in chunk if record.strip()) - chunk_failed
+            failed += chunk_failed
+        yield json.dumps({"created": created, "failed": failed}) + "\n"
+
+    return DuplexStreamingResponse(results(), media_type="application/x-ndjson")
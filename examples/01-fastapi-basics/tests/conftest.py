@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Import the example's modules the way rag.py does when run as a script
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
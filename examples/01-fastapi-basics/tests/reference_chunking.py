@@ -0,0 +1,193 @@
+"""
+TokenChunker as it was before its per-sentence overhead was cut, kept
+unchanged as the reference tests/test_chunking.py compares against.
+"""
+import re
+from collections import deque
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable, Iterable, Iterator, List, NamedTuple
+
+# Whitespace after sentence-final punctuation, or a blank line
+_BOUNDARY = re.compile(r"(?<=[.!?])\s+|\n\s*\n")
+_WORD = re.compile(r"\S+")
+
+# Text without any sentence boundary is cut at whitespace once the carry-over
+# between streamed blocks grows past this many characters
+MAX_CARRY_CHARS = 1 << 16
+
+
+@dataclass(frozen=True)
+class Chunk:
+    """A chunk of the source text and its [start, end) character offsets."""
+    text: str
+    start: int
+    end: int
+
+
+class _Unit(NamedTuple):
+    # A sentence (or a slice of an over-long one) with the whitespace before it
+    start: int
+    end: int
+    text: str
+    gap: str
+    tokens: int
+
+
+class TokenChunker:
+    """
+    Single-pass chunker that sizes chunks in embedding-model tokens.
+
+    Text is split into sentences, which are packed into chunks of at most
+    max_tokens tokens; consecutive chunks share up to overlap_tokens tokens
+    of whole trailing sentences. Sentences longer than max_tokens are split
+    between words.
+
+    Token counts are computed per word and memoized, which is exact for
+    WordPiece tokenizers such as MiniLM's (they never merge across
+    whitespace) and means a word is only ever tokenized once.
+    """
+
+    def __init__(
+        self,
+        count_tokens: Callable[[str], int],
+        max_tokens: int = 254,
+        overlap_tokens: int = 32,
+        cache_size: int = 1 << 16,
+    ):
+        if not 0 <= overlap_tokens < max_tokens:
+            raise ValueError("overlap_tokens must be in [0, max_tokens)")
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self.count_tokens = lru_cache(maxsize=cache_size)(count_tokens)
+
+    @classmethod
+    def from_sentence_transformer(cls, model, overlap_tokens: int = 32, **kwargs) -> "TokenChunker":
+        """Chunker matched to a SentenceTransformer's tokenizer and input window."""
+        tokenizer = model.tokenizer
+        # Leave room for the [CLS] and [SEP] tokens added around every input
+        max_tokens = model.max_seq_length - tokenizer.num_special_tokens_to_add()
+        return cls(
+            lambda word: len(tokenizer.encode(word, add_special_tokens=False)),
+            max_tokens=max_tokens,
+            overlap_tokens=overlap_tokens,
+            **kwargs,
+        )
+
+    def split(self, text: str) -> List[Chunk]:
+        return list(self.split_stream([text]))
+
+    def split_stream(self, blocks: Iterable[str]) -> Iterator[Chunk]:
+        """Chunk text arriving in blocks; offsets are relative to the whole stream."""
+        window: deque = deque()
+        window_tokens = 0
+
+        for unit in self._units(blocks):
+            if window and window_tokens + unit.tokens > self.max_tokens:
+                yield self._emit(window)
+                window, window_tokens = self._overlap(window)
+                while window and window_tokens + unit.tokens > self.max_tokens:
+                    window_tokens -= window.popleft().tokens
+            window.append(unit)
+            window_tokens += unit.tokens
+
+        if window:
+            yield self._emit(window)
+
+    def _overlap(self, window: deque):
+        kept: deque = deque()
+        kept_tokens = 0
+        for unit in reversed(window):
+            if kept_tokens + unit.tokens > self.overlap_tokens:
+                break
+            kept.appendleft(unit)
+            kept_tokens += unit.tokens
+        return kept, kept_tokens
+
+    @staticmethod
+    def _emit(window: deque) -> Chunk:
+        first = window[0]
+        text = first.text + "".join(unit.gap + unit.text for unit in list(window)[1:])
+        return Chunk(text=text, start=first.start, end=window[-1].end)
+
+    def _units(self, blocks: Iterable[str]) -> Iterator[_Unit]:
+        carry = ""
+        carry_offset = 0
+        gap = ""
+        for block in blocks:
+            buffer = carry + block
+            # The carry-over holds no complete boundary, except maybe in its trailing whitespace
+            cut = _last_boundary(buffer, max(0, len(carry.rstrip()) - 1))
+            if cut is None:
+                carry = buffer
+                continue
+            gap = yield from self._piece_units(buffer[:cut], carry_offset, gap)
+            carry = buffer[cut:]
+            carry_offset += cut
+        if carry:
+            yield from self._piece_units(carry, carry_offset, gap)
+
+    def _piece_units(self, piece: str, offset: int, gap: str):
+        """Yield the units of a piece ending on a sentence boundary; return its trailing gap."""
+        position = 0
+        count_tokens = self.count_tokens
+        for start, end in _iter_sentences(piece):
+            sentence = piece[start:end]
+            words = sentence.split()
+            if not words:
+                continue
+            tokens = sum(map(count_tokens, words))
+            if tokens <= self.max_tokens:
+                # Fast path: the whole sentence is one unit
+                start += len(sentence) - len(sentence.lstrip())
+                end -= len(sentence) - len(sentence.rstrip())
+                yield _Unit(offset + start, offset + end, piece[start:end], gap + piece[position:start], tokens)
+                gap, position = "", end
+                continue
+
+            words = list(_WORD.finditer(piece, start, end))
+            start = words[0].start()
+            tokens = 0
+            for word in words:
+                word_tokens = count_tokens(word.group())
+                if tokens and tokens + word_tokens > self.max_tokens:
+                    # Over-long sentence: cut it between words
+                    end = previous_end
+                    yield _Unit(offset + start, offset + end, piece[start:end], gap + piece[position:start], tokens)
+                    gap, position = "", end
+                    start, tokens = word.start(), 0
+                tokens += word_tokens
+                previous_end = word.end()
+            yield _Unit(offset + start, offset + previous_end, piece[start:previous_end], gap + piece[position:start], tokens)
+            gap, position = "", previous_end
+        return gap + piece[position:]
+
+
+def _iter_sentences(piece: str) -> Iterator[tuple]:
+    start = 0
+    for boundary in _BOUNDARY.finditer(piece):
+        if boundary.start() > start:
+            yield start, boundary.start()
+        start = boundary.end()
+    if start < len(piece):
+        yield start, len(piece)
+
+
+def _last_boundary(buffer: str, lo: int = 0):
+    """Offset just past the last complete boundary in buffer[lo:], or None."""
+    cut = None
+    # Look at a growing tail of the buffer rather than scanning all of it
+    tail = 4096
+    while cut is None:
+        for boundary in _BOUNDARY.finditer(buffer, max(lo, len(buffer) - tail)):
+            # A boundary touching the end of the buffer may continue in the next block
+            if boundary.end() < len(buffer):
+                cut = boundary.end()
+        if tail >= len(buffer) - lo:
+            break
+        tail *= 4
+    if cut is None and len(buffer) > MAX_CARRY_CHARS:
+        space = buffer.rfind(" ", 0, len(buffer) - 1)
+        if space > 0:
+            cut = space + 1
+    return cut
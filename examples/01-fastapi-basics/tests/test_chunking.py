@@ -0,0 +1,53 @@
+import random
+
+import pytest
+
+import reference_chunking
+from retrieval.chunking import TokenChunker, iter_sentences
+
+PIECES = ["word", "Hello", "x", "verylongwordhere", ".", "!", "?", "a.", "b?", "c!", " ", "  ", "\n", "\n\n",
+          "\r\n\r\n", " \n \n", "\t", "...", "e.g.", "3.14", "naïve", "日本語"]
+
+
+def count_tokens(word: str) -> int:
+    return len(word) // 3 + 1
+
+
+def random_text(rng: random.Random, words: int) -> str:
+    return "".join(rng.choice(PIECES) + (" " if rng.random() < 0.6 else "") for _ in range(words))
+
+
+def as_tuples(chunks):
+    return [(chunk.text, chunk.start, chunk.end) for chunk in chunks]
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_matches_reference_on_random_texts(seed):
+    rng = random.Random(seed)
+    for _ in range(200):
+        text = random_text(rng, rng.randint(0, 600))
+        max_tokens = rng.choice([5, 10, 30, 254])
+        overlap_tokens = rng.randint(0, max_tokens - 1)
+        reference = reference_chunking.TokenChunker(count_tokens, max_tokens=max_tokens, overlap_tokens=overlap_tokens)
+        chunker = TokenChunker(
+            count_tokens, max_tokens=max_tokens, overlap_tokens=overlap_tokens, cache_size=rng.choice([4, 1 << 16])
+        )
+        assert as_tuples(chunker.split(text)) == as_tuples(reference.split(text))
+
+        block_size = rng.randint(1, 50)
+        blocks = [text[i : i + block_size] for i in range(0, len(text), block_size)]
+        assert as_tuples(chunker.split_stream(blocks)) == as_tuples(reference.split_stream(blocks))
+        assert list(iter_sentences(text)) == list(reference_chunking._iter_sentences(text))
+
+
+def test_streamed_equals_whole():
+    text = random_text(random.Random(42), 20_000)
+    chunker = TokenChunker(count_tokens, max_tokens=64, overlap_tokens=8)
+    blocks = [text[i : i + 997] for i in range(0, len(text), 997)]
+    assert as_tuples(chunker.split_stream(blocks)) == as_tuples(chunker.split(text))
+
+
+def test_offsets_point_into_the_text():
+    text = random_text(random.Random(7), 5_000)
+    for chunk in TokenChunker(count_tokens, max_tokens=30, overlap_tokens=5).split(text):
+        assert text[chunk.start : chunk.end] == chunk.text
@@ -0,0 +1,108 @@
+import random
+
+import numpy as np
+
+from retrieval.chunking import Chunk
+from retrieval.incremental import JOURNAL_FILE, IncrementalStore
+
+DIM = 8
+MANIFEST = {"model_name": "model", "params": {}}
+
+
+class Encoder:
+    def __init__(self):
+        self.encoded = 0
+
+    def __call__(self, texts):
+        self.encoded += len(texts)
+        return np.stack([np.random.default_rng(sum(map(ord, text))).random(DIM, dtype=np.float32) for text in texts])
+
+
+def chunks_of(texts):
+    chunks, position = [], 0
+    for text in texts:
+        chunks.append(Chunk(text, position, position + len(text)))
+        position += len(text) + 1
+    return chunks
+
+
+def reopen(directory):
+    encoder = Encoder()
+    return IncrementalStore.load_or_create(directory, MANIFEST, DIM, encoder), encoder
+
+
+def assert_same(store, other):
+    assert list(store._chunks.items()) == list(other._chunks.items())
+    query = np.ones((1, DIM), dtype=np.float32)
+    assert (store.index.search(query, 5)[1] == other.index.search(query, 5)[1]).all()
+
+
+def test_sync_embeds_only_new_texts():
+    encoder = Encoder()
+    store = IncrementalStore(DIM, encoder)
+    texts = [f"chunk {i}" for i in range(100)]
+    assert store.sync(chunks_of(texts)).added == 100
+    texts[50] = "edited"
+    stats = store.sync(chunks_of(texts))
+    assert (stats.added, stats.removed, stats.unchanged) == (1, 1, 99)
+    assert encoder.encoded == 101
+
+
+def test_saves_append_to_the_journal_and_reload(tmp_path):
+    rng = random.Random(0)
+    texts = [f"chunk {i} " + "x" * rng.randrange(50) for i in range(500)]
+    store = IncrementalStore(DIM, Encoder())
+    store.sync(chunks_of(texts))
+    assert store.save(tmp_path, MANIFEST)
+    for step in range(5):
+        texts.insert(rng.randrange(len(texts)), f"new {step}")
+        del texts[rng.randrange(len(texts))]
+        store.sync(chunks_of(texts))
+        assert not store.save(tmp_path, MANIFEST, compact_ratio=10)
+        reopened, encoder = reopen(tmp_path)
+        assert_same(reopened, store)
+        assert reopened.sync(chunks_of(texts)).added == 0 and encoder.encoded == 0
+    assert (tmp_path / JOURNAL_FILE).stat().st_size > 0
+
+
+def test_large_journal_is_compacted(tmp_path):
+    texts = [f"chunk {i}" for i in range(20)]
+    store = IncrementalStore(DIM, Encoder())
+    store.sync(chunks_of(texts))
+    store.save(tmp_path, MANIFEST)
+    texts.append("one more")
+    store.sync(chunks_of(texts))
+    assert not store.save(tmp_path, MANIFEST, compact_ratio=10)
+    texts += [f"more {i}" for i in range(100)]
+    store.sync(chunks_of(texts))
+    assert store.save(tmp_path, MANIFEST, compact_ratio=0.5)
+    assert not (tmp_path / JOURNAL_FILE).exists()
+    assert_same(reopen(tmp_path)[0], store)
+
+
+def test_torn_journal_record_is_skipped(tmp_path):
+    texts = [f"chunk {i}" for i in range(200)]
+    store = IncrementalStore(DIM, Encoder())
+    store.sync(chunks_of(texts))
+    store.save(tmp_path, MANIFEST)
+    for edit in ("first edit", "second edit"):
+        texts[10] = edit
+        store.sync(chunks_of(texts))
+        assert not store.save(tmp_path, MANIFEST, compact_ratio=10)
+    journal = tmp_path / JOURNAL_FILE
+    journal.write_bytes(journal.read_bytes()[:-5])
+
+    reopened, encoder = reopen(tmp_path)
+    stats = reopened.sync(chunks_of(texts))
+    assert (stats.added, stats.removed, encoder.encoded) == (1, 1, 1)
+    # Nothing may be appended behind the torn record: the next save rewrites everything
+    assert reopened.save(tmp_path, MANIFEST)
+    assert_same(reopen(tmp_path)[0], reopened)
+
+
+def test_other_manifest_starts_empty(tmp_path):
+    store = IncrementalStore(DIM, Encoder())
+    store.sync(chunks_of(["a", "b"]))
+    store.save(tmp_path, MANIFEST)
+    other = IncrementalStore.load_or_create(tmp_path, {**MANIFEST, "model_name": "other"}, DIM, Encoder())
+    assert len(other) == 0
@@ -0,0 +1,119 @@
+import multiprocessing
+import time
+
+import faiss
+import numpy as np
+import pytest
+
+from retrieval.bm25 import BM25Index
+from retrieval.chunking import Chunk
+from retrieval.index_cache import (
+    cache_lock,
+    load_cached_index,
+    load_cached_lexical,
+    save_index,
+    save_lexical,
+)
+from retrieval.storage import ChunkStore, load_chunks, write_chunk_store
+
+MANIFEST = {"source_sha256": "abc", "model_name": "model", "params": {}}
+TEXTS = ["The cat sat.", "Ünïcödé text, 日本語", "", "E1001 btcusdt error", "x" * 10_000]
+
+
+def make_chunks():
+    return [Chunk(text, 100 * i, 100 * i + len(text)) for i, text in enumerate(TEXTS)]
+
+
+def make_index(n=len(TEXTS), dim=8):
+    index = faiss.IndexFlatL2(dim)
+    index.add(np.random.default_rng(0).random((n, dim), dtype=np.float32))
+    return index
+
+
+def test_chunk_store_round_trip(tmp_path):
+    chunks = make_chunks()
+    write_chunk_store(tmp_path / "chunks.bin", chunks)
+    store = ChunkStore(tmp_path / "chunks.bin")
+    assert len(store) == len(chunks)
+    assert list(store) == chunks
+    assert store[-1] == chunks[-1] and store[1:3] == chunks[1:3]
+    assert load_chunks(tmp_path / "chunks.bin", use_mmap=False) == chunks
+
+
+def test_empty_chunk_store(tmp_path):
+    write_chunk_store(tmp_path / "chunks.bin", [])
+    assert list(ChunkStore(tmp_path / "chunks.bin")) == []
+
+
+def test_not_a_chunk_store(tmp_path):
+    (tmp_path / "chunks.bin").write_bytes(b"something else entirely")
+    with pytest.raises(ValueError):
+        ChunkStore(tmp_path / "chunks.bin")
+
+
+@pytest.mark.parametrize("use_mmap", [True, False])
+def test_save_index_round_trip(tmp_path, use_mmap):
+    index = make_index()
+    save_index(tmp_path, MANIFEST, index, make_chunks())
+    cached_index, cached_chunks = load_cached_index(tmp_path, MANIFEST, use_mmap=use_mmap)
+    assert list(cached_chunks) == make_chunks()
+    query = np.ones((1, 8), dtype=np.float32)
+    assert (cached_index.search(query, 3)[1] == index.search(query, 3)[1]).all()
+
+
+def test_save_index_copies_a_chunk_store(tmp_path):
+    write_chunk_store(tmp_path / "spilled.bin", make_chunks())
+    save_index(tmp_path / "cache", MANIFEST, make_index(), ChunkStore(tmp_path / "spilled.bin"))
+    assert list(load_cached_index(tmp_path / "cache", MANIFEST)[1]) == make_chunks()
+
+
+def test_other_manifest_misses(tmp_path):
+    save_index(tmp_path, MANIFEST, make_index(), make_chunks())
+    assert load_cached_index(tmp_path, {**MANIFEST, "source_sha256": "def"}) is None
+    assert load_cached_index(tmp_path / "empty", MANIFEST) is None
+
+
+def test_lexical_is_saved_only_for_its_manifest(tmp_path):
+    save_index(tmp_path, MANIFEST, make_index(), make_chunks())
+    assert load_cached_lexical(tmp_path, MANIFEST) is None
+    lexical = BM25Index.build(TEXTS)
+    assert not save_lexical(tmp_path, {**MANIFEST, "model_name": "other"}, lexical)
+    assert save_lexical(tmp_path, MANIFEST, lexical)
+    assert load_cached_lexical(tmp_path, MANIFEST).search("cat", 2) == lexical.search("cat", 2)
+
+
+def test_bm25_round_trip(tmp_path):
+    lexical = BM25Index.build(TEXTS + ["the cat and the dog", "no match"])
+    lexical.save(tmp_path / "bm25.npz")
+    loaded = BM25Index.load(tmp_path / "bm25.npz")
+    assert loaded.vocabulary == lexical.vocabulary and loaded.num_docs == lexical.num_docs
+    for query in ["cat", "the cat", "日本語", "E1001", "missing", ""]:
+        assert loaded.search(query, 3) == lexical.search(query, 3)
+        assert np.array_equal(loaded.scores(query), lexical.scores(query))
+
+
+def _load_or_build(cache_dir, results):
+    with cache_lock(cache_dir):
+        cached = load_cached_index(cache_dir, MANIFEST)
+        built = cached is None
+        if built:
+            time.sleep(0.2)  # long enough for the other workers to be waiting
+            save_index(cache_dir, MANIFEST, make_index(), make_chunks())
+            cached = load_cached_index(cache_dir, MANIFEST)
+    results.put((built, cached[0].ntotal))
+
+
+@pytest.mark.skipif(
+    "fork" not in multiprocessing.get_all_start_methods(), reason="cache_lock needs fcntl, workers need fork"
+)
+def test_workers_share_one_build(tmp_path):
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    workers = [context.Process(target=_load_or_build, args=(tmp_path, results)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(30)
+    assert [worker.exitcode for worker in workers] == [0] * 4
+    outcomes = [results.get(timeout=5) for _ in workers]
+    assert sorted(outcomes) == [(False, len(TEXTS))] * 3 + [(True, len(TEXTS))]
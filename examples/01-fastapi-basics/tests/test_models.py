@@ -0,0 +1,33 @@
+import json
+
+from models import validate_user_lines
+
+VALID = b'{"username": "alice_1", "email": "alice@example.com", "first_name": "Alice", "last_name": null}'
+
+
+def parse(output: bytes):
+    return [json.loads(line) for line in output.splitlines()]
+
+
+def test_results_and_errors_keep_their_line_numbers():
+    output, failed = validate_user_lines([VALID, b"", b'{"username": "x"}', b"not json"], first_line=10)
+    results = parse(output)
+    assert [result["line"] for result in results] == [10, 12, 13]
+    assert results[0]["result"]["username"] == "alice_1"
+    assert "errors" in results[1] and "errors" in results[2]
+    assert failed == 2
+
+
+def test_non_utf8_line_does_not_break_the_response():
+    output, failed = validate_user_lines([VALID, b'{"username": "\xff\xfe"}', b"\xff", VALID])
+    results = parse(output)
+    assert [result["line"] for result in results] == [1, 2, 3, 4]
+    assert "result" in results[0] and "result" in results[3]
+    assert failed == 2
+
+
+def test_over_long_line_is_not_parsed():
+    output, failed = validate_user_lines([b"x" * 1000, VALID], max_line_bytes=500)
+    results = parse(output)
+    assert results[0]["errors"][0]["type"] == "line_too_long"
+    assert "result" in results[1] and failed == 1
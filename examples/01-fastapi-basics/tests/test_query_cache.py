@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from retrieval.query_cache import QueryEmbeddingCache
+
+
+def encode(queries):
+    return np.array([[len(query), sum(map(ord, query))] for query in queries], dtype="float32")
+
+
+@pytest.fixture
+def saved(tmp_path):
+    cache = QueryEmbeddingCache(encode, model_name="model")
+    cache.encode([f"question {i}" for i in range(100)])
+    path = tmp_path / "queries.npz"
+    cache.save(path)
+    return path
+
+
+def test_round_trip(saved):
+    cache = QueryEmbeddingCache(encode, model_name="model")
+    assert cache.load(saved) == 100
+    cache.encode(["Question 5", "question 7 "])
+    assert cache.hits == 2 and cache.misses == 0
+
+
+@pytest.mark.parametrize("keep", [0, 10, 100, 0.5, 0.99])
+def test_truncated_file_loads_nothing(saved, keep):
+    data = saved.read_bytes()
+    saved.write_bytes(data[: int(keep * len(data)) if isinstance(keep, float) else keep])
+    cache = QueryEmbeddingCache(encode, model_name="model")
+    assert cache.load(saved) == 0
+    assert len(cache) == 0
+
+
+def test_other_model_loads_nothing(saved):
+    assert QueryEmbeddingCache(encode, model_name="other").load(saved) == 0
+
+
+def test_missing_file_loads_nothing(tmp_path):
+    assert QueryEmbeddingCache(encode).load(tmp_path / "missing.npz") == 0
+
+
+def test_entries_do_not_keep_the_batch_alive():
+    cache = QueryEmbeddingCache(encode, maxsize=2)
+    cache.encode(["a", "b", "c", "d"])
+    assert all(vector.base is None for vector in cache._entries.values())
@@ -1,3 +1,26 @@
+"""
+Prompt templates and a prompt | llm chain, answered by a local Ollama model.
+
+    python run.py "Tell me shortly about OOP"           # one question, streamed to stdout
+    python run.py --input questions.jsonl --output answers.jsonl --max-concurrency 4
+
+In batch mode the questions (a .jsonl file of {"question": ..., "id": ...}
+objects, or a text file with one question per line) go through the chain's
+abatch_as_completed, at most --max-concurrency at a time. Every answer is
+appended to --output as soon as it completes, with its latency and tokens/s;
+running the same command again after an interruption skips the questions
+already answered and retries the failed ones.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
 from pydantic import BaseModel, Field
 
 from langchain.prompts import (
@@ -7,12 +30,11 @@ from langchain.prompts import (
 )
 from langchain_ollama.llms import OllamaLLM
 from langchain.callbacks.streaming_stdout import StreamingStdOutCallbackHandler
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.runnables import RunnableConfig, RunnableLambda
 
-from langgraph.graph import StateGraph, END
-from langgraph.graph.message import add_messages
-from langgraph.prebuilt.tool_node import ToolNode
-from langchain_core.messages import BaseMessage
-from langchain_core.runnables import RunnableConfig
+MODEL = "mistral"
+DEFAULT_QUESTION = "Tell me shortly about OOP"
 
 
 class Paragraph(BaseModel):
@@ -21,15 +43,15 @@ class Paragraph(BaseModel):
     feedback: str = Field(description="Constructive feedback on the original paragraph")
 
 
-llm = OllamaLLM(
-    model="mistral",
-    temperature=0.7,
-    streaming=True,
-    callbacks=[
-        StreamingStdOutCallbackHandler(),
-    ],
-)
-structured_llm = llm.with_structured_output(Paragraph) # Ollama doesn't support this shit :(((
+# build_llm().with_structured_output(Paragraph) -> Ollama doesn't support this shit :(((
+def build_llm(callbacks: Optional[list] = None) -> OllamaLLM:
+    return OllamaLLM(
+        model=MODEL,
+        temperature=0.7,
+        streaming=True,
+        callbacks=callbacks,
+    )
+
 
 system_prompt = SystemMessagePromptTemplate.from_template(
     """Your name is Romaniollo. You are a specialist in python language development. You will receive the questions below, and you will give good structured
@@ -40,7 +62,7 @@ user_prompt = HumanMessagePromptTemplate.from_template(
     """I have a question:
 
     {question}
-    
+
     Answer: """,
     input_valiables=["question"],
 )
@@ -48,13 +70,189 @@ user_prompt = HumanMessagePromptTemplate.from_template(
 # We can merge our prompts into one with ChatPromptTemplate
 prompt = ChatPromptTemplate.from_messages([system_prompt, user_prompt])
 
-chain = (
-    {
-        "question": lambda x: x["user_question"], # this shit its just REMAPPING variables
-    }
-    | prompt
-    | llm
-)
 
-result_1 = chain.invoke({"user_question": "Tell me shortly about OOP"})
-# print(result_1)
+def build_chain(llm: OllamaLLM):
+    return (
+        {
+            "question": lambda x: x["user_question"], # this shit its just REMAPPING variables
+        }
+        | prompt
+        | llm
+    )
+
+
+class TokenCounter(BaseCallbackHandler):
+    """Tokens and time to first token of one chain run."""
+
+    # Called right in the event loop, not through a thread pool
+    run_inline = True
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.tokens = 0
+        self.first_token_seconds = None
+
+    def on_llm_new_token(self, token: str, **kwargs) -> None:
+        if self.first_token_seconds is None:
+            self.first_token_seconds = time.perf_counter() - self.started
+        self.tokens += 1
+
+    def on_llm_end(self, response, **kwargs) -> None:
+        # Ollama reports how many tokens it generated; streamed chunks can hold several
+        for generations in response.generations:
+            for generation in generations:
+                eval_count = (generation.generation_info or {}).get("eval_count")
+                if eval_count:
+                    self.tokens = eval_count
+
+
+def read_questions(path: Path) -> List[Dict[str, Any]]:
+    """
+    [{"id", "question"}] from a .jsonl file or a text file with one question per line.
+
+    Without an "id" a question is identified by its line number, so resuming
+    needs the same input file.
+    """
+    items = []
+    with open(path, "r", encoding="utf-8") as f:
+        for number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            if path.suffix == ".jsonl":
+                record = json.loads(line)
+                question = record.get("question") or record["user_question"]
+                items.append({"id": str(record.get("id", number)), "question": question})
+            else:
+                items.append({"id": str(number), "question": line})
+    return items
+
+
+def answered_ids(output: Path) -> set:
+    """Ids answered without an error in an earlier run; the last record of an id counts."""
+    if not output.exists():
+        return set()
+    status = {}
+    with open(output, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A line cut short by the interruption
+                continue
+            status[record["id"]] = "error" not in record
+    return {item_id for item_id, ok in status.items() if ok}
+
+
+def end_last_line(path: Path) -> None:
+    """Terminate a last line cut short by an interruption, so appended records start on their own line."""
+    with open(path, "rb+") as f:
+        if f.seek(0, os.SEEK_END) == 0:
+            return
+        f.seek(-1, os.SEEK_END)
+        if f.read(1) != b"\n":
+            f.write(b"\n")
+
+
+def timed_chain(chain):
+    """The chain, returning (answer, TokenCounter, seconds) per input, timed from when it actually starts."""
+
+    async def run(inputs: dict, config: RunnableConfig):
+        counter = TokenCounter()
+        # config["callbacks"] is this input's own child manager: tracing stays intact
+        config["callbacks"].add_handler(counter, inherit=True)
+        answer = await chain.ainvoke(inputs, config)
+        return answer, counter, time.perf_counter() - counter.started
+
+    return RunnableLambda(run)
+
+
+async def arun_batch(items: List[Dict[str, Any]], output: Path, max_concurrency: int) -> List[dict]:
+    """Answer items, appending each result to output as it completes; returns the records written."""
+    chain = timed_chain(build_chain(build_llm()))
+    inputs = [{"user_question": item["question"]} for item in items]
+    records = []
+    with open(output, "a", encoding="utf-8") as f:
+        results = chain.abatch_as_completed(
+            inputs, config={"max_concurrency": max_concurrency}, return_exceptions=True
+        )
+        async for index, result in results:
+            item = items[index]
+            if isinstance(result, Exception):
+                record = {**item, "error": f"{type(result).__name__}: {result}"}
+            else:
+                answer, counter, seconds = result
+                record = {
+                    **item,
+                    "answer": answer,
+                    "seconds": round(seconds, 3),
+                    "first_token_seconds": round(counter.first_token_seconds or seconds, 3),
+                    "tokens": counter.tokens,
+                    "tokens_per_s": round(counter.tokens / seconds, 1) if seconds else None,
+                }
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            # Written and flushed before the next completes: an interruption loses nothing answered
+            f.flush()
+            records.append(record)
+            print(
+                f"[{len(records)}/{len(items)}] {item['id']}: "
+                + (record["error"] if "error" in record else f"{record['seconds']:.2f} s, {record['tokens_per_s']} tokens/s")
+            )
+    return records
+
+
+def print_summary(records: List[dict], seconds: float) -> None:
+    done = [record for record in records if "error" not in record]
+    print(f"\n{len(done)} answered, {len(records) - len(done)} failed in {seconds:.1f} s")
+    if not done:
+        return
+    latency = np.array([record["seconds"] for record in done])
+    tokens = sum(record["tokens"] for record in done)
+    print(
+        f"latency p50 {np.percentile(latency, 50):.2f} s, p95 {np.percentile(latency, 95):.2f} s; "
+        f"{tokens / seconds:.1f} tokens/s overall, "
+        f"{np.mean([record['tokens_per_s'] for record in done]):.1f} per item"
+    )
+
+
+def run_batch(input_path: Path, output: Path, max_concurrency: int) -> int:
+    items = read_questions(input_path)
+    done = answered_ids(output)
+    pending = [item for item in items if item["id"] not in done]
+    if done:
+        print(f"Resuming: {len(items) - len(pending)} of {len(items)} already answered in {output}")
+    if not pending:
+        return 0
+    if output.exists():
+        end_last_line(output)
+
+    started = time.perf_counter()
+    try:
+        records = asyncio.run(arun_batch(pending, output, max_concurrency))
+    except KeyboardInterrupt:
+        print(f"\nInterrupted; run the same command again to resume from {output}", file=sys.stderr)
+        return 130
+    print_summary(records, time.perf_counter() - started)
+    return 1 if any("error" in record for record in records) else 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("question", nargs="?", default=DEFAULT_QUESTION, help="ask one question, streamed")
+    parser.add_argument("--input", type=Path, help="questions: .jsonl or one per line")
+    parser.add_argument("--output", type=Path, help="answers .jsonl (default: <input>.answers.jsonl)")
+    parser.add_argument("--max-concurrency", type=int, default=4, help="questions answered at once")
+    args = parser.parse_args(argv)
+
+    if args.input:
+        output = args.output or args.input.with_name(f"{args.input.stem}.answers.jsonl")
+        return run_batch(args.input, output, args.max_concurrency)
+
+    chain = build_chain(build_llm(callbacks=[StreamingStdOutCallbackHandler()]))
+    chain.invoke({"user_question": args.question})
+    print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,173 @@
+"""
+Benchmark rag_test.py without Ollama, the HuggingFace model or a Qdrant server.
+
+The chain from rag_test.build_chain runs against:
+
+- an in-process Qdrant (QdrantClient(":memory:")), or a real server with --qdrant-url
+- deterministic hashing embeddings instead of all-MiniLM-L6-v2
+- FakeListChatModel instead of ChatOllama
+
+over a synthetic corpus of --corpus-mb megabytes, and prints a JSON report:
+ingestion chunks/s, retrieval and full-chain latency p50/p95/p99,
+recall@k against exact cosine search over the same embeddings, and peak RSS.
+
+Usage:
+    python benchmark.py --corpus-mb 2 --queries 200
+    python benchmark.py --qdrant-url http://localhost:6333 --output qdrant.json
+"""
+import argparse
+import json
+import platform
+import re
+import sys
+import tempfile
+import time
+import zlib
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import FakeListChatModel
+from langchain_qdrant import QdrantVectorStore
+from qdrant_client import QdrantClient
+
+import rag_test
+
+_TOKEN = re.compile(r"\w+")
+
+
+class HashingEmbeddings(Embeddings):
+    """Deterministic bag-of-words embeddings: signed feature hashing, L2-normalized."""
+
+    def __init__(self, dim: int = rag_test.EMBEDDING_SIZE):
+        self.dim = dim
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = np.zeros((len(texts), self.dim), dtype="float32")
+        for row, text in enumerate(texts):
+            for token in _TOKEN.findall(text.casefold()):
+                digest = zlib.crc32(token.encode("utf-8"))
+                vectors[row, digest % self.dim] += 1.0 if digest & (1 << 31) else -1.0
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        return vectors.tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+def synthetic_corpus(path: Path, megabytes: float, vocabulary: int = 20_000, seed: int = 0) -> None:
+    """Paragraphs of sentences over made-up words with Zipf-distributed frequencies."""
+    rng = np.random.default_rng(seed)
+    syllables = ["ka", "lo", "mi", "ne", "ru", "sa", "ti", "vo", "ze", "pa", "qu", "dor", "len", "mar"]
+    words = np.array(["".join(rng.choice(syllables, rng.integers(2, 5))) + str(i % 7 or "") for i in range(vocabulary)])
+    probabilities = 1 / np.arange(1, vocabulary + 1)
+    probabilities /= probabilities.sum()
+
+    target = int(megabytes * 1e6)
+    written = 0
+    with open(path, "w", encoding="utf-8") as f:
+        while written < target:
+            sentences = [
+                " ".join(rng.choice(words, rng.integers(6, 25), p=probabilities)).capitalize() + "."
+                for _ in range(rng.integers(3, 9))
+            ]
+            # CharacterTextSplitter splits on blank lines
+            paragraph = " ".join(sentences) + "\n\n"
+            f.write(paragraph)
+            written += len(paragraph)
+
+
+def peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def percentiles_ms(samples: List[float]) -> dict:
+    p50, p95, p99 = np.percentile(np.asarray(samples) * 1000, [50, 95, 99])
+    return {"p50": p50, "p95": p95, "p99": p99, "mean": float(np.mean(samples)) * 1000}
+
+
+def run(args) -> dict:
+    embeddings = HashingEmbeddings()
+    client = QdrantClient(url=args.qdrant_url) if args.qdrant_url else QdrantClient(":memory:")
+    rag_test.reset_collection(client, size=embeddings.dim)
+    vectorstore = QdrantVectorStore(
+        embedding=embeddings, client=client, collection_name=rag_test.COLLECTION_NAME
+    )
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = Path(tmp) / "corpus.txt"
+        synthetic_corpus(source, args.corpus_mb, seed=args.seed)
+        size = source.stat().st_size
+        started = time.perf_counter()
+        documents = rag_test.load_data_into_db(vectorstore, str(source))
+        ingest_s = time.perf_counter() - started
+    rss_after_ingest = peak_rss_mb()
+
+    rng = np.random.default_rng(args.seed + 1)
+    questions = []
+    for chunk in rng.choice(len(documents), min(args.queries, len(documents)), replace=False):
+        tokens = documents[chunk].page_content.split()
+        start = rng.integers(max(1, len(tokens) - 8))
+        questions.append(" ".join(tokens[start:start + 8]))
+
+    llm = FakeListChatModel(responses=["I don't know."])
+    chain = rag_test.build_chain(vectorstore, llm, k=args.k)
+    retrieval_latencies, chain_latencies, found = [], [], []
+    for question in questions:
+        started = time.perf_counter()
+        hits = vectorstore.similarity_search(question, k=args.k)
+        retrieval_latencies.append(time.perf_counter() - started)
+        found.append({doc.metadata["chunk"] for doc in hits})
+
+        started = time.perf_counter()
+        chain.invoke({"input": question})
+        chain_latencies.append(time.perf_counter() - started)
+
+    # Exact cosine search over the same vectors
+    matrix = np.asarray(embeddings.embed_documents([doc.page_content for doc in documents]))
+    queries = np.asarray(embeddings.embed_documents(questions))
+    exact = np.argsort(-(queries @ matrix.T), axis=1, kind="stable")[:, :args.k]
+    recall = sum(len(f & set(e.tolist())) for f, e in zip(found, exact)) / (args.k * len(questions))
+
+    return {
+        "benchmark": "05-rag-vectordb",
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "environment": {"python": platform.python_version(), "platform": platform.platform()},
+        "config": vars(args),
+        "corpus": {"bytes": size, "chunks": len(documents)},
+        "ingestion": {
+            "seconds": ingest_s,
+            "chunks_per_second": len(documents) / ingest_s if ingest_s else 0.0,
+        },
+        "query": {
+            "count": len(questions),
+            "retrieval_ms": percentiles_ms(retrieval_latencies),
+            "chain_ms": percentiles_ms(chain_latencies),
+            f"recall@{args.k}": recall,
+        },
+        "memory": {"peak_rss_mb_after_ingest": rss_after_ingest, "peak_rss_mb": peak_rss_mb()},
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus-mb", type=float, default=1.0)
+    parser.add_argument("--qdrant-url", help="benchmark a running Qdrant instead of the in-process one")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    report = json.dumps(run(args), indent=2, default=str)
+    if args.output:
+        args.output.write_text(report + "\n", encoding="utf-8")
+    else:
+        print(report)
@@ -1,5 +1,11 @@
 import os
+from functools import lru_cache
+from typing import List, Optional
+
 from langchain_community.document_loaders import TextLoader
+from langchain_core.documents import Document
+from langchain_core.language_models import BaseChatModel
+from langchain_core.vectorstores import VectorStore
 from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_qdrant import QdrantVectorStore
 from langchain_text_splitters import CharacterTextSplitter
@@ -10,14 +16,9 @@ from langchain.prompts import ChatPromptTemplate
 from langchain.chains.retrieval import create_retrieval_chain
 from langchain.chains.combine_documents import create_stuff_documents_chain
 
-llm = ChatOllama(model="mistral", temperature=0.5)
-client = QdrantClient(host="localhost", port=6333)
-embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
-vectorstore = QdrantVectorStore(
-    embedding=embeddings,
-    client=client,
-    collection_name="qdrant_langchain_collection"
-)
+COLLECTION_NAME = "qdrant_langchain_collection"
+EMBEDDING_SIZE = 384
+
 system_prompt = (
     "Use the given context to answer the question. "
     "If you don't know the answer, say you don't know. "
@@ -32,25 +33,48 @@ prompt = ChatPromptTemplate.from_messages(
 )
 
 
-def reset_collection():
+# The model, client and vector store are created on first use, so importing
+# this module (e.g. from benchmark.py) needs neither Ollama nor Qdrant running.
+# Every function below also accepts replacements for them.
+@lru_cache(maxsize=None)
+def get_llm() -> BaseChatModel:
+    return ChatOllama(model="mistral", temperature=0.5)
+
+
+@lru_cache(maxsize=None)
+def get_client() -> QdrantClient:
+    return QdrantClient(host="localhost", port=6333)
+
+
+@lru_cache(maxsize=None)
+def get_vectorstore() -> VectorStore:
+    return QdrantVectorStore(
+        embedding=HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2"),
+        client=get_client(),
+        collection_name=COLLECTION_NAME
+    )
+
+
+def reset_collection(client: Optional[QdrantClient] = None, size: int = EMBEDDING_SIZE):
     """Reset the Qdrant collection"""
+    client = client or get_client()
     try:
-        client.delete_collection(collection_name="qdrant_langchain_collection")
+        client.delete_collection(collection_name=COLLECTION_NAME)
         print("Deleted existing collection")
     except:
         pass
-    
+
     from qdrant_client.models import Distance, VectorParams
     client.create_collection(
-        collection_name="qdrant_langchain_collection",
-        vectors_config=VectorParams(size=384, distance=Distance.COSINE),
+        collection_name=COLLECTION_NAME,
+        vectors_config=VectorParams(size=size, distance=Distance.COSINE),
     )
     print("Created new collection")
 
 
-def load_data_into_db():
-    """Load text data from file into the vector database."""
-    file_path = os.path.join(os.path.dirname(__file__), "test.txt")
+def split_documents(file_path: Optional[str] = None) -> List[Document]:
+    """Load a text file and split it into chunks, numbered in metadata["chunk"]."""
+    file_path = file_path or os.path.join(os.path.dirname(__file__), "test.txt")
     loader = TextLoader(file_path)
     document = loader.load()
     text_splitter = CharacterTextSplitter(
@@ -58,17 +82,33 @@ def load_data_into_db():
         chunk_overlap=100,
     )
     texts = text_splitter.split_documents(document)
-    vectorstore.add_documents(texts)
+    for i, text in enumerate(texts):
+        text.metadata["chunk"] = i
+    return texts
+
+
+def load_data_into_db(
+    vectorstore: Optional[VectorStore] = None, file_path: Optional[str] = None
+) -> List[Document]:
+    """Load text data from file into the vector database."""
+    texts = split_documents(file_path)
+    (vectorstore or get_vectorstore()).add_documents(texts)
+    return texts
 
 
-def llm_chain(query: str):
-    retriver = vectorstore.as_retriever()
+def build_chain(
+    vectorstore: Optional[VectorStore] = None, llm: Optional[BaseChatModel] = None, k: int = 4
+):
+    retriver = (vectorstore or get_vectorstore()).as_retriever(search_kwargs={"k": k})
     combined_docs_chain = create_stuff_documents_chain(
-        llm=llm,
+        llm=llm or get_llm(),
         prompt=prompt
     )
-    retrieval_chain = create_retrieval_chain(retriver, combined_docs_chain)
-    return retrieval_chain.invoke({"input": query})
+    return create_retrieval_chain(retriver, combined_docs_chain)
+
+
+def llm_chain(query: str, vectorstore: Optional[VectorStore] = None, llm: Optional[BaseChatModel] = None):
+    return build_chain(vectorstore, llm).invoke({"input": query})
 
 
 if __name__ == "__main__":
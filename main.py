@@ -1,23 +1,285 @@
 """
-AI Integration Examples - Main Application Entry Point (DEPRECATED)
+AI Integration Examples - unified gateway
 
-Note: This file is deprecated as examples are now organized in separate folders.
-Each example can be run independently from its respective directory.
+One FastAPI app for the examples that used to be started one process each:
 
-To run individual examples, navigate to the example folder and run the Python file directly.
-For example: python examples/01-fastapi-basics/day_one.py
+- the fastapi-basics router (examples/01-fastapi-basics) under /fastapi-basics
+- every graph listed in an examples/**/langgraph.json under
+  /graphs/<example>/<graph>/invoke and /graphs/<example>/<graph>/stream
+- Prometheus metrics for all of the above at /metrics
+
+Nothing heavy is imported at startup. A graph's module is imported on the
+first request for it (rag.py, with SentenceTransformers and FAISS, already
+is), so starting the gateway costs FastAPI and a scan of the langgraph.json
+files. GATEWAY_LOADING=eager imports everything at startup instead.
+
+Run from the repository root:
+    uvicorn main:app
+    python main.py --startup-report   # cold start time and RSS, lazy vs eager
 """
-# from fastapi import FastAPI
-# from examples... import router
-# 
-# app = FastAPI(
-#     title="AI Integration Examples",
-#     description="Collection of AI integration examples using LangChain, LangGraph, and FastAPI",
-#     version="1.0.0"
-# )
-# 
-# app.include_router(
-#     router=router,
-#     prefix="/fastapi-basics",
-#     tags=["FastAPI Basics"]
-# )
+import asyncio
+import importlib
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import threading
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from fastapi import FastAPI, HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel
+
+EXAMPLES_DIR = Path(__file__).parent / "examples"
+# "lazy" imports each graph on its first request, "eager" all of them at startup
+GATEWAY_LOADING = os.getenv("GATEWAY_LOADING", "lazy")
+
+# The example folders are not valid identifiers; import them by name from examples/
+sys.path.insert(0, str(EXAMPLES_DIR))
+basics = importlib.import_module("01-fastapi-basics.routers")
+metrics = importlib.import_module("01-fastapi-basics.metrics")
+
+
+@dataclass
+class GraphSpec:
+    """A graph entry of a langgraph.json: "<name>": "./<file>.py:<attribute>"."""
+    example: str
+    name: str
+    path: Path
+    attribute: str
+    env_file: Optional[Path] = None
+
+    @property
+    def directory(self) -> Path:
+        return self.path.parent
+
+    @property
+    def module_prefix(self) -> str:
+        # Unique per example: several examples have a chatbot.py or configuration.py
+        return "graphs_" + "".join(c if c.isalnum() else "_" for c in self.example)
+
+
+def example_name(config_dir: Path) -> str:
+    """examples/06-langgraph-fundamentals/module-1/studio -> 06-langgraph-fundamentals-module-1"""
+    parts = list(config_dir.relative_to(EXAMPLES_DIR).parts)
+    if len(parts) > 1 and parts[-1] in ("studio", "deployment"):
+        parts.pop()
+    return "-".join(parts)
+
+
+def discover_graphs(examples_dir: Path = EXAMPLES_DIR) -> Dict[str, Dict[str, GraphSpec]]:
+    """example -> graph name -> GraphSpec, from every langgraph.json; nothing is imported."""
+    graphs: Dict[str, Dict[str, GraphSpec]] = {}
+    for config_path in sorted(examples_dir.rglob("langgraph.json")):
+        with open(config_path, "r", encoding="utf-8") as f:
+            config = json.load(f)
+        example = example_name(config_path.parent)
+        env_file = config_path.parent / config["env"] if isinstance(config.get("env"), str) else None
+        for name, target in config.get("graphs", {}).items():
+            file, _, attribute = target.rpartition(":")
+            graphs.setdefault(example, {})[name] = GraphSpec(
+                example, name, (config_path.parent / file).resolve(), attribute, env_file
+            )
+    return graphs
+
+
+graphs = discover_graphs()
+_loaded: Dict[tuple, Any] = {}
+# Imports touch sys.path and sys.modules: one at a time
+_import_lock = threading.Lock()
+
+
+def load_graph(spec: GraphSpec) -> Any:
+    """
+    Import the graph's module on first use and return its compiled graph.
+
+    The module's directory goes on sys.path while it is imported, so its
+    sibling imports (`import configuration`, `from agents.base import ...`)
+    work as under `langgraph dev`. Those siblings are then kept in
+    sys.modules under the example's prefix, so the next example's module of
+    the same name is imported fresh instead of reusing this one.
+    """
+    key = (spec.example, spec.name)
+    if key in _loaded:
+        return _loaded[key]
+    with _import_lock:
+        if key in _loaded:
+            return _loaded[key]
+        if spec.env_file is not None and spec.env_file.exists():
+            from dotenv import load_dotenv
+
+            load_dotenv(spec.env_file, override=False)
+
+        local = {p.stem for p in spec.directory.glob("*.py")} | {
+            p.name for p in spec.directory.iterdir() if (p / "__init__.py").exists()
+        }
+
+        def is_local(name: str) -> bool:
+            return name.split(".")[0] in local
+
+        shadowed = {name: sys.modules.pop(name) for name in list(sys.modules) if is_local(name)}
+        module_name = f"{spec.module_prefix}_{spec.path.stem}"
+        sys.path.insert(0, str(spec.directory))
+        try:
+            module = sys.modules.get(module_name)
+            if module is None:
+                module_spec = importlib.util.spec_from_file_location(module_name, spec.path)
+                module = importlib.util.module_from_spec(module_spec)
+                sys.modules[module_name] = module
+                try:
+                    module_spec.loader.exec_module(module)
+                except BaseException:
+                    del sys.modules[module_name]
+                    raise
+        finally:
+            sys.path.remove(str(spec.directory))
+            for name in [name for name in sys.modules if is_local(name)]:
+                sys.modules[f"{spec.module_prefix}_{name}"] = sys.modules.pop(name)
+            sys.modules.update(shadowed)
+
+        graph = getattr(module, spec.attribute)
+        _loaded[key] = graph
+        return graph
+
+
+async def get_graph(example: str, name: str) -> Any:
+    spec = graphs.get(example, {}).get(name)
+    if spec is None:
+        raise HTTPException(status_code=404, detail=f"Unknown graph {example}/{name}")
+    if (example, name) in _loaded:
+        return _loaded[(example, name)]
+    try:
+        # Importing may load models and clients for seconds: keep the event loop serving
+        return await asyncio.to_thread(load_graph, spec)
+    except Exception as exc:
+        raise HTTPException(status_code=503, detail=f"Could not load {example}/{name}: {type(exc).__name__}: {exc}")
+
+
+def preload() -> Dict[str, str]:
+    """Import rag.py and every graph now; returns the ones that failed, with the error."""
+    failed = {}
+    try:
+        importlib.import_module("01-fastapi-basics.rag")
+    except Exception as exc:
+        failed["01-fastapi-basics/rag"] = f"{type(exc).__name__}: {exc}"
+    for example, specs in graphs.items():
+        for name, spec in specs.items():
+            try:
+                load_graph(spec)
+            except Exception as exc:
+                failed[f"{example}/{name}"] = f"{type(exc).__name__}: {exc}"
+    return failed
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if GATEWAY_LOADING == "eager":
+        for graph, error in (await asyncio.to_thread(preload)).items():
+            print(f"Could not preload {graph}: {error}")
+    yield
+
+
+app = FastAPI(
+    title="AI Integration Examples",
+    description="Collection of AI integration examples using LangChain, LangGraph, and FastAPI",
+    version="1.0.0",
+    lifespan=lifespan,
+)
+
+app.include_router(
+    router=basics.router,
+    prefix="/fastapi-basics",
+    tags=["FastAPI Basics"]
+)
+
+app.add_middleware(metrics.MetricsMiddleware)
+
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
+class GraphRequest(BaseModel):
+    input: Dict[str, Any] = {}
+    config: Optional[Dict[str, Any]] = None
+    # LangGraph stream mode: "updates", "values", "messages", ...
+    stream_mode: str = "updates"
+
+
+@app.get("/graphs", tags=["LangGraph"])
+async def list_graphs():
+    return [
+        {"example": spec.example, "graph": spec.name, "loaded": (spec.example, spec.name) in _loaded}
+        for specs in graphs.values()
+        for spec in specs.values()
+    ]
+
+
+@app.post("/graphs/{example}/{name}/invoke", tags=["LangGraph"])
+async def invoke_graph(example: str, name: str, request: GraphRequest):
+    graph = await get_graph(example, name)
+    return jsonable_encoder(await graph.ainvoke(request.input, request.config))
+
+
+@app.post("/graphs/{example}/{name}/stream", tags=["LangGraph"])
+async def stream_graph(example: str, name: str, request: GraphRequest):
+    """Run a graph and send each streamed chunk as a Server-Sent Event."""
+    graph = await get_graph(example, name)
+
+    async def events():
+        try:
+            async for chunk in graph.astream(request.input, request.config, stream_mode=request.stream_mode):
+                yield basics.sse_event(jsonable_encoder(chunk))
+        except Exception as exc:
+            yield basics.sse_event(str(exc), event="error")
+            return
+        yield basics.sse_event("", event="end")
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def startup_report() -> None:
+    """Time and peak RSS of a fresh interpreter importing the gateway, lazily and eagerly."""
+    probe = (
+        "import json, resource, sys, time\n"
+        "started = time.perf_counter()\n"
+        "import main\n"
+        "failed = main.preload() if main.GATEWAY_LOADING == 'eager' else {}\n"
+        "seconds = time.perf_counter() - started\n"
+        "rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024)\n"
+        "print(json.dumps({'seconds': seconds, 'rss_mb': rss, 'loaded': len(main._loaded), 'failed': failed}))\n"
+    )
+    print("| loading | startup s | peak RSS MB | graphs loaded | failed to load |")
+    print("|---|---|---|---|---|")
+    for loading in ("lazy", "eager"):
+        result = subprocess.run(
+            [sys.executable, "-c", probe],
+            cwd=Path(__file__).parent,
+            env={**os.environ, "GATEWAY_LOADING": loading},
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        row = json.loads(result.stdout.strip().splitlines()[-1])
+        print(f"| {loading} | {row['seconds']:.2f} | {row['rss_mb']:.0f} | {row['loaded']} | {len(row['failed'])} |")
+        for graph, error in row["failed"].items():
+            print(f"    {graph}: {error}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    if "--startup-report" in sys.argv:
+        startup_report()
+    else:
+        import uvicorn
+
+        uvicorn.run(app)